@@ -0,0 +1,580 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+from cache_subcadenes import CacheSubcadenes
+from compilador_fnc import compilar_fnc
+from extensio_1 import GramaticaFNC
+from extensio_2 import GramaticaProbabilistica
+from instrumentacio import EstadistiquesAnalisi
+from gramatiques import gramatiques_simples, gramatiques_no_FNC, gramatiques_probabilistes
+from main_cky import Gramatica
+from serialitzacio import EscriptorArbresBinari, EscriptorParentitzat, llegir_arbres_binari
+
+def generar_gramatica_fnc(n_no_terminals: int, n_regles: int, mida_lexic: int, llavor: int = 0,
+                          ambiguitat_lexica: Tuple[int, int] = (1, 3)) -> Dict:
+    """
+    Genera una gramàtica sintètica en FNC amb regles binàries i lèxiques aleatòries.
+    :param n_no_terminals: Nombre de no-terminals (el primer és sempre 'S').
+    :param n_regles: Nombre de regles binàries (A -> B C).
+    :param mida_lexic: Nombre de paraules diferents del lèxic.
+    :param llavor: Llavor del generador aleatori, per tenir resultats reproduïbles.
+    :param ambiguitat_lexica: Nombre mínim i màxim de preterminals possibles de cada paraula.
+    :return: Diccionari amb el format de gramàtica de gramatiques.py.
+    """
+    aleatori = random.Random(llavor)
+    no_terminals = ['S'] + [f"N{i}" for i in range(1, n_no_terminals)]
+    gramatica = {no_terminal: [] for no_terminal in no_terminals}
+
+    for _ in range(n_regles):
+        gramatica[aleatori.choice(no_terminals)].append([aleatori.choice(no_terminals), aleatori.choice(no_terminals)])
+
+    # Cada paraula té entre un i tres preterminals possibles (per defecte)
+    for i in range(mida_lexic):
+        for no_terminal in aleatori.sample(no_terminals, aleatori.randint(*ambiguitat_lexica)):
+            gramatica[no_terminal].append([f"w{i}"])
+
+    return gramatica
+
+def generar_gramatica_probabilistica(n_no_terminals: int, n_regles: int, mida_lexic: int, llavor: int = 0,
+                                     ambiguitat_lexica: Tuple[int, int] = (1, 3)) -> Dict:
+    """
+    Genera una gramàtica probabilística sintètica a partir de generar_gramatica_fnc,
+    repartint la probabilitat de cada no-terminal entre les seves produccions amb pesos aleatoris.
+    """
+    aleatori = random.Random(llavor)
+    gramatica = generar_gramatica_fnc(n_no_terminals, n_regles, mida_lexic, llavor, ambiguitat_lexica)
+    gramatica_probabilistica = {}
+    for no_terminal, produccions in gramatica.items():
+        pesos = [aleatori.random() + 0.1 for _ in produccions]
+        total = sum(pesos)
+        gramatica_probabilistica[no_terminal] = [(produccio, pes / total) for produccio, pes in zip(produccions, pesos)]
+    return gramatica_probabilistica
+
+def generar_gramatica_general(n_no_terminals: int, n_regles: int, mida_lexic: int, llavor: int = 0, probabilistica: bool = False) -> Dict:
+    """
+    Genera una gramàtica sintètica que no està en FNC: regles de dos a quatre símbols que barregen terminals i
+    no-terminals, regles unitàries (A -> B) i categories opcionals (O -> ε | paraula), com les d'una gramàtica de treebank.
+    Cada regla llarga conté algun no-terminal no opcional, de manera que els buits no es propaguen a tota la gramàtica.
+    :param probabilistica: Si és True, les produccions porten probabilitat (repartida uniformement per no-terminal).
+    """
+    aleatori = random.Random(llavor)
+    no_terminals = ['S'] + [f"N{i}" for i in range(1, n_no_terminals)]
+    opcionals = [f"O{i}" for i in range(max(1, n_no_terminals // 20))]
+    terminals = [f"w{i}" for i in range(mida_lexic)]
+    gramatica = {no_terminal: [] for no_terminal in no_terminals + opcionals}
+
+    for _ in range(n_regles):
+        if aleatori.random() < 0.005:
+            produccio = [aleatori.choice(no_terminals)]
+        else:
+            produccio = []
+            for _ in range(aleatori.randint(2, 4)):
+                tipus = aleatori.random()
+                produccio.append(aleatori.choice(terminals) if tipus < 0.15 else
+                                 aleatori.choice(opcionals) if tipus < 0.19 else aleatori.choice(no_terminals))
+            if not any(simbol in gramatica and simbol not in opcionals for simbol in produccio):
+                produccio[0] = aleatori.choice(no_terminals)
+        gramatica[aleatori.choice(no_terminals)].append(produccio)
+
+    for opcional in opcionals:
+        gramatica[opcional].append(['ε'])
+    for i, terminal in enumerate(terminals):
+        gramatica[(no_terminals + opcionals)[i % len(gramatica)]].append([terminal])
+
+    if probabilistica:
+        return {no_terminal: [(produccio, 1.0 / len(produccions)) for produccio in produccions]
+                for no_terminal, produccions in gramatica.items()}
+    return gramatica
+
+def generar_frases(mida_lexic: int, longitud: int, n_frases: int, llavor: int = 0) -> List[List[str]]:
+    """
+    Genera frases aleatòries amb paraules del lèxic de generar_gramatica_fnc.
+    """
+    aleatori = random.Random(llavor)
+    return [[f"w{aleatori.randrange(mida_lexic)}" for _ in range(longitud)] for _ in range(n_frases)]
+
+def cronometrar(funcio: Callable, frases: List, repeticions: int = 1) -> float:
+    """
+    Retorna el temps mínim (en segons) d'analitzar totes les frases amb la funció donada.
+    """
+    millor = float('inf')
+    for _ in range(repeticions):
+        inici = time.perf_counter()
+        for frase in frases:
+            funcio(frase)
+        millor = min(millor, time.perf_counter() - inici)
+    return millor
+
+def benchmark_cky_compilat() -> None:
+    """
+    Compara l'algoritme CKY basat en conjunts amb la variant compilada de màscares de bits.
+    Comprova també que els dos camins donen el mateix resultat.
+    """
+    casos = [(f"G{i}", gramatica, frases) for i, (gramatica, frases) in enumerate(gramatiques_simples, start=1)]
+    casos.append(("G2 (cadenes de 60 símbols)", gramatiques_simples[1][0],
+                  ["".join(random.Random(i).choice("ab") for _ in range(60)) for i in range(5)]))
+    for longitud in (40, 80):
+        casos.append((f"Sintètica 300 NT, frases de {longitud}",
+                      generar_gramatica_fnc(300, 3000, 500, llavor=longitud),
+                      generar_frases(500, longitud, 3, llavor=longitud)))
+
+    for nom, gramatica, frases in casos:
+        gram = Gramatica(gramatica)
+        assert all(gram.algoritme_cky(frase) == gram.algoritme_cky_compilat(frase) for frase in frases)
+
+        temps_conjunts = cronometrar(gram.algoritme_cky, frases, repeticions=3)
+        temps_bits = cronometrar(gram.algoritme_cky_compilat, frases, repeticions=3)
+        print(f"{nom}: conjunts {temps_conjunts * 1000:.2f} ms, bits {temps_bits * 1000:.2f} ms "
+              f"(x{temps_conjunts / max(temps_bits, 1e-9):.1f})")
+
+def benchmark_cky_matricial() -> None:
+    """
+    Compara la variant compilada de l'algoritme CKY amb la variant matricial (productes booleans de files i columnes
+    guardades com a enters) en cadenes llargues de G1 i G2, i a gramàtiques sintètiques grans, on la variant compilada
+    guanya amb frases curtes (veure Gramatica.reconeixer).
+    """
+    G1, G2 = gramatiques_simples[0][0], gramatiques_simples[1][0]
+    derivables_G2 = [frase for frase in gramatiques_simples[1][1] if frase and Gramatica(G2).algoritme_cky(frase)]
+    casos = []
+    for longitud in (64, 200):
+        aleatori = random.Random(longitud)
+        casos.append((f"G1, cadenes de {longitud} símbols", G1, ["".join(aleatori.choice("ab") for _ in range(longitud))]))
+        cadena = ""
+        while len(cadena) < longitud:
+            cadena += aleatori.choice(derivables_G2)
+        casos.append((f"G2, cadena derivable de {len(cadena)} símbols", G2, [cadena]))
+    for longitud in (20, 80):
+        casos.append((f"Sintètica 300 NT, frases de {longitud}", generar_gramatica_fnc(300, 3000, 500, llavor=longitud),
+                      generar_frases(500, longitud, 3, llavor=longitud)))
+
+    for nom, gramatica, frases in casos:
+        gram = Gramatica(gramatica)
+        assert all(gram.algoritme_cky_compilat(frase) == gram.algoritme_cky_matricial(frase) for frase in frases)
+        temps_bits = cronometrar(gram.algoritme_cky_compilat, frases)
+        temps_matricial = cronometrar(gram.algoritme_cky_matricial, frases)
+        print(f"{nom}: bits {temps_bits * 1000:.2f} ms, matricial {temps_matricial * 1000:.2f} ms "
+              f"(x{temps_bits / max(temps_matricial, 1e-9):.1f})")
+    # Només la variant matricial: la compilada ja triga més de mig minut amb 500 símbols
+    for longitud in (500, 1000):
+        aleatori = random.Random(longitud)
+        cadena = ""
+        while len(cadena) < longitud:
+            cadena += aleatori.choice(derivables_G2)
+        temps = cronometrar(Gramatica(G2).algoritme_cky_matricial, [cadena])
+        print(f"G2, cadena derivable de {len(cadena)} símbols: matricial {temps * 1000:.0f} ms")
+
+def benchmark_lots_mateixa_longitud() -> None:
+    """
+    Compara l'anàlisi frase a frase amb l'anàlisi per lots agrupats per longitud (Gramatica.reconeixer_lot i
+    GramaticaProbabilistica.puntuar_lot) amb moltes frases curtes. El guany depèn de quants no-terminals comparteixen
+    les frases d'un grup: és gran amb lèxics petits i petit amb frases sintètiques de vocabulari ampli.
+    """
+    aleatori = random.Random(0)
+    cadenes = ["".join(aleatori.choice("ab") for _ in range(aleatori.randint(8, 16))) for _ in range(1000)]
+    frases_2024 = [frase for frase in gramatiques_no_FNC[3][1] if frase] * 100
+    sintetiques = [frase for longitud in range(6, 13) for frase in generar_frases(200, longitud, 100, llavor=longitud)]
+    casos = [
+        ("G1, 1000 cadenes de 8 a 16 símbols", Gramatica(gramatiques_simples[0][0]), 'reconeixer_lot', cadenes),
+        ("G5 (FNC), 1000 cadenes de 8 a 16 símbols", GramaticaFNC(gramatiques_no_FNC[0][0]), 'reconeixer_lot', cadenes),
+        ("G8 (FNC), frases de prova x100", GramaticaFNC(gramatiques_no_FNC[3][0]), 'reconeixer_lot', frases_2024),
+        ("Sintètica FNC 50 NT, 700 frases de 6 a 12", Gramatica(generar_gramatica_fnc(50, 500, 200, llavor=1)),
+         'reconeixer_lot', sintetiques),
+        ("G9, 1000 cadenes de 8 a 16 símbols", GramaticaProbabilistica(gramatiques_probabilistes[0][0]), 'puntuar_lot', cadenes),
+        ("Sintètica probabilística 50 NT, 700 frases de 6 a 12",
+         GramaticaProbabilistica(generar_gramatica_probabilistica(50, 500, 200, llavor=1)), 'puntuar_lot', sintetiques),
+    ]
+    for nom, gram, metode, frases in casos:
+        individual = gram.algoritme_cky_compilat if metode == 'reconeixer_lot' else gram.algoritme_pcky
+        temps_frases = cronometrar(individual, frases, repeticions=3)
+        temps_lots = cronometrar(getattr(gram, metode), [frases], repeticions=3)
+        print(f"{nom}: frase a frase {temps_frases * 1000:.1f} ms ({len(frases) / temps_frases:.0f} frases/s), "
+              f"per lots {temps_lots * 1000:.1f} ms ({len(frases) / temps_lots:.0f} frases/s)")
+
+def benchmark_pcky_vectorial() -> None:
+    """
+    Compara l'algoritme PCKY original amb la variant vectorial en espai logarítmic, que tracta de cop totes les divisions
+    de cada regla a les cel·les llargues.
+    """
+    casos = []
+    for longitud in (10, 20, 30):
+        casos.append((f"Sintètica 40 NT, frases de {longitud}",
+                      generar_gramatica_probabilistica(40, 400, 100, llavor=longitud),
+                      generar_frases(100, longitud, 2, llavor=longitud)))
+    # Amb més preterminals per paraula, la taula és densa i les cel·les llargues tenen moltes divisions útils
+    for longitud in (20, 40):
+        casos.append((f"Sintètica densa 20 NT, frases de {longitud}",
+                      generar_gramatica_probabilistica(20, 200, 100, llavor=1, ambiguitat_lexica=(5, 7)),
+                      generar_frases(100, longitud, 1, llavor=longitud)))
+
+    for nom, gramatica, frases in casos:
+        gram = GramaticaProbabilistica(gramatica)
+        temps_original = cronometrar(gram.algoritme_pcky, frases)
+        temps_vectorial = cronometrar(gram.algoritme_pcky_vectorial, frases)
+        print(f"{nom}: original {temps_original * 1000:.2f} ms, vectorial {temps_vectorial * 1000:.2f} ms "
+              f"(x{temps_original / max(temps_vectorial, 1e-9):.1f})")
+
+def benchmark_cache_gramatiques() -> None:
+    """
+    Compara el temps de construir una gramàtica fent la conversió a FNC amb el de carregar-la ja compilada.
+    """
+    casos = [("GramaticaFNC", GramaticaFNC, generar_gramatica_fnc(300, 3000, 2000, llavor=1)),
+             ("GramaticaProbabilistica", GramaticaProbabilistica, generar_gramatica_probabilistica(300, 3000, 2000, llavor=1))]
+
+    with tempfile.TemporaryDirectory() as directori:
+        for nom, classe, gramatica in casos:
+            ruta = os.path.join(directori, nom + ".ckyg")
+
+            inici = time.perf_counter()
+            classe(gramatica).desar_compilada(ruta)
+            temps_conversio = time.perf_counter() - inici
+
+            inici = time.perf_counter()
+            classe.from_compiled(ruta)
+            temps_carrega = time.perf_counter() - inici
+
+            print(f"{nom}: conversió {temps_conversio * 1000:.2f} ms, càrrega compilada {temps_carrega * 1000:.2f} ms "
+                  f"({os.path.getsize(ruta) / 1024:.1f} KiB)")
+
+def benchmark_compilador_fnc() -> None:
+    """
+    Mesura el temps de la conversió a FNC de gramàtiques generals grans (10.000 regles o més).
+    """
+    for n_regles in (10000, 20000, 50000):
+        for probabilistica in (False, True):
+            gramatica = generar_gramatica_general(n_regles // 20, n_regles, n_regles // 10, llavor=n_regles, probabilistica=probabilistica)
+            inici = time.perf_counter()
+            resultat = compilar_fnc(gramatica, probabilistica=probabilistica)
+            temps = time.perf_counter() - inici
+            regles = sum(len(produccions) for produccions in resultat.values())
+            print(f"{n_regles} regles ({'probabilística' if probabilistica else 'FNC'}): {temps * 1000:.2f} ms, "
+                  f"{regles} regles en FNC")
+
+def benchmark_cache_subcadenes() -> None:
+    """
+    Compara l'anàlisi d'un corpus amb subcadenes repetides amb i sense la memòria cau de subcadenes.
+    Les frases comencen amb un de pocs prefixos fixos (com les fórmules que es repeteixen en un corpus real)
+    i acaben amb paraules a l'atzar.
+    """
+    generador = random.Random(0)
+    prefixos = generar_frases(20, 12, 5, llavor=1)
+    frases = [generador.choice(prefixos) + cua for cua in generar_frases(20, 4, 100, llavor=2)]
+
+    casos = [("CKY compilat", lambda cache: Gramatica(generar_gramatica_fnc(40, 400, 20, llavor=1), cache_subcadenes=cache), 'algoritme_cky_compilat'),
+             ("PCKY", lambda cache: GramaticaProbabilistica(generar_gramatica_probabilistica(40, 400, 20, llavor=1), cache_subcadenes=cache), 'algoritme_pcky')]
+    for nom, crear, metode in casos:
+        cache = CacheSubcadenes()
+        temps_sense = cronometrar(getattr(crear(None), metode), frases)
+        temps_amb = cronometrar(getattr(crear(cache), metode), frases)
+        estadistiques = cache.estadistiques()
+        print(f"{nom}: sense memòria cau {temps_sense * 1000:.2f} ms, amb memòria cau {temps_amb * 1000:.2f} ms "
+              f"(x{temps_sense / max(temps_amb, 1e-9):.1f}, encerts {estadistiques['taxa_encerts']:.0%}, "
+              f"{estadistiques['bytes'] / 1024:.1f} KiB)")
+
+def benchmark_filtre_taula() -> None:
+    """
+    Mesura quantes parelles deixa de provar el filtre de la taula (fills esquerres i drets, i accessibilitat des de l'arrel
+    segons la posició de la subcadena) a les gramàtiques de prova i a gramàtiques sintètiques, i el temps amb i sense filtre.
+    """
+    casos = [(f"G{i}", Gramatica, gramatica, frases, 'algoritme_cky')
+             for i, (gramatica, frases) in enumerate(gramatiques_simples, start=1)]
+    casos += [(f"G{i} (FNC)", GramaticaFNC, gramatica, frases, 'algoritme_cky')
+              for i, (gramatica, frases) in enumerate(gramatiques_no_FNC, start=5)]
+    casos += [(f"G{i}", GramaticaProbabilistica, gramatica, frases, 'algoritme_pcky')
+              for i, (gramatica, frases) in enumerate(gramatiques_probabilistes, start=9)]
+    cadenes = ["".join(random.Random(i).choice("ab") for _ in range(60)) for i in range(5)]
+    casos.append(("G1 (cadenes de 60 símbols)", Gramatica, gramatiques_simples[0][0], cadenes, 'algoritme_cky'))
+    casos.append(("G5 (FNC, cadenes de 60 símbols)", GramaticaFNC, gramatiques_no_FNC[0][0], cadenes, 'algoritme_cky'))
+    casos.append(("G9 (cadenes de 60 símbols)", GramaticaProbabilistica, gramatiques_probabilistes[0][0], cadenes, 'algoritme_pcky'))
+    casos.append(("Sintètica FNC 300 NT, frases de 30", Gramatica, generar_gramatica_fnc(300, 3000, 500, llavor=30),
+                  generar_frases(500, 30, 3, llavor=30), 'algoritme_cky'))
+    casos.append(("Sintètica general 60 NT (FNC), frases de 20", GramaticaFNC, generar_gramatica_general(60, 300, 100, llavor=20),
+                  generar_frases(100, 20, 5, llavor=20), 'algoritme_cky'))
+    casos.append(("Sintètica probabilística 50 NT, frases de 20", GramaticaProbabilistica,
+                  generar_gramatica_probabilistica(50, 500, 200, llavor=20), generar_frases(200, 20, 5, llavor=20), 'algoritme_pcky'))
+
+    for nom, classe, gramatica, frases, metode in casos:
+        parelles = []
+        temps = []
+        for filtrar in (False, True):
+            gram = classe(gramatica, filtrar_taula=filtrar)
+            analitzar = getattr(gram, metode)
+            total = 0
+            for frase in frases:
+                estadistiques = EstadistiquesAnalisi()
+                analitzar(frase, estadistiques)
+                total += estadistiques.parelles
+            parelles.append(total)
+            temps.append(cronometrar(analitzar, frases, repeticions=3))
+        descartades = 1 - parelles[1] / parelles[0] if parelles[0] else 0.0
+        print(f"{nom}: parelles {parelles[0]} -> {parelles[1]} ({descartades:.0%} descartades), "
+              f"{temps[0] * 1000:.2f} ms -> {temps[1] * 1000:.2f} ms")
+
+def benchmark_estrategia_adaptativa() -> None:
+    """
+    Compara el bucle intern que prova sempre totes les parelles amb l'estratègia adaptativa, que a cada punt de divisió
+    recorre les regles de la part més petita o totes les regles si és més barat (veure Gramatica._combinar).
+    Mostra les comprovacions i el temps de cada variant.
+    """
+    cadenes = ["".join(random.Random(i).choice("ab") for _ in range(60)) for i in range(5)]
+    casos = [
+        ("G1 (cadenes de 60 símbols)", Gramatica, gramatiques_simples[0][0], cadenes, 'algoritme_cky'),
+        ("G5 (FNC, cadenes de 60 símbols)", GramaticaFNC, gramatiques_no_FNC[0][0], cadenes, 'algoritme_cky'),
+        ("G9 (cadenes de 60 símbols)", GramaticaProbabilistica, gramatiques_probabilistes[0][0], cadenes, 'algoritme_pcky'),
+        ("Sintètica general 60 NT (FNC), frases de 20", GramaticaFNC, generar_gramatica_general(60, 300, 100, llavor=20),
+         generar_frases(100, 20, 5, llavor=20), 'algoritme_cky'),
+        ("Sintètica probabilística 50 NT, frases de 20", GramaticaProbabilistica,
+         generar_gramatica_probabilistica(50, 500, 200, llavor=20), generar_frases(200, 20, 5, llavor=20), 'algoritme_pcky'),
+    ]
+    # Paraules amb moltes categories: cel·les amb centenars de no-terminals i poques regles per no-terminal
+    for n_no_terminals, n_regles in ((100, 800), (300, 3000)):
+        casos.append((f"Sintètica densa {n_no_terminals} NT, {n_regles} regles, frases de 12", Gramatica,
+                      generar_gramatica_fnc(n_no_terminals, n_regles, 20, llavor=12, ambiguitat_lexica=(20, 40)),
+                      generar_frases(20, 12, 3, llavor=12), 'algoritme_cky'))
+    casos.append(("Sintètica probabilística densa 100 NT, 800 regles, frases de 12", GramaticaProbabilistica,
+                  generar_gramatica_probabilistica(100, 800, 20, llavor=12, ambiguitat_lexica=(20, 40)),
+                  generar_frases(20, 12, 3, llavor=12), 'algoritme_pcky'))
+
+    for nom, classe, gramatica, frases, metode in casos:
+        comprovacions = []
+        temps = []
+        for adaptativa in (False, True):
+            gram = classe(gramatica)
+            gram.estrategia_adaptativa = adaptativa
+            analitzar = getattr(gram, metode)
+            total = 0
+            for frase in frases:
+                estadistiques = EstadistiquesAnalisi()
+                analitzar(frase, estadistiques)
+                total += estadistiques.parelles
+            comprovacions.append(total)
+            temps.append(cronometrar(analitzar, frases, repeticions=3))
+        print(f"{nom}: comprovacions {comprovacions[0]} -> {comprovacions[1]}, "
+              f"{temps[0] * 1000:.2f} ms -> {temps[1] * 1000:.2f} ms (x{temps[0] / max(temps[1], 1e-9):.2f})")
+
+def benchmark_taula_compacta() -> None:
+    """
+    Compara la memòria de la taula PCKY de diccionaris (algoritme_pcky), dels vectors densos per cel·la
+    (algoritme_pcky_vectorial) i de la taula compacta (algoritme_pcky_compacte) amb frases sintètiques llargues.
+    Mostra el pic de memòria de cada anàlisi (amb tracemalloc) dividit pel nombre d'arestes de la taula, i el temps.
+    """
+    gramatica = GramaticaProbabilistica(generar_gramatica_probabilistica(50, 500, 200, llavor=7))
+    # Amb aquesta gramàtica, les cel·les de les frases llargues tenen gairebé tots els no-terminals
+    for longitud in (50, 75, 100):
+        frase = generar_frases(200, longitud, 1, llavor=longitud)[0]
+        arestes = gramatica._omplir_taula_compacta(frase).arestes
+        linia = [f"Frase de {longitud} paraules, {arestes} arestes:"]
+        for nom, metode in (("diccionaris", gramatica.algoritme_pcky), ("vectorial", gramatica.algoritme_pcky_vectorial),
+                            ("compacta", gramatica.algoritme_pcky_compacte)):
+            tracemalloc.start()
+            try:
+                metode(frase)
+                _, pic = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            temps = cronometrar(metode, [frase])
+            linia.append(f"{nom} {pic / 1024:.0f} KiB ({pic / max(arestes, 1):.0f} B/aresta, {temps * 1000:.0f} ms)")
+        print(" ".join(linia[:1]) + "\n  " + "\n  ".join(linia[1:]))
+
+def benchmark_serialitzacio() -> None:
+    """
+    Compara el temps d'escriure els arbres de moltes anàlisis mostrant-los amb display_arbre (una línia per node),
+    en format del Penn Treebank i en format binari, a fitxers temporals, i el de tornar a llegir el format binari.
+    """
+    gramatica = GramaticaProbabilistica(generar_gramatica_probabilistica(20, 200, 100, llavor=3))
+    arbres = [arbre for arbre in (gramatica.algoritme_pcky(frase).arbre for frase in generar_frases(100, 15, 40, llavor=3))
+              if arbre is not None]
+    arbres = arbres * (2000 // max(len(arbres), 1))
+    nodes = sum(2 * 15 - 1 for _ in arbres)
+    with tempfile.TemporaryDirectory() as directori:
+        def mostrar():
+            with open(os.path.join(directori, 'arbres.txt'), 'w', encoding='utf-8') as fitxer, contextlib.redirect_stdout(fitxer):
+                for arbre in arbres:
+                    gramatica.display_arbre(arbre)
+
+        def penn():
+            with open(os.path.join(directori, 'arbres.mrg'), 'w', encoding='utf-8') as fitxer, EscriptorParentitzat(fitxer) as escriptor:
+                escriptor.escriure_tots(arbres)
+
+        ruta_binari = os.path.join(directori, 'arbres.bin')
+        def binari():
+            with open(ruta_binari, 'wb') as fitxer, EscriptorArbresBinari(fitxer) as escriptor:
+                escriptor.escriure_tots(arbres)
+
+        def llegir():
+            with open(ruta_binari, 'rb') as fitxer:
+                for _ in llegir_arbres_binari(fitxer):
+                    pass
+
+        print(f"{len(arbres)} arbres de 15 paraules ({nodes} nodes):")
+        for nom, funcio in (("display_arbre", mostrar), ("Penn Treebank", penn), ("binari", binari), ("lectura binari", llegir)):
+            temps = cronometrar(lambda _: funcio(), [None])
+            print(f"  {nom:<15} {temps * 1000:8.1f} ms ({nodes / temps:,.0f} nodes/s)")
+        print(f"  mida: Penn Treebank {os.path.getsize(os.path.join(directori, 'arbres.mrg')) / 1024:.0f} KiB, "
+              f"binari {os.path.getsize(ruta_binari) / 1024:.0f} KiB")
+
+# Escenaris sintètics de la suite: mida de la gramàtica i de les frases.
+ESCENARIS = [
+    {'n_no_terminals': 20, 'n_regles': 200, 'mida_lexic': 100, 'longitud': 10, 'n_frases': 10},
+    {'n_no_terminals': 50, 'n_regles': 500, 'mida_lexic': 200, 'longitud': 20, 'n_frases': 5},
+    {'n_no_terminals': 300, 'n_regles': 3000, 'mida_lexic': 500, 'longitud': 40, 'n_frases': 3},
+    {'n_no_terminals': 300, 'n_regles': 3000, 'mida_lexic': 500, 'longitud': 80, 'n_frases': 2},
+]
+ESCENARIS_RAPIDS = ESCENARIS[:2]
+
+def mesurar(nom: str, fase: str, parametres: Dict, executar: Callable[[], None], repeticions: int) -> Dict:
+    """
+    Mesura una operació de la suite: temps de cada repetició (sense traçar la memòria) i, en una execució a part
+    amb tracemalloc, el pic de memòria reservada.
+    :param nom: Nom de la mesura (identifica la mateixa mesura entre execucions).
+    :param fase: 'cky', 'fnc' o 'pcky'.
+    :param parametres: Paràmetres de l'escenari, que es desen amb el resultat.
+    :param executar: Funció sense arguments que fa l'operació mesurada.
+    :param repeticions: Nombre de repeticions cronometrades.
+    """
+    temps = []
+    for _ in range(repeticions):
+        inici = time.perf_counter()
+        executar()
+        temps.append(time.perf_counter() - inici)
+
+    tracemalloc.start()
+    try:
+        executar()
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'nom': nom,
+        'fase': fase,
+        'parametres': parametres,
+        'repeticions': repeticions,
+        'temps_minim_s': min(temps),
+        'temps_mitja_s': statistics.mean(temps),
+        'memoria_pic_bytes': pic,
+    }
+
+def _analitzar_totes(funcio: Callable, frases: List) -> Callable[[], None]:
+    """ Retorna una funció que analitza totes les frases amb la funció donada. """
+    def executar() -> None:
+        for frase in frases:
+            funcio(frase)
+    return executar
+
+def executar_suite(escenaris: List[Dict] = ESCENARIS, repeticions: int = 3) -> List[Dict]:
+    """
+    Executa la suite de rendiment: l'algoritme CKY, la conversió a FNC i l'algoritme PCKY, cadascun per separat,
+    amb les gramàtiques G1-G12 de gramatiques.py i amb gramàtiques sintètiques dels escenaris donats.
+    :return: Llista de resultats (un diccionari per mesura).
+    """
+    resultats = []
+
+    # Gramàtiques de gramatiques.py
+    for i, (gramatica, frases) in enumerate(gramatiques_simples, start=1):
+        gram = Gramatica(gramatica)
+        resultats.append(mesurar(f"cky/G{i}", 'cky', {'frases': len(frases)}, _analitzar_totes(gram.algoritme_cky, frases), repeticions))
+    for i, (gramatica, _) in enumerate(gramatiques_no_FNC, start=5):
+        resultats.append(mesurar(f"fnc/G{i}", 'fnc', {}, lambda gramatica=gramatica: GramaticaFNC(gramatica), repeticions))
+    for i, (gramatica, frases) in enumerate(gramatiques_probabilistes, start=9):
+        gram = GramaticaProbabilistica(gramatica)
+        resultats.append(mesurar(f"pcky/G{i}", 'pcky', {'frases': len(frases)}, _analitzar_totes(gram.algoritme_pcky, frases), repeticions))
+
+    # Gramàtiques sintètiques
+    gramatiques_convertides = set()
+    for escenari in escenaris:
+        mida = f"{escenari['n_no_terminals']}nt-{escenari['n_regles']}r-{escenari['mida_lexic']}w"
+        gramatica_args = (escenari['n_no_terminals'], escenari['n_regles'], escenari['mida_lexic'])
+        frases = generar_frases(escenari['mida_lexic'], escenari['longitud'], escenari['n_frases'], llavor=escenari['longitud'])
+
+        gram = Gramatica(generar_gramatica_fnc(*gramatica_args, llavor=1))
+        resultats.append(mesurar(f"cky/{mida}-n{escenari['longitud']}", 'cky', escenari,
+                                 _analitzar_totes(gram.algoritme_cky, frases), repeticions))
+
+        # La conversió a FNC només depèn de la gramàtica, no de la longitud de les frases
+        if mida not in gramatiques_convertides:
+            gramatiques_convertides.add(mida)
+            general = generar_gramatica_general(*gramatica_args, llavor=1)
+            parametres = {clau: valor for clau, valor in escenari.items() if clau not in ('longitud', 'n_frases')}
+            resultats.append(mesurar(f"fnc/{mida}", 'fnc', parametres, lambda general=general: GramaticaFNC(general), repeticions))
+
+        gram = GramaticaProbabilistica(generar_gramatica_probabilistica(*gramatica_args, llavor=1))
+        resultats.append(mesurar(f"pcky/{mida}-n{escenari['longitud']}", 'pcky', escenari,
+                                 _analitzar_totes(gram.algoritme_pcky, frases), repeticions))
+
+    return resultats
+
+def metadades() -> Dict:
+    """
+    Informació de l'entorn d'execució, per poder interpretar les comparacions entre execucions.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementacio': platform.python_implementation(),
+        'plataforma': platform.platform(),
+        'commit': commit,
+    }
+
+def comparar(anteriors: List[Dict], actuals: List[Dict]) -> None:
+    """
+    Mostra la relació de temps i memòria entre dues execucions de la suite, mesura a mesura.
+    """
+    per_nom = {resultat['nom']: resultat for resultat in anteriors}
+    for resultat in actuals:
+        anterior = per_nom.get(resultat['nom'])
+        if anterior is None:
+            continue
+        relacio_temps = resultat['temps_minim_s'] / max(anterior['temps_minim_s'], 1e-12)
+        relacio_memoria = resultat['memoria_pic_bytes'] / max(anterior['memoria_pic_bytes'], 1)
+        print(f"{resultat['nom']:<40} temps x{relacio_temps:.2f}  memòria x{relacio_memoria:.2f}")
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Suite de rendiment de CKY, la conversió a FNC i PCKY.")
+    arguments.add_argument('--sortida', default='benchmark.json', help="Fitxer JSON on es desen els resultats.")
+    arguments.add_argument('--comparar', help="Fitxer JSON d'una execució anterior amb què comparar els resultats.")
+    arguments.add_argument('--repeticions', type=int, default=3, help="Repeticions cronometrades de cada mesura.")
+    arguments.add_argument('--rapid', action='store_true', help="Només els escenaris sintètics petits.")
+    arguments.add_argument('--variants', action='store_true', help="Compara també les variants optimitzades dels algoritmes.")
+    opcions = arguments.parse_args()
+
+    resultats = executar_suite(ESCENARIS_RAPIDS if opcions.rapid else ESCENARIS, opcions.repeticions)
+    with open(opcions.sortida, 'w', encoding='utf-8') as fitxer:
+        json.dump({'metadades': metadades(), 'resultats': resultats}, fitxer, indent=2, ensure_ascii=False)
+
+    for resultat in resultats:
+        print(f"{resultat['nom']:<40} {resultat['temps_minim_s'] * 1000:10.2f} ms {resultat['memoria_pic_bytes'] / 1024:10.1f} KiB")
+
+    if opcions.comparar:
+        with open(opcions.comparar, encoding='utf-8') as fitxer:
+            print(f"\nComparació amb {opcions.comparar}:")
+            comparar(json.load(fitxer)['resultats'], resultats)
+
+    if opcions.variants:
+        benchmark_cky_compilat()
+        benchmark_cky_matricial()
+        benchmark_lots_mateixa_longitud()
+        benchmark_pcky_vectorial()
+        benchmark_taula_compacta()
+        benchmark_cache_gramatiques()
+        benchmark_compilador_fnc()
+        benchmark_cache_subcadenes()
+        benchmark_filtre_taula()
+        benchmark_estrategia_adaptativa()
+        benchmark_serialitzacio()
@@ -0,0 +1,182 @@
+from typing import Any, Iterator, List, Optional, Tuple, Union
+from array import array
+import random
+
+class BoscCompartit():
+    """
+    Bosc compartit (packed shared forest) amb totes les derivacions d'una frase.
+    Cada node és un no-terminal que cobreix una subcadena (no_terminal, inici, fi), amb fi exclòs, i només hi ha
+    els nodes que formen part d'alguna derivació completa des del símbol arrel. Els nodes de longitud 1 són fulles
+    (A -> paraula); la resta tenen una hiperaresta per cada divisió i regla A -> B C que els deriva.
+    Les dades es guarden en vectors (array) amb format CSR:
+    - no_terminals, inicis, finals: un element per node. Els nodes estan ordenats per longitud, de manera que
+      els fills sempre tenen un índex menor que el pare, i l'arrel és l'últim node.
+    - primera_aresta: les hiperarestes del node v són les d'índex primera_aresta[v] fins a primera_aresta[v + 1] (exclòs).
+    - fills_esq, fills_dre: índexs dels nodes fills de cada hiperaresta.
+    """
+    def __init__(self, frase: Union[List[str], str], noms: List[str], nodes: List[Tuple[int, int, int]],
+                 arestes: List[List[Tuple[int, int]]]) -> None:
+        """
+        :param frase: Frase analitzada.
+        :param noms: Nom de cada identificador de no-terminal.
+        :param nodes: Nodes (id del no-terminal, inici, fi), ordenats de manera que els fills van abans que els pares.
+        :param arestes: Per a cada node, la llista de parells (fill esquerre, fill dret) amb els índexs dels nodes fills.
+        """
+        self.frase = frase
+        self.noms = noms
+        self.no_terminals = array('i', (node[0] for node in nodes))
+        self.inicis = array('i', (node[1] for node in nodes))
+        self.finals = array('i', (node[2] for node in nodes))
+        self.primera_aresta = array('i', [0])
+        self.fills_esq = array('i')
+        self.fills_dre = array('i')
+        for arestes_node in arestes:
+            for esq, dre in arestes_node:
+                self.fills_esq.append(esq)
+                self.fills_dre.append(dre)
+            self.primera_aresta.append(len(self.fills_esq))
+        self._comptes = None
+
+    def __len__(self) -> int:
+        """ Nombre de nodes del bosc. """
+        return len(self.no_terminals)
+
+    @property
+    def arrel(self) -> int:
+        """ Índex del node arrel (el símbol arrel sobre tota la frase). """
+        return len(self.no_terminals) - 1
+
+    def nombre_arestes(self) -> int:
+        """ Nombre d'hiperarestes del bosc. """
+        return len(self.fills_esq)
+
+    def node(self, index: int) -> Tuple[str, int, int]:
+        """
+        Retorna el node d'un índex com a (no_terminal, inici, fi).
+        """
+        return self.noms[self.no_terminals[index]], self.inicis[index], self.finals[index]
+
+    def arestes(self, index: int) -> Iterator[Tuple[int, int]]:
+        """
+        Itera sobre les hiperarestes d'un node, com a parells (fill esquerre, fill dret) d'índexs de nodes.
+        Les fulles no en tenen cap.
+        """
+        for aresta in range(self.primera_aresta[index], self.primera_aresta[index + 1]):
+            yield self.fills_esq[aresta], self.fills_dre[aresta]
+
+    def comptes(self) -> List[int]:
+        """
+        Calcula el nombre d'arbres de cada node, en una sola passada de fills a pares i sense enumerar-los.
+        """
+        if self._comptes is None:
+            comptes = []
+            for index in range(len(self.no_terminals)):
+                if self.primera_aresta[index] == self.primera_aresta[index + 1]:
+                    comptes.append(1)
+                else:
+                    comptes.append(sum(comptes[esq] * comptes[dre] for esq, dre in self.arestes(index)))
+            self._comptes = comptes
+        return self._comptes
+
+    def nombre_arbres(self) -> int:
+        """
+        Retorna el nombre d'arbres de derivació de la frase.
+        """
+        return self.comptes()[self.arrel]
+
+    def _fulla(self, index: int) -> dict:
+        no_terminal, inici, _ = self.node(index)
+        return {'no_terminal': no_terminal, 'simbol': self.frase[inici], 'fill': None}
+
+    def _node_intern(self, index: int, fill_esquerra: dict, fill_dreta: dict) -> dict:
+        return {
+            'no_terminal': self.noms[self.no_terminals[index]],
+            'simbol': (fill_esquerra['no_terminal'], fill_dreta['no_terminal']),
+            'fill': [fill_esquerra, fill_dreta]
+        }
+
+    def arbres(self, index: Optional[int] = None) -> Iterator[dict]:
+        """
+        Itera sobre tots els arbres de derivació d'un node (per defecte, l'arrel), construint-los a mesura que es demanen.
+        Els arbres tenen el format de GramaticaProbabilistica.display_arbre, sense probabilitats.
+        """
+        if index is None:
+            index = self.arrel
+        if self.primera_aresta[index] == self.primera_aresta[index + 1]:
+            yield self._fulla(index)
+            return
+        for esq, dre in self.arestes(index):
+            for fill_esquerra in self.arbres(esq):
+                for fill_dreta in self.arbres(dre):
+                    yield self._node_intern(index, fill_esquerra, fill_dreta)
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.arbres()
+
+    def mostrejar(self, generador: Optional[random.Random] = None) -> dict:
+        """
+        Tria un arbre de derivació a l'atzar, amb probabilitat uniforme entre tots els arbres de la frase.
+        Cada hiperaresta es tria amb pes igual al nombre d'arbres que hi passen.
+        :param generador: Generador de nombres aleatoris (per defecte, el del mòdul random).
+        """
+        generador = generador or random
+        comptes = self.comptes()
+
+        def mostrejar_node(index: int) -> dict:
+            if self.primera_aresta[index] == self.primera_aresta[index + 1]:
+                return self._fulla(index)
+            valor = generador.randrange(comptes[index])
+            for esq, dre in self.arestes(index):
+                pes = comptes[esq] * comptes[dre]
+                if valor < pes:
+                    return self._node_intern(index, mostrejar_node(esq), mostrejar_node(dre))
+                valor -= pes
+            raise AssertionError("Els comptes del bosc són inconsistents.")
+
+        return mostrejar_node(self.arrel)
+
+def construir_bosc(gramatica: Any, frase: Union[List[str], str], taula: List[List[int]]) -> Optional[BoscCompartit]:
+    """
+    Construeix el bosc compartit a partir de la taula de màscares de bits de Gramatica._omplir_taula_bits.
+    Recorre la taula des de l'arrel cap avall, de manera que només hi entren els nodes accessibles des de l'arrel.
+    :return: Retorna el bosc, o None si la frase no és derivable.
+    """
+    n = len(frase)
+    id_arrel = gramatica.ids_no_terminals.get(gramatica.simbol_arrel)
+    if id_arrel is None or not taula[n - 1][0] >> id_arrel & 1:
+        return None
+
+    mascares_dretes = gramatica.mascares_dretes
+    regles_bits = gramatica.regles_bits
+    # arestes[(A, inici, fi)] = llista de ((B, inici, divisio), (C, divisio, fi))
+    arestes = {}
+    pendents = [(id_arrel, 0, n)]
+    arestes[pendents[0]] = []
+    while pendents:
+        node = pendents.pop()
+        id_no_terminal, inici, fi = node
+        for divisio in range(inici + 1, fi):
+            part_esq = taula[divisio - inici - 1][inici]
+            part_dre = taula[fi - divisio - 1][divisio]
+            while part_esq:
+                bit_esq = part_esq & -part_esq
+                part_esq ^= bit_esq
+                id_esq = bit_esq.bit_length() - 1
+                candidats = part_dre & mascares_dretes[id_esq]
+                while candidats:
+                    bit_dre = candidats & -candidats
+                    candidats ^= bit_dre
+                    id_dre = bit_dre.bit_length() - 1
+                    if regles_bits[id_esq][id_dre] >> id_no_terminal & 1:
+                        fills = ((id_esq, inici, divisio), (id_dre, divisio, fi))
+                        for fill in fills:
+                            if fill not in arestes:
+                                arestes[fill] = []
+                                pendents.append(fill)
+                        arestes[node].append(fills)
+
+    # Ordenem els nodes per longitud perquè els fills quedin abans que els pares (l'arrel és l'única de longitud n)
+    nodes = sorted(arestes, key=lambda node: (node[2] - node[1], node[1], node[0]))
+    indexs = {node: index for index, node in enumerate(nodes)}
+    noms = list(gramatica.ids_no_terminals)
+    return BoscCompartit(frase, noms, nodes, [[(indexs[esq], indexs[dre]) for esq, dre in arestes[node]] for node in nodes])
@@ -0,0 +1,191 @@
+from typing import Dict, List, Optional, Tuple
+from array import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+# Format binari de les gramàtiques compilades (ja en FNC):
+#   capçalera      MAGIC, versió, tipus, nombre de símbols, de no-terminals i de produccions, id del símbol arrel
+#   símbols        desplaçaments (uint32, nombre de símbols + 1) i els noms codificats en UTF-8
+#   no-terminals   ids dels no-terminals en l'ordre de la gramàtica (int32)
+#   produccions    (no-terminal, aritat, símbol 1, símbol 2) per producció (int32) i la seva probabilitat (float64)
+# Totes les seccions són vectors d'amplada fixa alineats a 8 bytes, de manera que es poden llegir
+# directament del fitxer projectat en memòria (mmap) sense cap anàlisi de text.
+MAGIC = b'CKYG'
+# La versió forma part de la clau de la memòria cau: s'ha d'augmentar quan canvia el format o el resultat de la conversió
+# a FNC (compilador_fnc), perquè les gramàtiques compilades abans no es carreguin com a vàlides.
+VERSIO = 2
+TIPUS_FNC = 0
+TIPUS_PROBABILISTICA = 1
+EXTENSIO = '.ckyg'
+
+_CAPCALERA = struct.Struct('<4sIIIIIi')
+
+def hash_gramatica(normes_gramatica: Dict, simbol_arrel: str, tipus: int) -> str:
+    """
+    Calcula el hash del contingut d'una gramàtica d'entrada, que fem servir com a clau de la memòria cau.
+    :param normes_gramatica: Gramàtica tal com es passa al constructor (abans de la conversió a FNC).
+    :param simbol_arrel: Símbol arrel de la gramàtica.
+    :param tipus: TIPUS_FNC o TIPUS_PROBABILISTICA.
+    """
+    contingut = json.dumps([VERSIO, tipus, simbol_arrel, normes_gramatica], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(contingut.encode('utf-8')).hexdigest()
+
+def ruta_cache(directori: str, normes_gramatica: Dict, simbol_arrel: str, tipus: int) -> str:
+    """
+    Retorna la ruta del fitxer de la memòria cau corresponent a una gramàtica d'entrada.
+    """
+    return os.path.join(directori, hash_gramatica(normes_gramatica, simbol_arrel, tipus) + EXTENSIO)
+
+def carregar_de_cache(ruta: str, tipus: int) -> Optional[Tuple[Dict, str]]:
+    """
+    Carrega una gramàtica de la memòria cau si el fitxer hi és i és compatible.
+    Un fitxer d'una altra versió del format o malmès es tracta com si no hi fos, i el constructor el torna a escriure.
+    :return: Retorna la gramàtica en FNC i el seu símbol arrel, o None si s'ha de tornar a convertir.
+    """
+    if not os.path.exists(ruta):
+        return None
+    try:
+        return carregar_gramatica(ruta, tipus)
+    except (ValueError, IndexError, struct.error):
+        return None
+
+def _alinear(dades: bytearray) -> None:
+    """ Afegeix bytes de farciment fins a un múltiple de 8. """
+    dades.extend(b'\0' * (-len(dades) % 8))
+
+def desar_gramatica(ruta: str, gramatica: Dict, simbol_arrel: str, tipus: int) -> None:
+    """
+    Desa una gramàtica ja en FNC en format binari.
+    L'escriptura és atòmica (fitxer temporal + os.replace), de manera que diversos processos poden omplir la mateixa memòria cau.
+    :param ruta: Fitxer de destinació.
+    :param gramatica: Gramàtica en FNC (produccions [símbols] o ([símbols], probabilitat) segons el tipus).
+    :param simbol_arrel: Símbol arrel de la gramàtica.
+    :param tipus: TIPUS_FNC o TIPUS_PROBABILISTICA.
+    """
+    ids = {}
+    def identificador(simbol: str) -> int:
+        return ids.setdefault(simbol, len(ids))
+
+    no_terminals = array('i', (identificador(no_terminal) for no_terminal in gramatica))
+    produccions = array('i')
+    probabilitats = array('d')
+    for no_terminal, llista in gramatica.items():
+        for produccio in llista:
+            if tipus == TIPUS_PROBABILISTICA:
+                produccio, probabilitat = produccio
+            else:
+                probabilitat = 1.0
+            if isinstance(produccio, str):
+                produccio = [produccio]
+            if len(produccio) > 2:
+                raise ValueError(f"La producció {no_terminal} -> {' '.join(produccio)} no està en FNC.")
+            simbols = [identificador(simbol) for simbol in produccio] + [-1, -1]
+            produccions.extend((ids[no_terminal], len(produccio), simbols[0], simbols[1]))
+            probabilitats.append(probabilitat)
+    id_arrel = identificador(simbol_arrel)
+
+    noms = [simbol.encode('utf-8') for simbol in ids]
+    desplacaments = array('I', [0])
+    for nom in noms:
+        desplacaments.append(desplacaments[-1] + len(nom))
+
+    for vector in (no_terminals, produccions, probabilitats, desplacaments):
+        if sys.byteorder != 'little':
+            vector.byteswap()
+
+    dades = bytearray(_CAPCALERA.pack(MAGIC, VERSIO, tipus, len(ids), len(no_terminals), len(probabilitats), id_arrel))
+    _alinear(dades)
+    dades += desplacaments.tobytes()
+    dades += b''.join(noms)
+    _alinear(dades)
+    dades += no_terminals.tobytes()
+    _alinear(dades)
+    dades += produccions.tobytes()
+    _alinear(dades)
+    dades += probabilitats.tobytes()
+
+    directori = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directori, exist_ok=True)
+    descriptor, ruta_temporal = tempfile.mkstemp(dir=directori, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as fitxer:
+            fitxer.write(dades)
+        os.replace(ruta_temporal, ruta)
+    except BaseException:
+        os.unlink(ruta_temporal)
+        raise
+
+def carregar_gramatica(ruta: str, tipus: int) -> Tuple[Dict, str]:
+    """
+    Carrega una gramàtica desada amb desar_gramatica, llegint-ne les seccions directament del fitxer projectat en memòria.
+    :param ruta: Fitxer de la gramàtica compilada.
+    :param tipus: Tipus de gramàtica esperat (TIPUS_FNC o TIPUS_PROBABILISTICA).
+    :return: Retorna la gramàtica en FNC i el seu símbol arrel.
+    """
+    with open(ruta, 'rb') as fitxer, mmap.mmap(fitxer.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+        vista = memoryview(mapa)
+        try:
+            magic, versio, tipus_fitxer, n_simbols, n_no_terminals, n_produccions, id_arrel = _CAPCALERA.unpack_from(vista)
+            if magic != MAGIC or versio != VERSIO:
+                raise ValueError(f"El fitxer '{ruta}' no és una gramàtica compilada compatible.")
+            if tipus_fitxer != tipus:
+                raise ValueError(f"El fitxer '{ruta}' conté un altre tipus de gramàtica.")
+
+            posicio = _CAPCALERA.size + (-_CAPCALERA.size % 8)
+            desplacaments = _llegir_vector(vista, posicio, 'I', n_simbols + 1)
+            posicio += 4 * (n_simbols + 1)
+            if posicio + desplacaments[-1] > len(vista) or any(a > b for a, b in zip(desplacaments, desplacaments[1:])):
+                raise ValueError(f"El fitxer '{ruta}' té la secció de símbols malmesa.")
+            noms = bytes(vista[posicio:posicio + desplacaments[-1]])
+            simbols = [noms[desplacaments[i]:desplacaments[i + 1]].decode('utf-8') for i in range(n_simbols)]
+            posicio += desplacaments[-1]
+            posicio += -posicio % 8
+
+            no_terminals = _llegir_vector(vista, posicio, 'i', n_no_terminals)
+            posicio += 4 * n_no_terminals
+            posicio += -posicio % 8
+            produccions = _llegir_vector(vista, posicio, 'i', 4 * n_produccions)
+            posicio += 16 * n_produccions
+            posicio += -posicio % 8
+            probabilitats = _llegir_vector(vista, posicio, 'd', n_produccions)
+            if posicio + 8 * n_produccions != len(vista):
+                raise ValueError(f"El fitxer '{ruta}' no té la mida que indica la capçalera.")
+        finally:
+            vista.release()
+
+    # Un fitxer malmès pot tenir ids fora de rang (els negatius indexarien des del final de la llista de símbols)
+    if not 0 <= id_arrel < n_simbols or not all(0 <= id_no_terminal < n_simbols for id_no_terminal in no_terminals):
+        raise ValueError(f"El fitxer '{ruta}' conté ids de símbols fora de rang.")
+    for i in range(n_produccions):
+        no_terminal, aritat, simbol_1, simbol_2 = produccions[4 * i:4 * i + 4]
+        if aritat not in (1, 2) or not all(0 <= simbol < n_simbols for simbol in (no_terminal, simbol_1, simbol_2)[:aritat + 1]):
+            raise ValueError(f"El fitxer '{ruta}' conté una producció malmesa.")
+
+    gramatica = {simbols[id_no_terminal]: [] for id_no_terminal in no_terminals}
+    for i in range(n_produccions):
+        no_terminal, aritat, simbol_1, simbol_2 = produccions[4 * i:4 * i + 4]
+        produccio = [simbols[simbol] for simbol in (simbol_1, simbol_2)[:aritat]]
+        if tipus == TIPUS_PROBABILISTICA:
+            gramatica[simbols[no_terminal]].append((produccio, probabilitats[i]))
+        else:
+            gramatica[simbols[no_terminal]].append(produccio)
+    return gramatica, simbols[id_arrel]
+
+def _llegir_vector(vista: memoryview, posicio: int, codi: str, mida: int) -> List:
+    """
+    Llegeix un vector de valors d'amplada fixa (little-endian) a partir d'una posició del fitxer.
+    Llança ValueError si el fitxer s'acaba abans del final del vector.
+    """
+    if posicio + array(codi).itemsize * mida > len(vista):
+        raise ValueError("El fitxer de la gramàtica compilada està truncat.")
+    if sys.byteorder == 'little':
+        return vista[posicio:posicio + array(codi).itemsize * mida].cast(codi).tolist()
+    vector = array(codi)
+    vector.frombytes(vista[posicio:posicio + vector.itemsize * mida])
+    vector.byteswap()
+    return vector.tolist()
@@ -0,0 +1,111 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import sys
+import threading
+
+class CacheSubcadenes():
+    """
+    Memòria cau LRU de cel·les de la taula CKY indexada per la tupla de paraules de la subcadena.
+    El contingut d'una cel·la només depèn de les paraules que cobreix, de manera que les subcadenes que es repeteixen
+    entre frases (per exemple "in his pajamas") es poden reaprofitar sense tornar-les a calcular.
+    Cada gramàtica ha de tenir la seva pròpia memòria cau: les claus no inclouen la gramàtica.
+    Les operacions estan protegides amb un bloqueig, de manera que la gramàtica es pot continuar fent servir des de diversos fils.
+    """
+    def __init__(self, max_entrades: Optional[int] = 100000, max_bytes: Optional[int] = None, longitud_maxima: Optional[int] = 16) -> None:
+        """
+        :param max_entrades: Nombre màxim de cel·les guardades (None per no limitar-lo).
+        :param max_bytes: Memòria màxima aproximada de les cel·les guardades, en bytes (None per no limitar-la).
+        :param longitud_maxima: Longitud màxima de les subcadenes que es guarden (None per guardar-les totes).
+                                Les subcadenes llargues gairebé no es repeteixen i la seva clau és més cara de calcular.
+        """
+        if max_entrades is not None and max_entrades < 1:
+            raise ValueError("El nombre màxim d'entrades ha de ser com a mínim 1.")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("La memòria màxima ha de ser com a mínim 1 byte.")
+        if longitud_maxima is not None and longitud_maxima < 2:
+            raise ValueError("La longitud màxima de les subcadenes ha de ser com a mínim 2.")
+        self.max_entrades = max_entrades
+        self.max_bytes = max_bytes
+        self.longitud_maxima = longitud_maxima
+        self._inicialitzar()
+
+    def _inicialitzar(self) -> None:
+        self._entrades = OrderedDict()  # clau -> (valor, mida), de menys a més recent
+        self._bloqueig = threading.Lock()
+        self.bytes = 0
+        self.encerts = 0
+        self.errors = 0
+        self.expulsions = 0
+
+    def admet(self, longitud: int) -> bool:
+        """
+        Indica si les subcadenes d'aquesta longitud es guarden a la memòria cau.
+        """
+        return self.longitud_maxima is None or longitud <= self.longitud_maxima
+
+    def obtenir(self, clau: Tuple[str, ...]) -> Any:
+        """
+        Retorna la cel·la guardada per a una subcadena, o None si no hi és.
+        """
+        with self._bloqueig:
+            entrada = self._entrades.get(clau)
+            if entrada is None:
+                self.errors += 1
+                return None
+            self._entrades.move_to_end(clau)
+            self.encerts += 1
+            return entrada[0]
+
+    def desar(self, clau: Tuple[str, ...], valor: Any, mida: int) -> None:
+        """
+        Guarda la cel·la d'una subcadena i, si cal, expulsa les menys usades recentment fins a complir els límits.
+        Els valors guardats es comparteixen entre frases i no s'han de modificar.
+        :param mida: Mida aproximada de la cel·la en bytes.
+        """
+        mida += sys.getsizeof(clau)
+        with self._bloqueig:
+            anterior = self._entrades.pop(clau, None)
+            if anterior is not None:
+                self.bytes -= anterior[1]
+            if self.max_bytes is not None and mida > self.max_bytes:
+                return
+            self._entrades[clau] = (valor, mida)
+            self.bytes += mida
+            while ((self.max_entrades is not None and len(self._entrades) > self.max_entrades)
+                   or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                _, (_, mida_expulsada) = self._entrades.popitem(last=False)
+                self.bytes -= mida_expulsada
+                self.expulsions += 1
+
+    def buidar(self) -> None:
+        """
+        Esborra totes les cel·les guardades i les estadístiques.
+        """
+        with self._bloqueig:
+            self._inicialitzar()
+
+    def estadistiques(self) -> Dict[str, float]:
+        """
+        Retorna les estadístiques d'ús: encerts, errors, expulsions, entrades, bytes i taxa d'encerts.
+        """
+        with self._bloqueig:
+            consultes = self.encerts + self.errors
+            return {
+                'encerts': self.encerts,
+                'errors': self.errors,
+                'expulsions': self.expulsions,
+                'entrades': len(self._entrades),
+                'bytes': self.bytes,
+                'taxa_encerts': self.encerts / consultes if consultes else 0.0
+            }
+
+    def __len__(self) -> int:
+        return len(self._entrades)
+
+    def __getstate__(self) -> Dict[str, Optional[int]]:
+        # Els processos de parse_many reben la configuració i comencen amb la memòria cau buida
+        return {'max_entrades': self.max_entrades, 'max_bytes': self.max_bytes, 'longitud_maxima': self.longitud_maxima}
+
+    def __setstate__(self, estat: Dict[str, Optional[int]]) -> None:
+        self.__dict__.update(estat)
+        self._inicialitzar()
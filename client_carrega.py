@@ -0,0 +1,86 @@
+from typing import Any, Dict, List, Tuple, Union
+import argparse
+import asyncio
+import json
+import time
+
+from servidor import _percentil
+
+async def generar_carrega(host: str, port: int, frases: List[Union[List[str], str]], peticions: int,
+                          concurrencia: int = 16) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Envia peticions d'anàlisi a un servidor (veure servidor.py) des de diverses connexions alhora.
+    Cada connexió envia una petició i espera la resposta abans d'enviar la següent.
+    :param frases: Frases que s'envien, de manera cíclica.
+    :param peticions: Nombre total de peticions.
+    :param concurrencia: Nombre de connexions simultànies.
+    :return: Retorna les respostes (en l'ordre de les peticions) i les estadístiques finals del servidor.
+    """
+    respostes = [None] * peticions
+    seguent = iter(range(peticions))
+
+    async def connexio() -> None:
+        lector, escriptor = await asyncio.open_connection(host, port)
+        try:
+            for index in seguent:
+                peticio = {'id': index, 'frase': frases[index % len(frases)]}
+                inici = time.perf_counter()
+                escriptor.write(json.dumps(peticio, ensure_ascii=False).encode('utf-8') + b'\n')
+                await escriptor.drain()
+                resposta = json.loads(await lector.readline())
+                resposta['latencia_client_ms'] = (time.perf_counter() - inici) * 1000
+                respostes[resposta['id']] = resposta
+        finally:
+            escriptor.close()
+            await escriptor.wait_closed()
+
+    await asyncio.gather(*(connexio() for _ in range(concurrencia)))
+
+    lector, escriptor = await asyncio.open_connection(host, port)
+    escriptor.write(b'{"ordre": "estadistiques"}\n')
+    await escriptor.drain()
+    estadistiques = json.loads(await lector.readline())
+    escriptor.close()
+    await escriptor.wait_closed()
+    return respostes, estadistiques
+
+def llegir_frases(ruta: str) -> List[str]:
+    """
+    Llegeix les frases d'un fitxer de text, una per línia (les línies buides s'ignoren).
+    """
+    with open(ruta, encoding='utf-8') as fitxer:
+        return [linia.strip() for linia in fitxer if linia.strip()]
+
+def frases_exemple(nom: str) -> List[Union[List[str], str]]:
+    """
+    Frases de prova de gramatiques.py associades a la gramàtica amb aquest nom (per exemple 'G11').
+    """
+    import gramatiques
+    gramatica = getattr(gramatiques, nom)
+    for llista in (gramatiques.gramatiques_simples, gramatiques.gramatiques_no_FNC, gramatiques.gramatiques_probabilistes):
+        for candidata, frases in llista:
+            if candidata is gramatica:
+                return frases
+    raise ValueError(f"La gramàtica {nom} no té frases de prova.")
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Generador de càrrega per al servidor d'anàlisi (servidor.py).")
+    font = arguments.add_mutually_exclusive_group(required=True)
+    font.add_argument('--frases', help="Fitxer amb una frase per línia.")
+    font.add_argument('--exemple', help="Fes servir les frases de prova d'una gramàtica de gramatiques.py (per exemple G11).")
+    arguments.add_argument('--host', default='127.0.0.1', help="Adreça del servidor.")
+    arguments.add_argument('--port', type=int, default=8765, help="Port del servidor.")
+    arguments.add_argument('--peticions', type=int, default=1000, help="Nombre total de peticions.")
+    arguments.add_argument('--concurrencia', type=int, default=16, help="Nombre de connexions simultànies.")
+    opcions = arguments.parse_args()
+
+    frases = llegir_frases(opcions.frases) if opcions.frases else frases_exemple(opcions.exemple)
+    inici = time.perf_counter()
+    respostes, estadistiques = asyncio.run(generar_carrega(opcions.host, opcions.port, frases, opcions.peticions, opcions.concurrencia))
+    temps = time.perf_counter() - inici
+
+    latencies = sorted(resposta['latencia_client_ms'] for resposta in respostes)
+    errors = sum('error' in resposta for resposta in respostes)
+    print(f"{len(respostes)} peticions en {temps:.2f} s ({len(respostes) / temps:.0f} peticions/s), {errors} errors")
+    print("Latència al client (ms): " + ", ".join(f"p{p} {_percentil(latencies, p):.2f}" for p in (50, 90, 99)))
+    print(f"Estadístiques del servidor: {json.dumps(estadistiques, ensure_ascii=False)}")
@@ -0,0 +1,232 @@
+from typing import Dict, Iterator, List, Set, Tuple
+from collections import defaultdict
+from itertools import product
+import heapq
+
+# Representació interna del compilador: no_terminal -> {producció (tupla de símbols): probabilitat}.
+# Els diccionaris fan de taula de dispersió per eliminar duplicats en temps constant i mantenen l'ordre d'inserció,
+# de manera que el resultat és determinista. Per a gramàtiques sense probabilitats totes les regles valen 1.0.
+Produccions = Dict[Tuple[str, ...], float]
+
+BUIDES = {(), ('ε',), ('',)}
+
+def compilar_fnc(normes_gramatica: Dict, probabilistica: bool = False) -> Dict:
+    """
+    Transforma una gramàtica a Forma Normal de Chomsky (FNC).
+    Fa els mateixos passos que la conversió original, però amb algorismes que escalen a gramàtiques grans:
+    - els no-terminals buits es calculen amb una llista de treball en lloc de recórrer tota la gramàtica a cada iteració,
+    - les regles unitàries s'eliminen amb la clausura del graf de regles unitàries (producte de probabilitats màxim),
+    - els duplicats s'eliminen amb diccionaris i els prefixos de les regles llargues es comparteixen.
+    :param normes_gramatica: Gramàtica amb produccions [símbols], o ([símbols], probabilitat) si és probabilística.
+    :param probabilistica: Indica si les produccions porten probabilitat.
+    :return: Retorna la gramàtica en FNC amb el mateix format que l'entrada.
+    """
+    gramatica = _normalitzar(normes_gramatica, probabilistica)
+    gramatica = eliminar_produccions_buides(gramatica)
+    gramatica = eliminar_regles_unitaries(gramatica)
+    gramatica = convertir_regles_terminals(gramatica)
+    gramatica = convertir_regles_llargues(gramatica)
+
+    if probabilistica:
+        return {no_terminal: [(list(produccio), probabilitat) for produccio, probabilitat in produccions.items()]
+                for no_terminal, produccions in gramatica.items()}
+    return {no_terminal: [list(produccio) for produccio in produccions] for no_terminal, produccions in gramatica.items()}
+
+def _normalitzar(normes_gramatica: Dict, probabilistica: bool) -> Dict[str, Produccions]:
+    """
+    Passa la gramàtica a la representació interna del compilador.
+    Si una producció apareix repetida ens quedem amb la probabilitat més alta.
+    """
+    gramatica = {}
+    for no_terminal, produccions in normes_gramatica.items():
+        noves_produccions = {}
+        for produccio in produccions:
+            probabilitat = 1.0
+            if probabilistica:
+                produccio, probabilitat = produccio
+            produccio = (produccio,) if isinstance(produccio, str) else tuple(produccio)
+            if probabilitat > noves_produccions.get(produccio, -1.0):
+                noves_produccions[produccio] = probabilitat
+        gramatica[no_terminal] = noves_produccions
+    return gramatica
+
+def calcular_buides(gramatica: Dict[str, Produccions]) -> Set[str]:
+    """
+    Calcula els no-terminals que poden derivar a la cadena buida amb una llista de treball.
+    Per a cada producció comptem quants símbols encara no sabem si són buits; quan el comptador arriba a 0,
+    el no-terminal de la part esquerra és buit. Cada producció es visita un cop per símbol.
+    """
+    pendents = []  # comptador de símbols no buits de cada producció
+    caps = []  # no-terminal de la part esquerra de cada producció
+    aparicions = defaultdict(list)  # símbol -> produccions on apareix (amb repeticions)
+    buides = set()
+    treball = []
+
+    for no_terminal, produccions in gramatica.items():
+        for produccio in produccions:
+            if produccio in BUIDES:
+                if no_terminal not in buides:
+                    buides.add(no_terminal)
+                    treball.append(no_terminal)
+                continue
+            index = len(caps)
+            caps.append(no_terminal)
+            pendents.append(len(produccio))
+            for simbol in produccio:
+                aparicions[simbol].append(index)
+
+    while treball:
+        simbol = treball.pop()
+        for index in aparicions.pop(simbol, ()):
+            pendents[index] -= 1
+            if pendents[index] == 0 and caps[index] not in buides:
+                buides.add(caps[index])
+                treball.append(caps[index])
+
+    return buides
+
+def _combinacions(produccio: Tuple[str, ...], buides: Set[str]) -> Iterator[Tuple[str, ...]]:
+    """
+    Genera, sense repeticions, totes les variants d'una producció que ometen algun dels seus símbols buits.
+    """
+    opcions = [((simbol,), ()) if simbol in buides else ((simbol,),) for simbol in produccio]
+    vistes = set()
+    for eleccio in product(*opcions):
+        combinacio = tuple(simbol for part in eleccio for simbol in part)
+        if combinacio not in vistes:
+            vistes.add(combinacio)
+            yield combinacio
+
+def eliminar_produccions_buides(gramatica: Dict[str, Produccions]) -> Dict[str, Produccions]:
+    """
+    Elimina les produccions buides (A -> ε) afegint les variants de cada producció sense els seus símbols buits.
+    Si B -> A C i A és buit, B passa a tenir també B -> C. Les probabilitats de variants idèntiques se sumen.
+    """
+    buides = calcular_buides(gramatica)
+    nova_gramatica = {}
+    for no_terminal, produccions in gramatica.items():
+        noves_produccions = {}
+        for produccio, probabilitat in produccions.items():
+            if produccio in BUIDES:
+                continue
+            for combinacio in _combinacions(produccio, buides):
+                if combinacio not in BUIDES:
+                    noves_produccions[combinacio] = noves_produccions.get(combinacio, 0.0) + probabilitat
+        nova_gramatica[no_terminal] = noves_produccions
+    return nova_gramatica
+
+def _clausura_unitaria(gramatica: Dict[str, Produccions], origen: str) -> List[Tuple[str, float]]:
+    """
+    Calcula els no-terminals accessibles des d'origen només amb regles unitàries (A -> B), amb la probabilitat
+    del millor camí (producte màxim de probabilitats, calculat amb l'algorisme de Dijkstra).
+    :return: Llista de parells (no-terminal, probabilitat) sense l'origen, en ordre d'aparició des de l'origen.
+    """
+    millors = {origen: 1.0}
+    ordre = []
+    cua = [(-1.0, 0, origen)]
+    comptador = 1
+    visitats = set()
+    while cua:
+        negatiu, _, no_terminal = heapq.heappop(cua)
+        if no_terminal in visitats:
+            continue
+        visitats.add(no_terminal)
+        for produccio, probabilitat_regla in gramatica[no_terminal].items():
+            if len(produccio) == 1 and produccio[0] in gramatica:
+                desti = produccio[0]
+                nova = -negatiu * probabilitat_regla
+                if desti not in millors:
+                    ordre.append(desti)
+                if nova > millors.get(desti, -1.0):
+                    millors[desti] = nova
+                    heapq.heappush(cua, (-nova, comptador, desti))
+                    comptador += 1
+    return [(no_terminal, millors[no_terminal]) for no_terminal in ordre if no_terminal != origen]
+
+def eliminar_regles_unitaries(gramatica: Dict[str, Produccions]) -> Dict[str, Produccions]:
+    """
+    Elimina les regles unitàries (A -> B): A rep totes les produccions no unitàries dels no-terminals de la seva clausura,
+    multiplicades per la probabilitat del camí. Si una producció arriba per més d'un camí ens quedem amb la més probable.
+    Per exemple, si tenim A -> B (p=0.5) i B -> C D (p=0.8), llavors A es converteix en A -> C D (p=0.4).
+    """
+    def es_unitaria(produccio: Tuple[str, ...]) -> bool:
+        return len(produccio) == 1 and produccio[0] in gramatica
+
+    nova_gramatica = {}
+    for no_terminal, produccions in gramatica.items():
+        noves_produccions = {produccio: probabilitat for produccio, probabilitat in produccions.items() if not es_unitaria(produccio)}
+        for desti, probabilitat_cami in _clausura_unitaria(gramatica, no_terminal):
+            for produccio, probabilitat in gramatica[desti].items():
+                if not es_unitaria(produccio):
+                    nova_probabilitat = probabilitat_cami * probabilitat
+                    if nova_probabilitat > noves_produccions.get(produccio, -1.0):
+                        noves_produccions[produccio] = nova_probabilitat
+        nova_gramatica[no_terminal] = noves_produccions
+    return nova_gramatica
+
+def _nom_lliure(gramatica: Dict, prefix: str, contador: int) -> Tuple[str, int]:
+    """
+    Retorna el primer nom prefix + número (a partir de contador) que no és ja un no-terminal de la gramàtica.
+    """
+    while f"{prefix}{contador}" in gramatica:
+        contador += 1
+    return f"{prefix}{contador}", contador + 1
+
+def convertir_regles_terminals(gramatica: Dict[str, Produccions]) -> Dict[str, Produccions]:
+    """
+    Converteix regles com (A -> a B) en (A -> T1 B) amb un nou no-terminal per terminal (T1 -> a).
+    Pressuposa que les regles terminals estan escrites en minúscules, com la conversió original.
+    """
+    contador = 1
+    mapa_terminals = {}
+    nova_gramatica = {}
+    noves_regles = {}
+
+    for no_terminal, produccions in gramatica.items():
+        noves_produccions = {}
+        for produccio, probabilitat in produccions.items():
+            if len(produccio) > 1:
+                nova_produccio = []
+                for simbol in produccio:
+                    if simbol.islower():
+                        if simbol not in mapa_terminals:
+                            nou_no_terminal, contador = _nom_lliure(gramatica, "T", contador)
+                            mapa_terminals[simbol] = nou_no_terminal
+                            noves_regles[nou_no_terminal] = {(simbol,): 1.0}
+                        simbol = mapa_terminals[simbol]
+                    nova_produccio.append(simbol)
+                produccio = tuple(nova_produccio)
+            if probabilitat > noves_produccions.get(produccio, -1.0):
+                noves_produccions[produccio] = probabilitat
+        nova_gramatica[no_terminal] = noves_produccions
+
+    nova_gramatica.update(noves_regles)
+    return nova_gramatica
+
+def convertir_regles_llargues(gramatica: Dict[str, Produccions]) -> Dict[str, Produccions]:
+    """
+    Converteix les regles de més de dos símbols en regles binàries.
+    Per exemple, A -> B C D es converteix en A -> X1 D i X1 -> B C. Les regles llargues que comparteixen prefix
+    comparteixen també els nous no-terminals (X1 -> B C amb probabilitat 1.0 serveix per a totes).
+    """
+    contador = 1
+    prefixos = {}  # (B, C) -> X
+    nova_gramatica = {}
+    noves_regles = {}
+
+    for no_terminal, produccions in gramatica.items():
+        noves_produccions = {}
+        for produccio, probabilitat in produccions.items():
+            while len(produccio) > 2:
+                prefix = produccio[:2]
+                if prefix not in prefixos:
+                    nou_no_terminal, contador = _nom_lliure(gramatica, "X", contador)
+                    prefixos[prefix] = nou_no_terminal
+                    noves_regles[nou_no_terminal] = {prefix: 1.0}
+                produccio = (prefixos[prefix],) + produccio[2:]
+            if probabilitat > noves_produccions.get(produccio, -1.0):
+                noves_produccions[produccio] = probabilitat
+        nova_gramatica[no_terminal] = noves_produccions
+
+    nova_gramatica.update(noves_regles)
+    return nova_gramatica
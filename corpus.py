@@ -0,0 +1,130 @@
+from typing import Any, Dict, IO, Iterator, List, Optional, Union
+import argparse
+import json
+import sys
+import time
+
+from lots import analitzar_flux
+from serialitzacio import EscriptorArbresBinari, EscriptorParentitzat, arbre_parentitzat
+from servidor import carregar_gramatica
+
+# Mode d'anàlisi -> (tipus de gramàtica de carregar_gramatica, mètode d'anàlisi)
+MODES = {
+    'reconeixement': ('cky', 'algoritme_cky_compilat'),
+    'fnc': ('fnc', 'algoritme_cky_compilat'),
+    'pcky': ('probabilistica', 'algoritme_pcky'),
+}
+
+def llegir_frases(fitxer: IO[str], caracters: bool = False) -> Iterator[Union[List[str], str]]:
+    """
+    Llegeix les frases d'un fitxer obert, una per línia i sense carregar-lo sencer a memòria.
+    Cada línia es parteix en paraules com fa processa_frases; les línies buides s'ignoren.
+    :param caracters: Si és True, les frases es parteixen en caràcters (com frases_ab).
+    """
+    for linia in fitxer:
+        frase = linia.strip()
+        if frase:
+            yield [caracter for caracter in frase if not caracter.isspace()] if caracters else frase.split()
+
+def registre(index: int, frase: List[str], resultat: Any, segons: float, separador: str = ' ',
+             amb_arbre: bool = True) -> Dict[str, Any]:
+    """
+    Construeix la línia de sortida d'una frase a partir del resultat de l'anàlisi.
+    :param resultat: Resultat d'algoritme_cky_compilat (bool) o d'algoritme_pcky, o None si la frase s'ha omès.
+    :param separador: Separador amb què s'uneixen les paraules de la frase a la sortida.
+    :param amb_arbre: Si és False, la línia no porta l'arbre (quan els arbres s'escriuen en un fitxer a part).
+    """
+    sortida = {'index': index, 'frase': separador.join(frase)}
+    if resultat is None:
+        sortida['omesa'] = True
+        return sortida
+    if isinstance(resultat, bool):
+        sortida['derivable'] = resultat
+    else:
+        sortida['derivable'] = resultat.derivable
+        sortida['probabilitat'] = resultat.probabilitat
+        if amb_arbre:
+            sortida['arbre'] = arbre_parentitzat(resultat.arbre)
+    sortida['temps_ms'] = round(segons * 1000, 3)
+    return sortida
+
+def processar_corpus(gramatica: Any, metode: str, entrada: IO[str], sortida: IO[str], workers: Optional[int] = 1,
+                     chunksize: int = 64, ordenat: bool = True, longitud_maxima: Optional[int] = None,
+                     caracters: bool = False, arbres: Optional[Any] = None) -> Dict[str, float]:
+    """
+    Analitza totes les frases d'entrada i escriu una línia JSON per frase a sortida.
+    Només hi ha a memòria les frases dels fragments en curs (veure lots.analitzar_flux).
+    :param arbres: Escriptor d'arbres de serialitzacio (EscriptorParentitzat o EscriptorArbresBinari). Si n'hi ha,
+        els arbres s'hi escriuen en el mateix ordre que les línies de sortida (None per a les frases sense arbre),
+        i les línies JSON no els porten.
+    :return: Retorna el resum de l'execució: frases, derivables, omeses, segons i frases per segon.
+    """
+    frases = {}  # frases en curs, per escriure-les a la sortida
+    def registrar(flux: Iterator[List[str]]) -> Iterator[List[str]]:
+        for index, frase in enumerate(flux):
+            frases[index] = frase
+            yield frase
+
+    resum = {'frases': 0, 'derivables': 0, 'omeses': 0}
+    inici = time.perf_counter()
+    for index, resultat, segons in analitzar_flux(gramatica, metode, registrar(llegir_frases(entrada, caracters)), workers=workers,
+                                                  chunksize=chunksize, ordenat=ordenat, longitud_maxima=longitud_maxima):
+        linia = registre(index, frases.pop(index), resultat, segons, '' if caracters else ' ', amb_arbre=arbres is None)
+        if arbres is not None:
+            arbres.escriure(getattr(resultat, 'arbre', None))
+        sortida.write(json.dumps(linia, ensure_ascii=False))
+        sortida.write('\n')
+        resum['frases'] += 1
+        resum['omeses'] += linia.get('omesa', False)
+        resum['derivables'] += linia.get('derivable', False)
+    if arbres is not None:
+        arbres.buidar()
+    resum['segons'] = time.perf_counter() - inici
+    resum['frases_per_segon'] = resum['frases'] / resum['segons'] if resum['segons'] else 0.0
+    return resum
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Analitza un corpus (una frase per línia) i escriu una línia JSON per frase.")
+    font = arguments.add_mutually_exclusive_group(required=True)
+    font.add_argument('--gramatica', help="Gramàtica compilada (.ckyg) o gramàtica en JSON.")
+    font.add_argument('--exemple', help="Nom d'una gramàtica de gramatiques.py (per exemple G11).")
+    arguments.add_argument('--mode', choices=list(MODES), default='pcky',
+                           help="reconeixement (gramàtica ja en FNC), fnc (conversió a FNC i CKY) o pcky (probabilitat i arbre).")
+    arguments.add_argument('--simbol-arrel', default='S', help="Símbol arrel de la gramàtica.")
+    arguments.add_argument('--entrada', help="Fitxer de frases (per defecte, l'entrada estàndard).")
+    arguments.add_argument('--sortida', help="Fitxer JSONL de sortida (per defecte, la sortida estàndard).")
+    arguments.add_argument('--workers', type=int, default=1, help="Nombre de processos (0 per fer-ne servir un per CPU).")
+    arguments.add_argument('--chunksize', type=int, default=64, help="Nombre de frases per fragment enviat a un procés.")
+    arguments.add_argument('--desordenat', action='store_true', help="Escriu els resultats a mesura que acaben, no en l'ordre de l'entrada.")
+    arguments.add_argument('--longitud-maxima', type=int, help="Omet les frases amb més paraules que aquest límit.")
+    arguments.add_argument('--caracters', action='store_true', help="Parteix les frases en caràcters en lloc de paraules.")
+    arguments.add_argument('--arbres', help="Fitxer on s'escriuen els arbres, en lloc de posar-los a les línies JSON.")
+    arguments.add_argument('--format-arbres', choices=['penn', 'binari'], default='binari',
+                           help="penn (un arbre amb parèntesis per línia) o binari (veure serialitzacio.llegir_arbres_binari).")
+    opcions = arguments.parse_args()
+
+    tipus, metode = MODES[opcions.mode]
+    gramatica = carregar_gramatica(opcions.gramatica, tipus, opcions.simbol_arrel, opcions.exemple)
+    entrada = open(opcions.entrada, encoding='utf-8') if opcions.entrada else sys.stdin
+    sortida = open(opcions.sortida, 'w', encoding='utf-8') if opcions.sortida else sys.stdout
+    fitxer_arbres, arbres = None, None
+    if opcions.arbres:
+        if opcions.format_arbres == 'binari':
+            fitxer_arbres = open(opcions.arbres, 'wb')
+            arbres = EscriptorArbresBinari(fitxer_arbres)
+        else:
+            fitxer_arbres = open(opcions.arbres, 'w', encoding='utf-8')
+            arbres = EscriptorParentitzat(fitxer_arbres)
+    try:
+        resum = processar_corpus(gramatica, metode, entrada, sortida, workers=opcions.workers or None, chunksize=opcions.chunksize,
+                                 ordenat=not opcions.desordenat, longitud_maxima=opcions.longitud_maxima, caracters=opcions.caracters,
+                                 arbres=arbres)
+    finally:
+        if opcions.entrada:
+            entrada.close()
+        if opcions.sortida:
+            sortida.close()
+        if fitxer_arbres is not None:
+            fitxer_arbres.close()
+    print(f"{resum['frases']} frases ({resum['derivables']} derivables, {resum['omeses']} omeses) en {resum['segons']:.2f} s "
+          f"({resum['frases_per_segon']:.0f} frases/s)", file=sys.stderr)
@@ -1,147 +1,58 @@
-from typing import List, Dict, Tuple, Set
+from typing import Dict, Optional
 from main_cky import Gramatica
+from cache_subcadenes import CacheSubcadenes
+from compilador_fnc import compilar_fnc
 from copy import deepcopy
+import cache_gramatiques
 
 class GramaticaFNC(Gramatica):
-    def __init__(self, normes_gramatica: Dict, simbol_arrel: str = 'S') -> None:
-        # Transforma la gramàtica a Forma Normal de Chomsky i inicialitza la classe base
+    def __init__(self, normes_gramatica: Dict, simbol_arrel: str = 'S', directori_cache: Optional[str] = None,
+                 cache_subcadenes: Optional[CacheSubcadenes] = None, filtrar_taula: bool = True) -> None:
+        """
+        Transforma la gramàtica a Forma Normal de Chomsky i inicialitza la classe base.
+        :param directori_cache: Si s'indica, la gramàtica convertida es desa en aquest directori, amb el hash del contingut
+                                com a clau, i les construccions següents amb la mateixa gramàtica la carreguen sense convertir-la.
+        :param cache_subcadenes: Memòria cau de cel·les per subcadena (veure Gramatica).
+        :param filtrar_taula: Filtre de la taula a partir de l'estructura de la gramàtica (veure Gramatica).
+        """
+        ruta = None
+        if directori_cache is not None:
+            ruta = cache_gramatiques.ruta_cache(directori_cache, normes_gramatica, simbol_arrel, cache_gramatiques.TIPUS_FNC)
+            carregada = cache_gramatiques.carregar_de_cache(ruta, cache_gramatiques.TIPUS_FNC)
+            if carregada is not None:
+                self.gramatica, simbol_arrel = carregada
+                self._inicialitzar_taules(simbol_arrel, cache_subcadenes, filtrar_taula)
+                return
+
         self.gramatica = deepcopy(normes_gramatica)
         self._forma_normal_chomsky()
-        super().__init__(self.gramatica, simbol_arrel)
-        
-    def _forma_normal_chomsky(self) -> None:
-        """
-        Transforma la gramàtica a Forma Normal de Chomsky (FNC).
-        :return: Retorna True si la transformació s'ha completat correctament.
-        """
-        self.__eliminar_produccions_buides() # (A -> ε)
-        self.__eliminar_regles_unitaries() # (A -> B)
-        self.__convertir_regles_terminals() # A -> a
-        self.__convertir_regles_llargues() # (A -> BC...Z)
-    
-    def __generar_combinacions(self, produccio: List[str], buides: Set[str]) -> Set[Tuple[str]]:
-        """
-        Genera totes les combinacions possibles de produccions eliminant els no-terminals que són buits.
-        :param produccio: Producció original.
-        :param buides: Conjunt de no-terminals que poden derivar a la cadena buida.
-        :return: Un conjunt de tuples amb les noves produccions.
-        """
-        if not produccio:
-            return {tuple()}
+        super().__init__(self.gramatica, simbol_arrel, cache_subcadenes, filtrar_taula)
+        if ruta is not None:
+            self.desar_compilada(ruta)
 
-        resultats = set()
-        resultats.add(tuple(produccio)) # Sempre inclou la producció original
- 
-        for i in range(len(produccio)): # Itera sobre cada símbol de la producció
-            if produccio[i] in buides:
-                sub_combinations = self.__generar_combinacions(produccio[:i] + produccio[i+1:], buides)
-                resultats.update(sub_combinations) # Genera combinacions sense aquest símbol si és buit
-
-        return resultats
-
-    def __eliminar_produccions_buides(self):
+    @classmethod
+    def from_compiled(cls, ruta: str, cache_subcadenes: Optional[CacheSubcadenes] = None, filtrar_taula: bool = True) -> 'GramaticaFNC':
         """
-        Elimina produccions buides de la gramàtica (A -> ε)
-        Aquesta funció identifica els no-terminals que poden derivar a la cadena buida i elimina les produccions que només contenen aquests no-terminals. 
-        Per exemple, si tenim A -> ε i B -> A C, llavors B es converteix en B -> C.
+        Crea la gramàtica a partir d'un fitxer desat amb desar_compilada, sense tornar a fer la conversió a FNC.
+        :param ruta: Fitxer de la gramàtica compilada.
+        :param cache_subcadenes: Memòria cau de cel·les per subcadena (veure Gramatica).
+        :param filtrar_taula: Filtre de la taula a partir de l'estructura de la gramàtica (veure Gramatica).
         """
-        # Troba els no-terminals que poden derivar a la cadena buida
-        buides = {no_terminal for no_terminal, produccions in self.gramatica.items() 
-                  if [["ε"]] in produccions or [[""]] in produccions or ["ε"] in produccions or [""] in produccions}
-        canvi = True
-        while canvi:
-            canvi = False
-            nous_buides = buides.copy()
-
-            for no_terminal, produccions in list(self.gramatica.items()):
-                for produccio in produccions:
-                    if produccio and all(simbol in buides for simbol in produccio):
-
-                        if no_terminal not in nous_buides: # Si el no-terminal ja és buit, no cal afegir-lo de nou
-                            nous_buides.add(no_terminal)
-                            canvi = True
-
-            buides = nous_buides
-
-        for no_terminal in self.gramatica:
-            noves_produccions = set()
-
-            for produccio in self.gramatica[no_terminal]: # Si la producció és buida, no cal afegir-la
-                if not (produccio == ["ε"] or produccio == [""]):
-                    noves_produccions.update(self.__generar_combinacions(produccio, buides))
-            # Actualitza les produccions del no-terminal, eliminant les que són buides o iguals a "ε"
-            self.gramatica[no_terminal] = [list(prod) for prod in noves_produccions if prod and prod != ("ε") and prod != ("")]
+        instancia = cls.__new__(cls)
+        instancia.gramatica, simbol_arrel = cache_gramatiques.carregar_gramatica(ruta, cache_gramatiques.TIPUS_FNC)
+        instancia._inicialitzar_taules(simbol_arrel, cache_subcadenes, filtrar_taula)
+        return instancia
 
-    def __eliminar_regles_unitaries(self):
+    def desar_compilada(self, ruta: str) -> None:
         """
-        Elimina regles unitàries de la gramàtica (A -> B)
-        Aquesta funció transforma regles unitàries en regles que contenen les produccions de B.
-        Per exemple, si tenim A -> B i B -> C D, llavors A es converteix en A -> C D.
+        Desa la gramàtica ja convertida a FNC en format binari, per carregar-la després amb from_compiled.
         """
-        canviat = True
-        while canviat:
-            canviat = False
-            for no_terminal, produccions in list(self.gramatica.items()):
-                noves_produccions = []
-                for produccio in produccions:
-                    if len(produccio) == 1 and produccio[0] in self.gramatica:
-                        # És una regla unitària
-                        for sub_produccio in self.gramatica[produccio[0]]:
-                            if sub_produccio not in noves_produccions: # Evita duplicats
-                                noves_produccions.append(sub_produccio)
-                                canviat = True # Si s'ha afegit una nova producció, marquem el canvi
-                    else:
-                        noves_produccions.append(produccio) # Manté les produccions que no són unitàries
-                self.gramatica[no_terminal] = noves_produccions
-
-    def __convertir_regles_terminals(self):
-        """
-        Converteix regles com (A -> ab) en regles no terminals separades (A -> T1 T2) 
-        on Tn és un nou no-terminal (T1 -> a) (T2 -> b)
-
-        Pressuposa que les regles terminals estàn escrites en minúscules
-        És important que 
-        """
-        contador = 1
-        conjunt_terminals = {}
-
-        for no_terminal, produccions in list(self.gramatica.items()): 
-                noves_produccions = []
-
-                for produccio in produccions:
-                    nova_prod = []
+        cache_gramatiques.desar_gramatica(ruta, self.gramatica, self.simbol_arrel, cache_gramatiques.TIPUS_FNC)
         
-                    for simbol in produccio:
-                        if simbol.islower() and len(produccio) > 1: # És una terminal en una regla llarga
-                            if simbol not in conjunt_terminals:
-                                nou_no_terminal = f"T{contador}" # Afegim un nou no-terminal per la regla
-                                contador += 1
-                                conjunt_terminals[simbol] = nou_no_terminal
-                                self.gramatica[nou_no_terminal] = [[simbol]] # Afegim la regla terminal (Tn -> a)
-
-                            nova_prod.append(conjunt_terminals[simbol]) # Afegim el no-terminal corresponent a la terminal
-
-                        else:
-                            nova_prod.append(simbol) # Si no és una terminal, l'afegim tal qual
-
-                    noves_produccions.append(nova_prod)
-                self.gramatica[no_terminal] = noves_produccions
-
-    def __convertir_regles_llargues(self):
+    def _forma_normal_chomsky(self) -> None:
         """
-        Converteix regles llargues a regles binàries, és a dir, transforma regles amb més de dos símbols en regles que només tenen dues parts.
-        Per exemple, A -> B C D es converteix en A -> X1 D i X1 -> B C, on X1 és un nou no-terminal.
+        Transforma la gramàtica a Forma Normal de Chomsky (FNC) amb el compilador de compilador_fnc:
+        elimina les produccions buides (A -> ε) i les regles unitàries (A -> B), i converteix les regles
+        amb terminals (A -> a B) i les regles llargues (A -> B C ... Z).
         """
-        contador = 1
-        for no_terminal, produccions in list(self.gramatica.items()):
-            noves_produccions = []
-
-            for produccio in produccions:
-                while len(produccio) > 2:
-                    nou_no_terminal = f"X{contador}" # Afegim un nou no-terminal per la regla
-                    contador += 1
-                    self.gramatica[nou_no_terminal] = [[produccio[0], produccio[1]]] # Afegim la regla binària (Xn -> A B)
-                    produccio = [nou_no_terminal] + produccio[2:] # Actualitzem la producció per continuar amb la següent part
-
-                noves_produccions.append(produccio) # Manté la producció final que ara té com a màxim dos símbols
-            self.gramatica[no_terminal] = noves_produccions 
\ No newline at end of file
+        self.gramatica = compilar_fnc(self.gramatica)
@@ -1,46 +1,463 @@
-from typing import Dict, List, Set, Tuple, Union
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from array import array
+from functools import partial
 from copy import deepcopy
+from lots import analitzar_lot
+from compilador_fnc import compilar_fnc
+from k_millors import ExtractorKMillors
+from cache_subcadenes import CacheSubcadenes
+from instrumentacio import EstadistiquesAnalisi
+from filtres_taula import FiltresTaula
+from index_regles import IndexRegles
+from taula_compacta import TaulaCompacta
+import cache_gramatiques
+import math
+import operator
+import sys
+import time
+
+class Aresta():
+    """
+    Millor derivació d'un no-terminal en una cel·la de la taula PCKY.
+    - probabilitat: probabilitat de la millor derivació.
+    - divisio: longitud de la part esquerra (None per a les regles terminals).
+    - fills: (fill_esquerre, fill_dret) per a les regles binàries, o (paraula,) per a les terminals.
+    """
+    __slots__ = ('probabilitat', 'divisio', 'fills')
+
+    def __init__(self, probabilitat: float, divisio: Optional[int], fills: Tuple[str, ...]) -> None:
+        self.probabilitat = probabilitat
+        self.divisio = divisio
+        self.fills = fills
+
+class NodeArbre():
+    """
+    Node d'un arbre gramatical de l'algoritme PCKY, amb els mateixos camps que els arbres en diccionaris de la resta del codi:
+    - no_terminal: no-terminal del node.
+    - simbol: la paraula a les fulles, o (fill_esquerre, fill_dret) als nodes interns.
+    - fill: None a les fulles, o la parella de nodes fills.
+    - probabilitat: probabilitat de la millor derivació del node.
+    Ocupa molt menys que un diccionari, i s'hi pot accedir igual que a un diccionari (node['fill']), de manera que
+    display_arbre o serialitzacio el poden fer servir sense canvis. Es compara igual que un diccionari.
+    """
+    __slots__ = ('no_terminal', 'simbol', 'fill', 'probabilitat')
+    _CAMPS = frozenset(__slots__)
+
+    def __init__(self, no_terminal: str, simbol: Any = None, fill: Optional[Tuple['NodeArbre', 'NodeArbre']] = None,
+                 probabilitat: float = 0.0) -> None:
+        self.no_terminal = no_terminal
+        self.simbol = simbol
+        self.fill = fill
+        self.probabilitat = probabilitat
+
+    def __getitem__(self, camp: str) -> Any:
+        if camp not in self._CAMPS:
+            raise KeyError(camp)
+        return getattr(self, camp)
+
+    def get(self, camp: str, defecte: Any = None) -> Any:
+        return getattr(self, camp) if camp in self._CAMPS else defecte
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __eq__(self, altre: Any) -> bool:
+        if not isinstance(altre, (NodeArbre, dict)):
+            return NotImplemented
+        pila = [(self, altre)]
+        while pila:
+            node, altre = pila.pop()
+            if node is None or altre is None:
+                if node is not altre:
+                    return False
+                continue
+            if any(node[camp] != altre.get(camp) for camp in ('no_terminal', 'simbol', 'probabilitat')):
+                return False
+            fills, fills_altre = node['fill'], altre.get('fill')
+            if fills is None or fills_altre is None:
+                if fills is not fills_altre:
+                    return False
+            elif len(fills) != len(fills_altre):
+                return False
+            else:
+                pila.extend(zip(fills, fills_altre))
+        return True
+
+    __hash__ = None
+
+    def __reduce__(self) -> Tuple:
+        # L'arbre es desa en preordre com una llista plana, perquè pickle no hagi de baixar un nivell per node
+        preordre = []
+        pila = [self]
+        while pila:
+            node = pila.pop()
+            if node is None:
+                preordre.append(None)
+                continue
+            preordre.append((node.no_terminal, node.simbol, node.probabilitat, node.fill is not None))
+            if node.fill is not None:
+                pila.extend(reversed(node.fill))
+        return (_arbre_des_de_preordre, (preordre,))
+
+    def __repr__(self) -> str:
+        return (f"NodeArbre(no_terminal={self.no_terminal!r}, simbol={self.simbol!r}, "
+                f"probabilitat={self.probabilitat!r}, fill={self.fill!r})")
+
+    def com_diccionari(self) -> dict:
+        """
+        Retorna l'arbre com a diccionaris niats, amb el format dels arbres del bosc de derivacions.
+        """
+        arrel = {}
+        pila = [(self, arrel)]
+        while pila:
+            node, diccionari = pila.pop()
+            diccionari.update(no_terminal=node.no_terminal, simbol=node.simbol, fill=None, probabilitat=node.probabilitat)
+            if node.fill is not None:
+                diccionari['fill'] = [{} if fill is not None else None for fill in node.fill]
+                pila.extend((fill, fill_diccionari) for fill, fill_diccionari in zip(node.fill, diccionari['fill'])
+                            if fill is not None)
+        return arrel
+
+def _arbre_des_de_preordre(preordre: List[Optional[Tuple[str, Any, float, bool]]]) -> Optional[NodeArbre]:
+    """
+    Reconstrueix un arbre a partir del preordre de NodeArbre.__reduce__.
+    """
+    arrel = None
+    pendents = []  # (fills del pare per omplir, posició), el proper a omplir al capdamunt
+    interns = []   # (node, fills) dels nodes interns, per fixar-ne els fills en acabar
+    for entrada in preordre:
+        node = None if entrada is None else NodeArbre(entrada[0], entrada[1], None, entrada[2])
+        if pendents:
+            fills, posicio = pendents.pop()
+            fills[posicio] = node
+        else:
+            arrel = node
+        if entrada is not None and entrada[3]:
+            fills = [None, None]
+            interns.append((node, fills))
+            pendents.append((fills, 1))
+            pendents.append((fills, 0))
+    for node, fills in interns:
+        node.fill = tuple(fills)
+    return arrel
+
+# Mida aproximada d'una entrada d'una cel·la PCKY (aresta, tupla de fills i probabilitat), per a la memòria cau de subcadenes
+_MIDA_ARESTA = sys.getsizeof(Aresta(0.0, 0, ('A', 'B'))) + sys.getsizeof(('A', 'B')) + sys.getsizeof(0.0)
+
+class CellaPCKY(dict):
+    """
+    Cel·la de la taula PCKY: diccionari no_terminal -> Aresta amb la millor derivació de cada no-terminal.
+    """
+    __slots__ = ()
+
+    def actualitzar(self, no_terminal: str, probabilitat: float, divisio: Optional[int], fills: Tuple[str, ...]) -> bool:
+        """
+        Afegeix una derivació a la cel·la si el no-terminal no hi era o si millora la que ja hi havia.
+        :return: Retorna True si la cel·la ha canviat.
+        """
+        aresta = self.get(no_terminal)
+        if aresta is None:
+            self[no_terminal] = Aresta(probabilitat, divisio, fills)
+            return True
+        if probabilitat > aresta.probabilitat:
+            aresta.probabilitat = probabilitat
+            aresta.divisio = divisio
+            aresta.fills = fills
+            return True
+        return False
+
+class ConfiguracioPoda():
+    def __init__(self, amplada_feix: Optional[int] = None, llindar_relatiu: Optional[float] = None, max_arestes: Optional[int] = None) -> None:
+        """
+        Configuració de la poda de la taula de l'algoritme PCKY. Cada criteri és opcional (None el desactiva).
+        :param amplada_feix: Nombre màxim d'entrades que es conserven a cada cel·la (les més probables).
+        :param llindar_relatiu: Es descarten les entrades amb probabilitat inferior a llindar_relatiu * (millor probabilitat de la cel·la).
+        :param max_arestes: Nombre màxim d'entrades que es conserven a tota la taula.
+        """
+        if amplada_feix is not None and amplada_feix < 1:
+            raise ValueError("L'amplada del feix ha de ser com a mínim 1.")
+        if llindar_relatiu is not None and not 0.0 <= llindar_relatiu <= 1.0:
+            raise ValueError("El llindar relatiu ha d'estar entre 0 i 1.")
+        if max_arestes is not None and max_arestes < 1:
+            raise ValueError("El nombre màxim d'arestes ha de ser com a mínim 1.")
+        self.amplada_feix = amplada_feix
+        self.llindar_relatiu = llindar_relatiu
+        self.max_arestes = max_arestes
+
+class ResultatPCKY(tuple):
+    """
+    Resultat immutable d'una anàlisi PCKY. És el parell (derivable, probabilitat) que retornava algoritme_pcky, de manera
+    que es pot desempaquetar, indexar, comparar amb tuples i serialitzar en JSON com abans, i a més porta:
+    - derivable: si la frase és derivable des del símbol arrel.
+    - probabilitat: probabilitat de la millor derivació (0.0 si no n'hi ha).
+    - arbre: arbre gramatical de la millor derivació (None si no n'hi ha). Es construeix la primera vegada que es consulta.
+    - informe_poda: entrades descartades per cada criteri de poda (None si la gramàtica no poda).
+    El resultat no depèn de cap estat de la gramàtica, de manera que una mateixa gramàtica pot analitzar frases des de
+    diversos fils alhora. Si dos fils consulten l'arbre alhora, com a molt es construeix dues vegades.
+    """
+
+    def __new__(cls, derivable: bool, probabilitat: float, constructor_arbre: Optional[Callable[[], NodeArbre]] = None,
+                informe_poda: Optional[Dict[str, int]] = None) -> 'ResultatPCKY':
+        """
+        :param constructor_arbre: Funció sense arguments que construeix l'arbre gramatical (None si no hi ha arbre).
+        """
+        resultat = super().__new__(cls, (derivable, probabilitat))
+        object.__setattr__(resultat, 'informe_poda', informe_poda)
+        object.__setattr__(resultat, '_arbre', None)
+        object.__setattr__(resultat, '_constructor_arbre', constructor_arbre)
+        return resultat
+
+    def __setattr__(self, nom: str, valor: Any) -> None:
+        raise AttributeError("Els resultats de l'anàlisi PCKY són immutables.")
+
+    @property
+    def derivable(self) -> bool:
+        return self[0]
+
+    @property
+    def probabilitat(self) -> float:
+        return self[1]
+
+    @property
+    def arbre(self) -> Optional[NodeArbre]:
+        constructor_arbre = self._constructor_arbre
+        if constructor_arbre is not None:
+            # Un cop construït l'arbre, deixem anar la taula a què fa referència el constructor
+            object.__setattr__(self, '_arbre', constructor_arbre())
+            object.__setattr__(self, '_constructor_arbre', None)
+        return self._arbre
+
+    def com_diccionari(self, amb_arbre: bool = True) -> Dict[str, Any]:
+        """
+        Retorna el resultat com a diccionari serialitzable en JSON: derivable, probabilitat, l'arbre com a diccionaris niats
+        (veure NodeArbre.com_diccionari) i l'informe de poda si n'hi ha.
+        :param amb_arbre: Si és False, no s'hi posa l'arbre (i no es construeix).
+        """
+        diccionari = {'derivable': self.derivable, 'probabilitat': self.probabilitat}
+        if amb_arbre:
+            arbre = self.arbre
+            diccionari['arbre'] = arbre.com_diccionari() if isinstance(arbre, NodeArbre) else arbre
+        if self.informe_poda is not None:
+            diccionari['informe_poda'] = dict(self.informe_poda)
+        return diccionari
+
+    def __repr__(self) -> str:
+        return f"ResultatPCKY(derivable={self.derivable}, probabilitat={self.probabilitat})"
+
+    def __reduce__(self) -> Tuple:
+        # Per enviar el resultat a un altre procés (parse_many) s'hi envia l'arbre ja construït, i no la taula sencera
+        return (_resultat_amb_arbre, (self.derivable, self.probabilitat, self.arbre, self.informe_poda))
+
+def _resultat_amb_arbre(derivable: bool, probabilitat: float, arbre: Optional[NodeArbre], informe_poda: Optional[Dict[str, int]]) -> ResultatPCKY:
+    """
+    Reconstrueix un ResultatPCKY amb l'arbre ja construït.
+    """
+    resultat = ResultatPCKY(derivable, probabilitat, informe_poda=informe_poda)
+    object.__setattr__(resultat, '_arbre', arbre)
+    return resultat
 
 class GramaticaProbabilistica():
-    def __init__(self, normes_gramatica: Dict, simbol_arrel: str = 'S') -> None:
+    def __init__(self, normes_gramatica: Dict, simbol_arrel: str = 'S', poda: Optional[ConfiguracioPoda] = None,
+                 directori_cache: Optional[str] = None, cache_subcadenes: Optional[CacheSubcadenes] = None,
+                 filtrar_taula: bool = True) -> None:
+        """
+        :param poda: Configuració de la poda de la taula PCKY (None per no podar).
+        :param directori_cache: Si s'indica, la gramàtica convertida es desa en aquest directori, amb el hash del contingut
+                                com a clau, i les construccions següents amb la mateixa gramàtica la carreguen sense convertir-la.
+        :param cache_subcadenes: Memòria cau de cel·les per subcadena que fa servir algoritme_pcky (None per no fer-ne servir).
+                                 Amb la poda max_arestes les cel·les depenen de tota la frase i no s'hi guarden.
+        :param filtrar_taula: Si és True, algoritme_pcky descarta de la taula els no-terminals que no poden arribar a l'arrel
+                              des de la seva posició i només combina els que poden fer de fill esquerre o dret (veure filtres_taula.py).
+                              Si la gramàtica no permet descartar cap no-terminal, el filtre no s'aplica.
+        """
+        ruta, carregada = None, None
+        if directori_cache is not None:
+            ruta = cache_gramatiques.ruta_cache(directori_cache, normes_gramatica, simbol_arrel, cache_gramatiques.TIPUS_PROBABILISTICA)
+            carregada = cache_gramatiques.carregar_de_cache(ruta, cache_gramatiques.TIPUS_PROBABILISTICA)
+
+        if carregada is not None:
+            self.gramatica, simbol_arrel = carregada
+            ruta = None
+        else:
+            self.gramatica = deepcopy(normes_gramatica)
+            self._forma_normal_chomsky()  # Transformem la gramàtica a FNC
+
+        self._inicialitzar_taules(simbol_arrel, poda, cache_subcadenes, filtrar_taula)
+        if ruta is not None:
+            self.desar_compilada(ruta)
+
+    @classmethod
+    def from_compiled(cls, ruta: str, poda: Optional[ConfiguracioPoda] = None,
+                      cache_subcadenes: Optional[CacheSubcadenes] = None, filtrar_taula: bool = True) -> 'GramaticaProbabilistica':
+        """
+        Crea la gramàtica a partir d'un fitxer desat amb desar_compilada, sense tornar a fer la conversió a FNC.
+        :param ruta: Fitxer de la gramàtica compilada.
+        :param poda: Configuració de la poda de la taula PCKY (None per no podar).
+        :param cache_subcadenes: Memòria cau de cel·les per subcadena (None per no fer-ne servir).
+        :param filtrar_taula: Filtre de la taula a partir de l'estructura de la gramàtica.
+        """
+        instancia = cls.__new__(cls)
+        instancia.gramatica, simbol_arrel = cache_gramatiques.carregar_gramatica(ruta, cache_gramatiques.TIPUS_PROBABILISTICA)
+        instancia._inicialitzar_taules(simbol_arrel, poda, cache_subcadenes, filtrar_taula)
+        return instancia
 
-        self.gramatica = deepcopy(normes_gramatica)
-        self._forma_normal_chomsky()  # Transformem la gramàtica a FNC
+    def desar_compilada(self, ruta: str) -> None:
+        """
+        Desa la gramàtica ja convertida a FNC en format binari, per carregar-la després amb from_compiled.
+        """
+        cache_gramatiques.desar_gramatica(ruta, self.gramatica, self.simbol_arrel, cache_gramatiques.TIPUS_PROBABILISTICA)
+
+    def _inicialitzar_taules(self, simbol_arrel: str, poda: Optional[ConfiguracioPoda],
+                             cache_subcadenes: Optional[CacheSubcadenes] = None, filtrar_taula: bool = True) -> None:
+        """
+        Prepara les taules d'accés ràpid a partir de la gramàtica ja en FNC.
+        """
         self.regles_binaries = self._preprocessar_gramatica()
+        self.index_lexic = self._preprocessar_index_lexic()
         self.simbol_arrel = simbol_arrel
-        self.arbre_gramatical = None
+        self.poda = poda
+        self.cache_subcadenes = cache_subcadenes
+        self.filtres = FiltresTaula(((no_terminal, esq, dre) for (esq, dre), valors in self.regles_binaries.items()
+                                     for no_terminal, _ in valors), simbol_arrel,
+                                    set(self.gramatica).union(*self.regles_binaries, *self.index_lexic.values()))
+        self.filtrar_taula = filtrar_taula and self.filtres.util
+        self._compilar_taules()
+        # Índexs de regles de l'estratègia adaptativa de _omplir_taula (veure _combinar). Amb estrategia_adaptativa a False,
+        # _omplir_taula sempre prova totes les parelles.
+        self.index_regles = IndexRegles(self.regles_binaries)
+        # Cost fix, en consultes de parelles, de sortir del bucle intern cap a _combinar: canviar d'estratègia només val
+        # la pena si n'estalvia més que això
+        self.sobrecost_estrategia = 16
+        self.estrategia_adaptativa = True
+
 
-    def algoritme_pcky(self, frase: Union[List[str], str]) -> Tuple[bool, float]:
+    def algoritme_pcky(self, frase: Union[List[str], str], estadistiques: Optional[EstadistiquesAnalisi] = None) -> ResultatPCKY:
         """
         Analitza una frase gramaticalment utilitzant l'algoritme CKY.
         Omple la taula dinàmica de CKY amb la frase donada.
         :param frase: Es tracta de la cadena que volem analitzar.
-        :return: Retorna un boolean que inidica si la cadena es pot derivar o no.
+        :param estadistiques: Si s'indica, s'hi anoten els comptadors i els temps de l'anàlisi (veure instrumentacio.py).
+                              En aquest cas l'arbre es construeix de seguida, per cronometrar-ne la construcció.
+        :return: Retorna el resultat de l'anàlisi, que es desempaqueta com (derivable, probabilitat)
+                 i dona accés a l'arbre gramatical i a l'informe de poda.
         """
         
         if not frase:
             # Comprovem si la cadena buida és derivable (S -> ε)
-            return self._comprovar_derivacio_buida()
+            return self._resultat_derivacio_buida()
         
+        taula, informe = self._omplir_taula(frase, estadistiques)
+        n = len(taula)
+        # Comprovem si el símbol arrel està present en la cel·la final
+        aresta_arrel = taula[n-1][0].get(self.simbol_arrel)
+        if aresta_arrel is not None and estadistiques is not None:
+            inici = time.perf_counter()
+            arbre = self._crear_arbre_gramatical(taula)
+            estadistiques.temps_arbre = time.perf_counter() - inici
+            return _resultat_amb_arbre(True, aresta_arrel.probabilitat, arbre, informe)
+        if aresta_arrel is not None:
+            # L'arbre gramatical només es crea si es consulta
+            return ResultatPCKY(True, aresta_arrel.probabilitat, partial(self._crear_arbre_gramatical, taula), informe)
+        return ResultatPCKY(False, 0.0, informe_poda=informe)
+    
+    def k_millors(self, frase: Union[List[str], str], k: int) -> List[Tuple[float, NodeArbre]]:
+        """
+        Retorna les k derivacions més probables de la frase des del símbol arrel, de més a menys probable.
+        Omple la taula un sol cop i n'extreu les derivacions de manera mandrosa (veure k_millors.ExtractorKMillors),
+        de manera que el cost afegit respecte d'algoritme_pcky és petit encara que k sigui gran.
+        :param frase: Es tracta de la cadena que volem analitzar.
+        :param k: Nombre màxim de derivacions.
+        :return: Llista de parells (probabilitat, arbre gramatical), amb arbres NodeArbre com els d'algoritme_pcky.
+        """
+        if k < 1:
+            raise ValueError("El nombre de derivacions ha de ser com a mínim 1.")
+        if not frase:
+            return []
+        taula, _ = self._omplir_taula(frase)
+        return ExtractorKMillors(self, frase, taula).k_millors(self.simbol_arrel, k)
+
+    def _omplir_taula(self, frase: Union[List[str], str],
+                      estadistiques: Optional[EstadistiquesAnalisi] = None) -> Tuple[List[List[CellaPCKY]], Optional[Dict[str, int]]]:
+        """
+        Omple la taula de l'algoritme PCKY per a una frase no buida, aplicant-hi la poda si n'hi ha.
+        Si la gramàtica té memòria cau de subcadenes, les cel·les de subcadenes ja vistes s'hi prenen en lloc de calcular-les:
+        les arestes guarden la divisió com a longitud de la part esquerra, de manera que no depenen de la posició a la frase.
+        Amb filtrar_taula, només es combinen els no-terminals permesos a la posició de la cel·la que poden fer de fill
+        esquerre o dret, i amb poda els altres es treuen de la cel·la abans de podar-la.
+        :param estadistiques: Si s'indica, s'hi anoten els comptadors i els temps de l'anàlisi.
+        :return: Retorna la taula triangular (taula[longitud - 1][inici]) i l'informe de poda (None si no hi ha poda).
+        """
         n = len(frase)
+        if estadistiques is not None:
+            estadistiques.longitud = n
+            inici = time.perf_counter()
         # Crea taula triangular buida (aprofitem la propietat triangular de la taula CKY i ens estalviem memòria innecessària)
-        taula = [[set() for _ in range(n - m)] for m in range(n)]
-
-        # Omplim la primera fila (cas base): terminals
-        for col in range(n):
-            paraula = frase[col]
-            for no_terminal, produccions in list(self.gramatica.items()):
-                for produccio, probabilitat in produccions:
-                    # Comprovem les produccions terminals (A -> a)
-                    if isinstance(produccio, str) and produccio == paraula:
-                        taula[0][col].add((no_terminal, probabilitat, (paraula,), (0, col), None))
-                    elif isinstance(produccio, list) and len(produccio) == 1 and produccio[0] == paraula:
-                        taula[0][col].add((no_terminal, probabilitat, (paraula,), (0, col), None))
+        taula = [[CellaPCKY() for _ in range(n - m)] for m in range(n)]
+        # Si hi ha poda, hi anotem quantes entrades descarta cada criteri
+        informe = self._nou_informe_poda() if self.poda is not None else None
+        cache = self.cache_subcadenes
+        if self.poda is not None and self.poda.max_arestes is not None:
+            cache = None
+        # Parts que es combinen de cada cel·la, com a diccionaris no-terminal -> probabilitat (veure _parts_combinables)
+        filtres = self.filtres if self.filtrar_taula else None
+        # Sense poda, els no-terminals descartats pel filtre es poden quedar a la cel·la: com que no es combinen, no costen res.
+        # Amb poda, es treuen de la cel·la abans de podar-la perquè no ocupin el lloc d'entrades útils.
+        filtrar_celles = filtres is not None and informe is not None
+        taula_esq = [[{}] * (n - m) for m in range(n)]
+        taula_dre = [[{}] * (n - m) for m in range(n)]
+
+        # Omplim la primera fila (cas base): terminals, consultant l'índex lèxic (A -> a)
+        for col, entrades in enumerate(self.consultar_lexic(frase)):
+            paraula = (frase[col],)
+            for no_terminal, probabilitat in entrades.items():
+                taula[0][col].actualitzar(no_terminal, probabilitat, None, paraula)
+            posicio = (col == 0, col == n - 1)
+            if filtrar_celles:
+                taula[0][col] = self._filtrar_cella(taula[0][col], filtres.permesos[posicio])
+            if informe is not None:
+                taula[0][col] = self._podar_cella(taula[0][col], informe)
+            if taula[0][col]:
+                taula_esq[0][col], taula_dre[0][col] = self._parts_combinables(taula[0][col], filtres, posicio)
+        if estadistiques is not None:
+            estadistiques.mida_maxima_cella = max(len(cella) for cella in taula[0])
+            estadistiques.temps_lexic = time.perf_counter() - inici
+            inici = time.perf_counter()
+        # Amb poques parelles, provar-les totes sempre és més barat que sortir del bucle per triar una altra estratègia
+        llindar = self.sobrecost_estrategia if self.estrategia_adaptativa else math.inf
         
         # Omplim la resta de la taula (longitud 2 a n)
+        # trobades[inici]: si la subcadena de la fila anterior que comença a inici era a la memòria cau
+        trobades = [True] * n
         for longitud in range(1, n):  # longitud de la subcadena
+            usar_cache = cache is not None and cache.admet(longitud + 1)
+            trobades_fila = [False] * (n - longitud)
             for col_esq in range(n - longitud): # inici de la subcadena
-                col = col_esq + longitud
+                # Només fem servir la memòria cau si les dues subcadenes d'una paraula menys hi eren: si no, aquesta tampoc
+                # no hi pot ser, i així una subcadena només s'hi guarda quan les seves parts ja s'han repetit
+                candidata = usar_cache and trobades[col_esq] and trobades[col_esq + 1]
+                posicio = (col_esq == 0, col_esq + longitud + 1 == n)
+                if candidata:
+                    subcadena = tuple(frase[col_esq:col_esq + longitud + 1])
+                    if filtres is not None:
+                        # Amb els filtres de posició, les parts que es combinen (i per tant la cel·la) depenen de si la
+                        # subcadena toca l'inici o el final de la frase
+                        subcadena = (subcadena, posicio)
+                    cella = cache.obtenir(subcadena)
+                    if cella is not None:
+                        taula[longitud][col_esq] = cella
+                        trobades_fila[col_esq] = True
+                        if informe is not None:
+                            informe['conservades'] += len(cella)
+                        if estadistiques is not None:
+                            estadistiques.celles_cau += 1
+                        if cella:
+                            taula_esq[longitud][col_esq], taula_dre[longitud][col_esq] = self._parts_combinables(cella, filtres, posicio)
+                        continue
+
+                cella = taula[longitud][col_esq]
 
                 # Provem totes les possibles divisions de la subcadena
                 for fila_esq in range(longitud): # longitud de la part esquerra
@@ -48,68 +465,535 @@ class GramaticaProbabilistica():
                     fila_dre = longitud - fila_esq - 1
                     col_dre = col_esq + fila_esq + 1
 
-                    part_esq = taula[fila_esq][col_esq]
-                    part_dre = taula[fila_dre][col_dre]
+                    part_esq = taula_esq[fila_esq][col_esq]
+                    part_dre = taula_dre[fila_dre][col_dre]
 
                     # Si alguna de les dues parts és buida, no podem continuar
                     if part_esq and part_dre:
+                        # L'estratègia es tria un sol cop per divisió, i amb estadístiques es fa servir la mateixa
+                        parelles = len(part_esq) * len(part_dre)
+                        if parelles > llindar:
+                            estrategia = self.index_regles.triar_estrategia(part_esq, part_dre, llindar)
+                            if estrategia:
+                                self._combinar(cella, part_esq, part_dre, fila_esq, estrategia, estadistiques)
+                                continue
+                        if estadistiques is not None:
+                            estadistiques.divisions += 1
+                            estadistiques.parelles += parelles
                         # Comprovem totes les regles de la gramàtica per produccions binàries
-                        for no_terminal_esq in part_esq:
-                            for no_terminal_dre in part_dre:
+                        for no_terminal_esq, probabilitat_esq in part_esq.items():
+                            for no_terminal_dre, probabilitat_dre in part_dre.items():
                                 # Comprovem les produccions binàries (A -> BC)
-                                clau = (no_terminal_esq[0], no_terminal_dre[0])
+                                clau = (no_terminal_esq, no_terminal_dre)
 
                                 if clau in self.regles_binaries:
+                                    if estadistiques is not None:
+                                        estadistiques.encerts_regles += 1
+                                        for valor_no_terminal, probabilitat in self.regles_binaries[clau]:
+                                            self._actualitzar_comptant(cella, valor_no_terminal, probabilitat * probabilitat_esq * probabilitat_dre,
+                                                                       fila_esq, clau, estadistiques)
+                                        continue
                                     for valor_no_terminal, probabilitat in self.regles_binaries[clau]:
-                                        # Busquem si ja existeix aquest no-terminal en la cel·la
-                                        tupla_existent = None
-                                        for tupla in taula[longitud][col_esq]:
-                                            if tupla[0] == valor_no_terminal:
-                                                tupla_existent = tupla
-                                                break
-                                        
-                                        # Calculem la nova probabilitat
-                                        nova_probabilitat = probabilitat * no_terminal_esq[1] * no_terminal_dre[1]
-                                        
-                                        if tupla_existent is not None:
-                                            # Si existeix, comprovem si la nova probabilitat és major
-                                            if nova_probabilitat > tupla_existent[1]:
-                                                taula[longitud][col_esq].remove(tupla_existent)
-                                                # Agreguem la nova tupla amb la probabilitat actualitzada
-                                                coord_esq = (col_esq, col_esq + fila_esq)
-                                                coord_dre = (col_esq + fila_esq + 1, col)
-                                                taula[longitud][col_esq].add((valor_no_terminal, 
-                                                                            nova_probabilitat, 
-                                                                            (no_terminal_esq[0], no_terminal_dre[0]), 
-                                                                            coord_esq, 
-                                                                            coord_dre))
-                                        else:
-                                            # No existeix, agreguem directament
-                                            coord_esq = (col_esq, col_esq + fila_esq)
-                                            coord_dre = (col_esq + fila_esq + 1, col)
-                                            taula[longitud][col_esq].add((valor_no_terminal, 
-                                                                        nova_probabilitat, 
-                                                                        (no_terminal_esq[0], no_terminal_dre[0]), 
-                                                                        coord_esq, 
-                                                                        coord_dre))
-                                    
-        # Un cop omplerta la taula, creem l'arbre gramatical
-        self._crear_arbre_gramatical(taula)
-        # Comprovem si el símbol arrel està present en alguna tupla de la cel·la final
-        for tupla in taula[n-1][0]:
-            if tupla[0] == self.simbol_arrel:
-                return (True, tupla[1])
-        return (False, 0.0)
-    
-    def display_arbre(self):
+                                        # La cel·la només es queda la derivació més probable de cada no-terminal
+                                        nova_probabilitat = probabilitat * probabilitat_esq * probabilitat_dre
+                                        cella.actualitzar(valor_no_terminal, nova_probabilitat, fila_esq, clau)
+
+                if estadistiques is not None:
+                    estadistiques.celles += 1
+                    estadistiques.mida_maxima_cella = max(estadistiques.mida_maxima_cella, len(cella))
+                if filtrar_celles and cella:
+                    cella = taula[longitud][col_esq] = self._filtrar_cella(cella, filtres.permesos[posicio])
+                if informe is not None:
+                    cella = taula[longitud][col_esq] = self._podar_cella(cella, informe)
+                if candidata:
+                    cache.desar(subcadena, cella, sys.getsizeof(cella) + len(cella) * _MIDA_ARESTA)
+                if cella and longitud < n - 1:
+                    taula_esq[longitud][col_esq], taula_dre[longitud][col_esq] = self._parts_combinables(cella, filtres, posicio)
+            trobades = trobades_fila
+
+        if estadistiques is not None:
+            estadistiques.temps_binari = time.perf_counter() - inici
+        return taula, informe
+
+    def _combinar(self, cella: CellaPCKY, part_esq: Dict[str, float], part_dre: Dict[str, float], fila_esq: int,
+                  estrategia: int, estadistiques: Optional[EstadistiquesAnalisi] = None) -> None:
+        """
+        Bucle intern de _omplir_taula per a un punt de divisió, amb l'estratègia triada per IndexRegles.triar_estrategia:
+        provar totes les parelles, recórrer les regles dels no-terminals de la part esquerra o de la dreta i mirar si l'altre
+        fill és a l'altra part, o recórrer totes les regles (veure Gramatica._combinar).
+        :param estadistiques: Si s'indica, s'hi anoten els comptadors (les parelles són les consultes fetes).
+        """
+
+        # Parelles (B, p(B), C, p(C), {(A, p)}) que són la part dreta d'alguna regla, segons l'estratègia
+        if estrategia == 0:
+            regles_binaries = self.regles_binaries
+            combinacions = ((esq, probabilitat_esq, dre, probabilitat_dre, regles_binaries[(esq, dre)])
+                            for esq, probabilitat_esq in part_esq.items() for dre, probabilitat_dre in part_dre.items()
+                            if (esq, dre) in regles_binaries)
+            consultes = len(part_esq) * len(part_dre)
+        elif estrategia == 1:
+            index = self.index_regles.per_esquerre
+            combinacions = ((esq, probabilitat_esq, dre, part_dre[dre], valors)
+                            for esq, probabilitat_esq in part_esq.items() for dre, valors in index.get(esq, ())
+                            if dre in part_dre)
+            consultes = sum(len(index.get(esq, ())) for esq in part_esq)
+        elif estrategia == 2:
+            index = self.index_regles.per_dret
+            combinacions = ((esq, part_esq[esq], dre, probabilitat_dre, valors)
+                            for dre, probabilitat_dre in part_dre.items() for esq, valors in index.get(dre, ())
+                            if esq in part_esq)
+            consultes = sum(len(index.get(dre, ())) for dre in part_dre)
+        else:
+            combinacions = ((esq, part_esq[esq], dre, part_dre[dre], valors) for esq, dre, valors in self.index_regles.llista_regles
+                            if esq in part_esq and dre in part_dre)
+            consultes = len(self.index_regles.llista_regles)
+
+        if estadistiques is None:
+            for esq, probabilitat_esq, dre, probabilitat_dre, valors in combinacions:
+                clau = (esq, dre)
+                for valor_no_terminal, probabilitat in valors:
+                    cella.actualitzar(valor_no_terminal, probabilitat * probabilitat_esq * probabilitat_dre, fila_esq, clau)
+            return
+
+        estadistiques.divisions += 1
+        estadistiques.parelles += consultes
+        for esq, probabilitat_esq, dre, probabilitat_dre, valors in combinacions:
+            estadistiques.encerts_regles += 1
+            clau = (esq, dre)
+            for valor_no_terminal, probabilitat in valors:
+                self._actualitzar_comptant(cella, valor_no_terminal, probabilitat * probabilitat_esq * probabilitat_dre,
+                                           fila_esq, clau, estadistiques)
+
+    @staticmethod
+    def _actualitzar_comptant(cella: CellaPCKY, no_terminal: str, probabilitat: float, divisio: int, fills: Tuple[str, str],
+                              estadistiques: EstadistiquesAnalisi) -> None:
+        """
+        Com CellaPCKY.actualitzar, però anotant a les estadístiques si l'aresta és nova o en substitueix una altra.
+        """
+        existia = no_terminal in cella
+        if cella.actualitzar(no_terminal, probabilitat, divisio, fills):
+            if existia:
+                estadistiques.arestes_substituides += 1
+            else:
+                estadistiques.arestes_noves += 1
+
+    @staticmethod
+    def _parts_combinables(cella: CellaPCKY, filtres: Optional[FiltresTaula],
+                           posicio: Tuple[bool, bool]) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        Prepara una cel·la ja completa per combinar-la: diccionaris no-terminal -> probabilitat dels no-terminals que poden fer
+        de part esquerra i de part dreta. Es fan un sol cop per cel·la, i el bucle intern no ha de consultar cap aresta.
+        :param posicio: Si la subcadena de la cel·la toca l'inici i el final de la frase.
+        """
+        if filtres is None:
+            parts = {no_terminal: aresta.probabilitat for no_terminal, aresta in cella.items()}
+            return parts, parts
+        esquerres, drets = filtres.esquerres_permesos[posicio], filtres.drets_permesos[posicio]
+        return ({no_terminal: aresta.probabilitat for no_terminal, aresta in cella.items() if no_terminal in esquerres},
+                {no_terminal: aresta.probabilitat for no_terminal, aresta in cella.items() if no_terminal in drets})
+
+    @staticmethod
+    def _filtrar_cella(cella: CellaPCKY, permesos: FrozenSet[str]) -> CellaPCKY:
+        """
+        Retorna la cel·la amb només els no-terminals permesos (la mateixa cel·la si no se'n descarta cap).
+        """
+        if cella.keys() <= permesos:
+            return cella
+        return CellaPCKY((no_terminal, aresta) for no_terminal, aresta in cella.items() if no_terminal in permesos)
+
+    def _nou_informe_poda(self) -> Dict[str, int]:
+        """
+        Crea l'informe de poda buit d'una anàlisi.
+        Per a cada criteri hi comptem les entrades descartades, i també les entrades conservades a tota la taula.
+        """
+        return {'feix': 0, 'llindar': 0, 'max_arestes': 0, 'conservades': 0}
+
+    def _podar_cella(self, cella: CellaPCKY, informe: Dict[str, int]) -> CellaPCKY:
+        """
+        Aplica la configuració de poda a una cel·la ja completa de la taula.
+        :param cella: Cel·la de la taula PCKY.
+        :param informe: Informe de poda de l'anàlisi en curs, que s'actualitza amb les entrades descartades.
+        :return: Retorna la cel·la amb només les entrades que sobreviuen a la poda.
+        """
+        if not cella:
+            return cella
+
+        # Ordenem les entrades de més a menys probable
+        entrades = sorted(cella.items(), key=lambda entrada: entrada[1].probabilitat, reverse=True)
+        inicials = len(entrades)
+
+        if self.poda.llindar_relatiu is not None:
+            minim = entrades[0][1].probabilitat * self.poda.llindar_relatiu
+            entrades = [entrada for entrada in entrades if entrada[1].probabilitat >= minim]
+            informe['llindar'] += inicials - len(entrades)
+
+        if self.poda.amplada_feix is not None and len(entrades) > self.poda.amplada_feix:
+            informe['feix'] += len(entrades) - self.poda.amplada_feix
+            entrades = entrades[:self.poda.amplada_feix]
+
+        if self.poda.max_arestes is not None:
+            restants = max(self.poda.max_arestes - informe['conservades'], 0)
+            if len(entrades) > restants:
+                informe['max_arestes'] += len(entrades) - restants
+                entrades = entrades[:restants]
+
+        informe['conservades'] += len(entrades)
+        return cella if len(entrades) == inicials else CellaPCKY(entrades)
+
+    def algoritme_pcky_vectorial(self, frase: Union[List[str], str]) -> ResultatPCKY:
+        """
+        Variant de l'algoritme PCKY pensada per a frases llargues, que tracta de cop tots els punts de divisió d'una regla.
+        Per a cada no-terminal es guarden les log-probabilitats de les subcadenes que comencen i que acaben a cada posició en
+        vectors densos indexats per l'altre extrem, i màscares de bits amb els extrems on el no-terminal és present.
+        Així, per a cada regla A -> B C i cel·la (i, j), la màscara de B des de i i la de C fins a j diuen de seguida si
+        la regla s'hi pot aplicar, i el màxim sobre totes les divisions k es calcula en una sola passada sobre els vectors
+        (map i max en lloc d'un bucle de Python per divisió). Les cel·les de menys de llindar_divisions_vectorial paraules,
+        amb poques divisions, es combinen divisió a divisió.
+        Treballar en espai logarítmic evita el desbordament per sota de les probabilitats en frases llargues. Les regles de
+        probabilitat 0 també es tenen en compte (amb log-probabilitat -inf), com a algoritme_pcky.
+        Quan dues derivacions empaten, l'arbre pot ser diferent del d'algoritme_pcky: dins d'una divisió les parelles de fills
+        es proven en l'ordre de les regles i no en el de les cel·les, i sumar logaritmes no sempre empata on empaten els productes.
+        :param frase: Es tracta de la cadena que volem analitzar.
+        :return: El mateix resultat que algoritme_pcky (la probabilitat, llevat d'errors d'arrodoniment, i un dels arbres més probables).
+        """
+
+        if not frase:
+            return self._resultat_derivacio_buida()
+
+        n = len(frase)
+        menys_infinit = float('-inf')
+        n_simbols = len(self.no_terminals)
+        regles_per_parella = self.regles_per_parella
+        vector_buit = array('d', [menys_infinit]) * (n + 1)
+        afegir = operator.add
+        llindar = self.llindar_divisions_vectorial
+
+        # fins[A][i][k]: log-probabilitat de A sobre frase[i:k]; inicis[A][j][k]: de A sobre frase[k:j] (None si no n'hi ha cap)
+        fins = [[None] * (n + 1) for _ in range(n_simbols)]
+        inicis = [[None] * (n + 1) for _ in range(n_simbols)]
+        # mascara_fins[A][i]: bit k si A deriva frase[i:k]; mascara_inicis[A][j]: bit k si A deriva frase[k:j]
+        mascara_fins = [[0] * (n + 1) for _ in range(n_simbols)]
+        mascara_inicis = [[0] * (n + 1) for _ in range(n_simbols)]
+        actius = [[] for _ in range(n + 1)]  # no-terminals de les subcadenes que comencen a cada posició
+        # celles[longitud - 1][inici]: identificador -> (log-probabilitat, longitud de la part esquerra - 1, fill esquerre, fill dret)
+        celles = [[None] * (n - m) for m in range(n)]
+
+        def desar(cella: Dict[int, Tuple[float, int, int, int]], inici: int, final: int) -> None:
+            for id_no_terminal, (puntuacio, _, _, _) in cella.items():
+                if not mascara_fins[id_no_terminal][inici]:
+                    actius[inici].append(id_no_terminal)
+                mascara_fins[id_no_terminal][inici] |= 1 << final
+                mascara_inicis[id_no_terminal][final] |= 1 << inici
+                vector = fins[id_no_terminal][inici]
+                if vector is None:
+                    vector = fins[id_no_terminal][inici] = array('d', vector_buit)
+                vector[final] = puntuacio
+                vector = inicis[id_no_terminal][final]
+                if vector is None:
+                    vector = inicis[id_no_terminal][final] = array('d', vector_buit)
+                vector[inici] = puntuacio
+
+        # Cas base: regles terminals (A -> a)
+        for col, paraula in enumerate(frase):
+            cella = {id_no_terminal: (log_probabilitat, -1, -1, -1)
+                     for id_no_terminal, log_probabilitat in self.index_lexic_log.get(paraula, ())}
+            celles[0][col] = cella
+            desar(cella, col, col + 1)
+
+        for longitud in range(1, n):
+            for inici in range(n - longitud):
+                final = inici + longitud + 1
+                cella = {}
+                if longitud < llindar:
+                    # Amb poques divisions, preparar els vectors de cada regla costa més que provar les divisions una a una
+                    for fila_esq in range(longitud):
+                        cella_dre = celles[longitud - fila_esq - 1][inici + fila_esq + 1]
+                        if not cella_dre:
+                            continue
+                        for id_esq, (puntuacio_esq, _, _, _) in celles[fila_esq][inici].items():
+                            for id_dre, regles in regles_per_parella[id_esq]:
+                                entrada_dre = cella_dre.get(id_dre)
+                                if entrada_dre is None:
+                                    continue
+                                millor = puntuacio_esq + entrada_dre[0]
+                                for id_pare, log_probabilitat in regles:
+                                    puntuacio = millor + log_probabilitat
+                                    actual = cella.get(id_pare)
+                                    if actual is None or puntuacio > actual[0]:
+                                        cella[id_pare] = (puntuacio, fila_esq, id_esq, id_dre)
+                    celles[longitud][inici] = cella
+                    desar(cella, inici, final)
+                    continue
+
+                vectors_dre = {}  # part dreta de cada no-terminal C per a totes les divisions, compartida entre regles
+                for id_esq in actius[inici]:
+                    mascara_esq = mascara_fins[id_esq][inici]
+                    vector_esq = None
+                    for id_dre, regles in regles_per_parella[id_esq]:
+                        divisions = mascara_esq & mascara_inicis[id_dre][final]
+                        if not divisions:
+                            continue
+                        # Suma de les dues parts per a cada divisió k, de inici + 1 a final - 1, i la millor
+                        if vector_esq is None:
+                            vector_esq = fins[id_esq][inici][inici + 1:final]
+                        vector_dre = vectors_dre.get(id_dre)
+                        if vector_dre is None:
+                            vector_dre = vectors_dre[id_dre] = inicis[id_dre][final][inici + 1:final]
+                        if divisions & (divisions - 1):
+                            sumes = list(map(afegir, vector_esq, vector_dre))
+                            millor = max(sumes)
+                            if millor == menys_infinit:
+                                # Derivacions de probabilitat 0: ens quedem amb la primera divisió on hi ha els dos fills
+                                fila_esq = (divisions & -divisions).bit_length() - inici - 2
+                            else:
+                                fila_esq = sumes.index(millor)
+                        else:
+                            # Una sola divisió possible: no cal recórrer els vectors
+                            fila_esq = divisions.bit_length() - inici - 2
+                            millor = vector_esq[fila_esq] + vector_dre[fila_esq]
+                        for id_pare, log_probabilitat in regles:
+                            puntuacio = millor + log_probabilitat
+                            actual = cella.get(id_pare)
+                            # Amb empat, ens quedem amb la divisió més a l'esquerra, com algoritme_pcky
+                            if actual is None or puntuacio > actual[0] or (puntuacio == actual[0] and fila_esq < actual[1]):
+                                cella[id_pare] = (puntuacio, fila_esq, id_esq, id_dre)
+                celles[longitud][inici] = cella
+                desar(cella, inici, final)
+
+        id_arrel = self.ids_no_terminals.get(self.simbol_arrel)
+        arrel = celles[n-1][0].get(id_arrel) if id_arrel is not None else None
+        if arrel is None:
+            return ResultatPCKY(False, 0.0)
+
+        constructor_arbre = partial(self._construir_arbre_vectorial, frase, celles, n - 1, 0, id_arrel)
+        return ResultatPCKY(True, math.exp(arrel[0]), constructor_arbre)
+
+    def algoritme_pcky_compacte(self, frase: Union[List[str], str]) -> ResultatPCKY:
+        """
+        Variant de l'algoritme PCKY per a frases molt llargues, amb la taula en vectors tipats plans (veure TaulaCompacta):
+        cada aresta ocupa uns pocs bytes en lloc d'un objecte Aresta amb la seva tupla de fills dins d'un diccionari.
+        Com l'algoritme vectorial, treballa amb log-probabilitats i dona el mateix resultat que algoritme_pcky.
+        :param frase: Es tracta de la cadena que volem analitzar.
+        :return: El mateix resultat que algoritme_pcky.
+        """
+        if not frase:
+            return self._resultat_derivacio_buida()
+
+        taula = self._omplir_taula_compacta(frase)
+        id_arrel = self.ids_no_terminals.get(self.simbol_arrel)
+        posicio = taula.cercar(0, len(frase), id_arrel) if id_arrel is not None else -1
+        if posicio < 0:
+            return ResultatPCKY(False, 0.0)
+        constructor_arbre = partial(self._construir_arbre_compacte, frase, taula, id_arrel)
+        return ResultatPCKY(True, math.exp(taula.puntuacions[posicio]), constructor_arbre)
+
+    def _omplir_taula_compacta(self, frase: Union[List[str], str]) -> TaulaCompacta:
+        """
+        Omple la taula compacta de l'algoritme PCKY per a una frase no buida.
+        Només la cel·la en curs i la part dreta de cada divisió es despleguen en vectors densos indexats per identificador,
+        que es reutilitzen d'una cel·la a la següent.
+        """
+        n = len(frase)
+        n_simbols = len(self.no_terminals)
+        menys_infinit = float('-inf')
+        regles_per_esquerre = self.regles_per_esquerre
+        taula = TaulaCompacta(n, n_simbols)
+        inicis, simbols, puntuacions = taula.inicis, taula.simbols, taula.puntuacions
+
+        # Cas base: regles terminals (A -> a), amb els no-terminals en ordre d'identificador
+        for paraula in frase:
+            for id_no_terminal, log_probabilitat in sorted(self.index_lexic_log.get(paraula, ())):
+                taula.afegir(id_no_terminal, log_probabilitat)
+            taula.tancar_cella()
+
+        vector = array('d', [menys_infinit]) * n_simbols  # puntuacions de la cel·la en curs
+        divisions = array('i', [0]) * n_simbols
+        fills_esq = array('i', [0]) * n_simbols
+        fills_dre = array('i', [0]) * n_simbols
+        vector_dre = array('d', [menys_infinit]) * n_simbols  # puntuacions de la part dreta de la divisió en curs
+        primeres = [taula.index(0, fila + 1) for fila in range(n)]  # posició de la primera cel·la de cada fila
+
+        for longitud in range(1, n):
+            for col_esq in range(n - longitud):
+                noves = []  # identificadors amb puntuació finita de la cel·la en curs
+                for fila_esq in range(longitud):
+                    k_esq = primeres[fila_esq] + col_esq
+                    primera_esq, final_esq = inicis[k_esq], inicis[k_esq + 1]
+                    if primera_esq == final_esq:
+                        continue
+                    k_dre = primeres[longitud - fila_esq - 1] + col_esq + fila_esq + 1
+                    primera_dre, final_dre = inicis[k_dre], inicis[k_dre + 1]
+                    if primera_dre == final_dre:
+                        continue
+
+                    simbols_dre = simbols[primera_dre:final_dre]
+                    for id_dre, puntuacio_dre in zip(simbols_dre, puntuacions[primera_dre:final_dre]):
+                        vector_dre[id_dre] = puntuacio_dre
+                    # Apliquem totes les regles A -> B C amb B present a la part esquerra
+                    for id_esq, puntuacio_esq in zip(simbols[primera_esq:final_esq], puntuacions[primera_esq:final_esq]):
+                        for id_dre, id_pare, log_probabilitat in regles_per_esquerre[id_esq]:
+                            puntuacio_dre = vector_dre[id_dre]
+                            if puntuacio_dre == menys_infinit:
+                                continue
+                            puntuacio = log_probabilitat + puntuacio_esq + puntuacio_dre
+                            if puntuacio > vector[id_pare]:
+                                if vector[id_pare] == menys_infinit:
+                                    noves.append(id_pare)
+                                vector[id_pare] = puntuacio
+                                divisions[id_pare] = fila_esq
+                                fills_esq[id_pare] = id_esq
+                                fills_dre[id_pare] = id_dre
+                    for id_dre in simbols_dre:
+                        vector_dre[id_dre] = menys_infinit
+
+                # Bolquem la cel·la a la taula i deixem el vector dens a punt per a la següent
+                noves.sort()
+                for id_no_terminal in noves:
+                    taula.afegir(id_no_terminal, vector[id_no_terminal], divisions[id_no_terminal],
+                                 fills_esq[id_no_terminal], fills_dre[id_no_terminal])
+                    vector[id_no_terminal] = menys_infinit
+                taula.tancar_cella()
+        return taula
+
+    def _construir_arbre_compacte(self, frase: Union[List[str], str], taula: TaulaCompacta, id_arrel: int) -> NodeArbre:
+        """
+        Construeix l'arbre gramatical a partir dels punters enrere de la taula compacta, amb una pila en lloc de recursió.
+        Els nodes tenen el mateix format que els de _construir_arbre.
+        """
+        no_terminals = self.no_terminals
+        arrel = NodeArbre(no_terminals[id_arrel])
+        pila = [(arrel, 0, len(frase), id_arrel)]  # (node per omplir, inici, longitud, no-terminal)
+        while pila:
+            node, inici, longitud, id_no_terminal = pila.pop()
+            posicio = taula.cercar(inici, longitud, id_no_terminal)
+            node.probabilitat = math.exp(taula.puntuacions[posicio])
+            if longitud == 1:
+                node.simbol = frase[inici]
+                continue
+            divisio = taula.divisions[posicio] + 1
+            id_esq, id_dre = taula.fills_esq[posicio], taula.fills_dre[posicio]
+            node.simbol = (no_terminals[id_esq], no_terminals[id_dre])
+            node.fill = (NodeArbre(no_terminals[id_esq]), NodeArbre(no_terminals[id_dre]))
+            pila.append((node.fill[0], inici, divisio, id_esq))
+            pila.append((node.fill[1], inici + divisio, longitud - divisio, id_dre))
+        return arrel
+
+    def puntuar_lot(self, frases: Iterable[Union[List[str], str]], mida_grup: int = 256) -> List[ResultatPCKY]:
+        """
+        Calcula la probabilitat de la millor derivació de moltes frases alhora, agrupant-les per longitud i omplint
+        una sola taula per a cada grup (veure Gramatica.reconeixer_lot). Cada entrada d'una cel·la guarda una màscara de bits
+        amb les frases del grup que tenen el no-terminal i una llista amb la probabilitat per a cada frase, de manera que
+        les regles es busquen un sol cop per grup i només es calcula la probabilitat de les frases on s'apliquen.
+        No construeix els arbres; si la gramàtica té poda, analitza cada frase amb algoritme_pcky.
+        :param frases: Frases a analitzar.
+        :param mida_grup: Nombre màxim de frases de cada grup.
+        :return: Llista amb el resultat de cada frase, en el mateix ordre, amb la mateixa probabilitat que algoritme_pcky.
+        """
+        frases = list(frases)
+        if self.poda is not None:
+            return [self.algoritme_pcky(frase) for frase in frases]
+        resultats = [None] * len(frases)
+        grups = {}  # longitud -> índexs de les frases
+        for index, frase in enumerate(frases):
+            if not frase:
+                resultats[index] = self._resultat_derivacio_buida()
+            else:
+                grups.setdefault(len(frase), []).append(index)
+        for indexs in grups.values():
+            for inici in range(0, len(indexs), mida_grup):
+                grup = indexs[inici:inici + mida_grup]
+                for index, resultat in zip(grup, self._puntuar_grup([frases[index] for index in grup])):
+                    resultats[index] = resultat
+        return resultats
+
+    def _puntuar_grup(self, frases: List[Union[List[str], str]]) -> List[ResultatPCKY]:
+        """
+        Omple una sola taula PCKY per a un grup de frases no buides de la mateixa longitud.
+        Cada cel·la és un diccionari no_terminal -> [màscara de frases, probabilitats per frase].
+        """
+        n = len(frases[0])
+        mida = len(frases)
+        index_per_esquerre = self.index_regles.per_esquerre
+        taula = [[{} for _ in range(n - m)] for m in range(n)]
+
+        # Cas base: terminals, consultant l'índex lèxic (A -> a) de cada frase
+        for posicio, frase in enumerate(frases):
+            for col, entrades in enumerate(self.consultar_lexic(frase)):
+                cella = taula[0][col]
+                for no_terminal, probabilitat in entrades.items():
+                    entrada = cella.get(no_terminal)
+                    if entrada is None:
+                        entrada = cella[no_terminal] = [0, [0.0] * mida]
+                    entrada[0] |= 1 << posicio
+                    entrada[1][posicio] = probabilitat
+
+        for longitud in range(1, n):
+            for col_esq in range(n - longitud):
+                cella = taula[longitud][col_esq]
+                for fila_esq in range(longitud):
+                    part_esq = taula[fila_esq][col_esq]
+                    part_dre = taula[longitud - fila_esq - 1][col_esq + fila_esq + 1]
+                    if not (part_esq and part_dre):
+                        continue
+                    for no_terminal_esq, (frases_esq, probabilitats_esq) in part_esq.items():
+                        for no_terminal_dre, valors in index_per_esquerre.get(no_terminal_esq, ()):
+                            entrada_dre = part_dre.get(no_terminal_dre)
+                            if entrada_dre is None:
+                                continue
+                            # Frases del grup on hi ha alhora el fill esquerre i el dret
+                            frases_regla = frases_esq & entrada_dre[0]
+                            if not frases_regla:
+                                continue
+                            probabilitats_dre = entrada_dre[1]
+                            posicions = []
+                            while frases_regla:
+                                bit = frases_regla & -frases_regla
+                                frases_regla ^= bit
+                                posicions.append(bit.bit_length() - 1)
+                            for valor_no_terminal, probabilitat in valors:
+                                entrada = cella.get(valor_no_terminal)
+                                if entrada is None:
+                                    entrada = cella[valor_no_terminal] = [0, [0.0] * mida]
+                                probabilitats = entrada[1]
+                                for posicio in posicions:
+                                    # La mateixa expressió que algoritme_pcky, perquè el resultat sigui idèntic
+                                    nova_probabilitat = probabilitat * probabilitats_esq[posicio] * probabilitats_dre[posicio]
+                                    if nova_probabilitat > probabilitats[posicio]:
+                                        probabilitats[posicio] = nova_probabilitat
+                                entrada[0] |= frases_esq & entrada_dre[0]
+
+        arrel = taula[n-1][0].get(self.simbol_arrel)
+        if arrel is None:
+            return [ResultatPCKY(False, 0.0) for _ in frases]
+        return [ResultatPCKY(True, arrel[1][posicio]) if arrel[0] >> posicio & 1 else ResultatPCKY(False, 0.0)
+                for posicio in range(mida)]
+
+    def parse_many(self, frases: Iterable[Union[List[str], str]], workers: Optional[int] = None, chunksize: Optional[int] = None,
+                   ordenat: bool = True, metode: str = 'algoritme_pcky') -> Iterator:
+        """
+        Analitza moltes frases repartint-les entre un grup de processos (veure lots.analitzar_lot).
+        La gramàtica s'envia un sol cop a cada procés i les frases més llargues es planifiquen primer.
+        :param frases: Frases a analitzar.
+        :param workers: Nombre de processos (1 analitza en el procés actual; per defecte, un per CPU).
+        :param chunksize: Nombre màxim de frases per fragment enviat a un procés.
+        :param ordenat: Si és True, els resultats surten en l'ordre de les frases; si no, com a parells (índex, resultat) a mesura que acaben.
+        :param metode: Mètode d'anàlisi que s'aplica a cada frase.
+        :return: Iterador amb el resultat de algoritme_pcky per a cada frase.
+        """
+        return analitzar_lot(self, metode, frases, workers=workers, chunksize=chunksize, ordenat=ordenat)
+
+    def display_arbre(self, arbre: Union[ResultatPCKY, NodeArbre, dict, None]):
         """
         Mostra l'arbre gramatical de manera llegible.
         Utilitzem la funció _mostrar_arbre per imprimir l'arbre de manera jeràrquica.
+        :param arbre: Resultat d'algoritme_pcky o arbre gramatical a mostrar.
         """
-        if self.arbre_gramatical is None:
+        if isinstance(arbre, ResultatPCKY):
+            arbre = arbre.arbre
+        if arbre is None:
             print("No s'ha creat cap arbre gramatical.")
             return
-        self.__mostrar_arbre(self.arbre_gramatical, 0)
+        self.__mostrar_arbre(arbre, 0)
     
     def _preprocessar_gramatica(self) -> Dict[Tuple[str, str], Set[tuple[str, float]]]:
         """ 
@@ -129,99 +1013,184 @@ class GramaticaProbabilistica():
                     # emmagatzemem el no-terminal i la probabilitat
         return regles_binaries
     
-    def _crear_arbre_gramatical(self, taula: List[List[Set[Tuple[str, float, Tuple[str,str], Tuple[int, int]]]]]) -> None:
+    def _preprocessar_index_lexic(self) -> Dict[str, Dict[str, float]]:
+        """
+        Preprocessa la gramàtica per accés ràpid a les regles terminals.
+        Aquesta funció crea un diccionari on les claus són paraules i els valors són diccionaris no_terminal -> probabilitat.
+        Si un no-terminal produeix la mateixa paraula més d'un cop, ens quedem amb la probabilitat més alta.
+        """
+        index_lexic = {}  # Diccionari on paraula -> {no_terminal: probabilitat}
+
+        for no_terminal, produccions in list(self.gramatica.items()):
+            for produccio, probabilitat in produccions:
+                # Les regles terminals poden estar escrites com a cadena o com a llista d'un sol element
+                if isinstance(produccio, str):
+                    paraula = produccio
+                elif len(produccio) == 1:
+                    paraula = produccio[0]
+                else:
+                    continue
+
+                entrades = index_lexic.setdefault(paraula, {})
+                if probabilitat > entrades.get(no_terminal, 0.0):
+                    entrades[no_terminal] = probabilitat
+
+        return index_lexic
+
+    def consultar_lexic(self, frase: Union[List[str], str]) -> List[Dict[str, float]]:
+        """
+        Consulta l'índex lèxic per a totes les paraules d'una frase alhora.
+        :param frase: Llista de paraules (o cadena de caràcters) a consultar.
+        :return: Llista amb el diccionari no_terminal -> probabilitat de les regles A -> paraula, per a cada posició.
+        """
+        index_lexic = self.index_lexic
+        buit = {}
+        return [index_lexic.get(paraula, buit) for paraula in frase]
+
+    def _compilar_taules(self) -> None:
+        """
+        Assigna un identificador enter a cada no-terminal i prepara les taules de l'algoritme vectorial:
+        - regles_per_esquerre[B]: llista de (C, A, log p) per a cada regla A -> B C (p).
+        - regles_per_parella[B]: llista de (C, [(A, log p)]) per a cada parella de fills B C, amb les regles A -> B C (p).
+          Les regles de probabilitat 0 hi són amb log-probabilitat -inf.
+        - index_lexic_log[a]: llista de (A, log p) per a cada regla A -> a (p).
+        - regles_per_pare[A]: llista de (B, C, p) per a cada regla A -> B C (p), per a l'extracció de les k millors derivacions.
+        A regles_per_esquerre, les regles amb probabilitat 0 es descarten.
+        """
+        self.ids_no_terminals = {}
+        for no_terminal in self.gramatica:
+            self.ids_no_terminals.setdefault(no_terminal, len(self.ids_no_terminals))
+        for (esq, dre), valors in self.regles_binaries.items():
+            for no_terminal in (esq, dre) + tuple(valor[0] for valor in valors):
+                self.ids_no_terminals.setdefault(no_terminal, len(self.ids_no_terminals))
+        self.no_terminals = list(self.ids_no_terminals)
+
+        ids = self.ids_no_terminals
+        self.regles_per_esquerre = [[] for _ in self.no_terminals]
+        for (esq, dre), valors in self.regles_binaries.items():
+            for no_terminal, probabilitat in valors:
+                if probabilitat > 0:
+                    self.regles_per_esquerre[ids[esq]].append((ids[dre], ids[no_terminal], math.log(probabilitat)))
+
+        self.regles_per_parella = [[] for _ in self.no_terminals]
+        for (esq, dre), valors in self.regles_binaries.items():
+            regles = [(ids[no_terminal], math.log(probabilitat) if probabilitat > 0 else float('-inf'))
+                      for no_terminal, probabilitat in valors]
+            self.regles_per_parella[ids[esq]].append((ids[dre], regles))
+        # Longitud a partir de la qual algoritme_pcky_vectorial tracta de cop totes les divisions de cada regla
+        self.llindar_divisions_vectorial = 12
+
+        self.regles_per_pare = {}
+        for (esq, dre), valors in self.regles_binaries.items():
+            for no_terminal, probabilitat in valors:
+                self.regles_per_pare.setdefault(no_terminal, []).append((esq, dre, probabilitat))
+
+        self.index_lexic_log = {
+            paraula: [(ids[no_terminal], math.log(probabilitat)) for no_terminal, probabilitat in entrades.items() if probabilitat > 0]
+            for paraula, entrades in self.index_lexic.items()
+        }
+
+    def _crear_arbre_gramatical(self, taula: List[List[CellaPCKY]]) -> Optional[NodeArbre]:
         """
         Crea l'arbre gramatical a partir de la taula triangular generada per l'algoritme CKY.
         :param taula: Taula triangular generada per l'algoritme CKY.
+        :return: Retorna l'arbre gramatical, o None si el símbol arrel no deriva la frase.
         """
-        # Buscar la tupla amb major probabilitat per al símbol arrel en la cel·la final
-        millor_tupla = None
-        millor_probabilitat = 0
-        
         # La cel·la final a la taula triangular és taula[n-1][0]
-        for tupla in taula[len(taula) - 1][0]:
-            if tupla[0] == self.simbol_arrel and tupla[1] > millor_probabilitat:
-                millor_tupla = tupla
-                millor_probabilitat = tupla[1]
-        
-        if millor_tupla: 
-            # Si hem trobat una tupla per al símbol arrel, construïm l'arbre gramatical
-            self.arbre_gramatical = self._construir_arbre(taula, len(taula) - 1, 0, self.simbol_arrel)
-        else:
-            self.arbre_gramatical = None
+        if self.simbol_arrel in taula[len(taula) - 1][0]:
+            # Si hi ha una derivació del símbol arrel, construïm l'arbre gramatical
+            return self._construir_arbre(taula, len(taula) - 1, 0, self.simbol_arrel)
+        return None
 
-    def _construir_arbre(self, taula: List[List[Set[Tuple[str, float, Tuple[str,str], Tuple[int, int]]]]], fila: int, col: int, no_terminal: str) -> dict:
+    def _construir_arbre(self, taula: List[List[CellaPCKY]], fila: int, col: int, no_terminal: str) -> Optional[NodeArbre]:
         """
-        Construeix l'arbre gramatical a partir de la taula triangular de CKY.
-        :param fila: Fila en la tabla triangular (longitud - 1)
-        :param col: Columna en la tabla triangular (posición inicial)
+        Construeix l'arbre gramatical a partir de la taula triangular de CKY, seguint els punters enrere de cada aresta
+        (la divisió i els fills de la millor derivació), amb una pila en lloc de recursió.
+        :param fila: Fila en la taula triangular (longitud - 1)
+        :param col: Columna en la taula triangular (posició inicial)
         :param no_terminal: No terminal a buscar
+        :return: Retorna l'arrel de l'arbre, o None si el no-terminal no és a la cel·la.
         """
-        # Buscar la tupla amb major probabilitat per al no terminal en la cel·la especificada
-        millor_tupla = None
-        millor_probabilitat = 0
-        
-        for tupla in taula[fila][col]:
-            if tupla[0] == no_terminal and tupla[1] > millor_probabilitat:
-                millor_tupla = tupla
-                millor_probabilitat = tupla[1]
-        
-        if millor_tupla is None:
+        aresta = taula[fila][col].get(no_terminal)
+        if aresta is None:
             return None
-        
-        if fila == 0:  # Es compleix per les regles terminals
-            # La tupla conté (no_terminal, probabilitat, (simbol,), (inici, fi), None)
-            return {
-                'no_terminal': no_terminal, 
-                'simbol': millor_tupla[2][0], 
-                'fill': None,
-                'probabilitat': millor_tupla[1]
-            }
-        
-        # Cas de regles no terminals
-        else: 
-            # la tupla conté (no_terminal, probabilitat, (fill_esquerre, fill_dret), (inici_esq, fi_esq), (inici_dre, fi_dre))
-            # Necessitem convertir les coordenades originals a coordenades triangulars
-            coord_orig_esq = millor_tupla[3]
-            coord_orig_dre = millor_tupla[4]
-            
-            # Convertim les coordenades a longitud i inici
-            fila_esq = coord_orig_esq[1] - coord_orig_esq[0]
-            col_esq = coord_orig_esq[0]
-            
-            fila_dre = coord_orig_dre[1] - coord_orig_dre[0]
-            col_dre = coord_orig_dre[0]
-            
-            # Construïm els fills esquerre i dret de l'arbre
-            fill_esquerra = self._construir_arbre(taula, fila_esq, col_esq, millor_tupla[2][0])
-            fill_dreta = self._construir_arbre(taula, fila_dre, col_dre, millor_tupla[2][1])
-            
-            return {
-                'no_terminal': no_terminal, 
-                'simbol': millor_tupla[2], 
-                'fill': [fill_esquerra, fill_dreta],
-                'probabilitat': millor_tupla[1]
-            }
-
-    def __mostrar_arbre(self, node: dict, depth: int):
+
+        arrel = NodeArbre(no_terminal)
+        pila = [(arrel, aresta, fila, col)]
+        while pila:
+            node, aresta, fila, col = pila.pop()
+            node.probabilitat = aresta.probabilitat
+            if fila == 0:  # Es compleix per les regles terminals
+                node.simbol = aresta.fills[0]
+                continue
+
+            # Cas de regles no terminals: la divisió és la longitud de la part esquerra
+            node.simbol = aresta.fills
+            fila_esq = aresta.divisio
+            fila_dre = fila - fila_esq - 1
+            col_dre = col + fila_esq + 1
+            fills = []
+            for no_terminal_fill, fila_fill, col_fill in ((aresta.fills[0], fila_esq, col), (aresta.fills[1], fila_dre, col_dre)):
+                aresta_fill = taula[fila_fill][col_fill].get(no_terminal_fill)
+                if aresta_fill is None:
+                    fills.append(None)
+                    continue
+                fill = NodeArbre(no_terminal_fill)
+                fills.append(fill)
+                pila.append((fill, aresta_fill, fila_fill, col_fill))
+            node.fill = tuple(fills)
+        return arrel
+
+    def _construir_arbre_vectorial(self, frase: Union[List[str], str], celles: List[List[Dict[int, Tuple[float, int, int, int]]]],
+                                   fila: int, col: int, id_no_terminal: int) -> NodeArbre:
+        """
+        Construeix l'arbre gramatical a partir dels punters enrere de l'algoritme vectorial, amb una pila en lloc de recursió.
+        Els nodes tenen el mateix format que els de _construir_arbre.
+        :param fila: Fila en la taula triangular (longitud - 1)
+        :param col: Columna en la taula triangular (posició inicial)
+        :param id_no_terminal: Identificador del no-terminal del node
+        """
+        no_terminals = self.no_terminals
+        arrel = NodeArbre(no_terminals[id_no_terminal])
+        pila = [(arrel, fila, col, id_no_terminal)]
+        while pila:
+            node, fila, col, id_no_terminal = pila.pop()
+            puntuacio, fila_esq, id_esq, id_dre = celles[fila][col][id_no_terminal]
+            node.probabilitat = math.exp(puntuacio)
+            if fila == 0:
+                node.simbol = frase[col]
+                continue
+
+            node.simbol = (no_terminals[id_esq], no_terminals[id_dre])
+            node.fill = (NodeArbre(no_terminals[id_esq]), NodeArbre(no_terminals[id_dre]))
+            pila.append((node.fill[0], fila_esq, col, id_esq))
+            pila.append((node.fill[1], fila - fila_esq - 1, col + fila_esq + 1, id_dre))
+        return arrel
+
+    def __mostrar_arbre(self, node: Union[NodeArbre, dict], depth: int):
         """
         Mostra un node de l'arbre gramatical de manera estètica i jeràrquica.
+        Recorre l'arbre amb una pila, de manera que no depèn del límit de recursió en frases llargues.
         :param node: Node de l'arbre a mostrar.
         :param depth: Profunditat del node en l'arbre.
         """
-        if node is None:
-            return
-        
-        prefix = "│   " * (depth - 1) + ("├── " if depth > 0 else "")
-        
-        if node['fill'] is None:
-            # Terminals
-            print(f"{prefix}\033[1;32m{node['no_terminal']}\033[0m → '\033[1;34m{node['simbol']}\033[0m' (p={node['probabilitat']:.2e})")
-        else:
-            # No terminals
-            print(f"{prefix}\033[1;33m{node['no_terminal']}\033[0m (p={node['probabilitat']:.2e})")
-            for fill in node['fill']:
-                self.__mostrar_arbre(fill, depth + 1)
+        pila = [(node, depth)]
+        while pila:
+            node, depth = pila.pop()
+            if node is None:
+                continue
+
+            prefix = "│   " * (depth - 1) + ("├── " if depth > 0 else "")
+
+            if node['fill'] is None:
+                # Terminals
+                print(f"{prefix}\033[1;32m{node['no_terminal']}\033[0m → '\033[1;34m{node['simbol']}\033[0m' (p={node['probabilitat']:.2e})")
+            else:
+                # No terminals
+                print(f"{prefix}\033[1;33m{node['no_terminal']}\033[0m (p={node['probabilitat']:.2e})")
+                # Els fills s'afegeixen a la pila en ordre invers perquè surtin d'esquerra a dreta
+                for fill in reversed(node['fill']):
+                    pila.append((fill, depth + 1))
     
     def _comprovar_derivacio_buida(self) -> bool:
         """ 
@@ -233,183 +1202,22 @@ class GramaticaProbabilistica():
                     return True
         return False
     
-    def _forma_normal_chomsky(self) -> None:
+    def _resultat_derivacio_buida(self) -> ResultatPCKY:
         """
-        Transforma la gramàtica a Forma Normal de Chomsky (FNC) per a gramàtiques probabilístiques.
-        Les probabilitats es distribueixen proporcionalment quan es creen noves regles.
-        """
-        self.__eliminar_produccions_buides_pcky()
-        self.__eliminar_regles_unitaries_pcky()
-        self.__convertir_regles_terminals_pcky()
-        self.__convertir_regles_llargues_pcky()
-
-    def __generar_combinacions_pcky(self, produccio: List[str], buides: Set[str]) -> Set[Tuple[str]]:
-        """
-        Genera totes les combinacions possibles de produccions eliminant els no-terminals que són buits.
-        :param produccio: Producció original.
-        :param buides: Conjunt de no-terminals que poden derivar a la cadena buida.
-        :return: Un conjunt de tuples amb les noves produccions.
+        Resultat de l'anàlisi de la cadena buida, amb la probabilitat de la millor regla S -> ε.
         """
-        if not produccio:
-            return {tuple()}
+        if not self._comprovar_derivacio_buida():
+            return ResultatPCKY(False, 0.0)
+        probabilitat = max(p for produccio, p in self.gramatica[self.simbol_arrel] if len(produccio) == 1 and produccio[0] in ['ε', ''])
+        return ResultatPCKY(True, probabilitat)
 
-        resultats = set()
-        resultats.add(tuple(produccio))  # Sempre inclou la producció original
-
-        for i in range(len(produccio)):  # Itera sobre cada símbol de la producció
-            if produccio[i] in buides:
-                sub_combinacions = self.__generar_combinacions_pcky(produccio[:i] + produccio[i+1:], buides)
-                resultats.update(sub_combinacions)  # Genera combinacions sense aquest símbol si és buit
-
-        return resultats
-
-    def __eliminar_produccions_buides_pcky(self):
-        """
-        Elimina produccions buides de la gramàtica (A -> ε) per gramàtiques probabilístiques.
-        Aquesta funció identifica els no-terminals que poden derivar a la cadena buida i elimina les produccions que només contenen aquests no-terminals. 
-        Per exemple, si tenim A -> ε i B -> A C, llavors B es converteix en B -> C, mantenint les probabilitats adequades.
-        """
-        # Troba els no-terminals que poden derivar a la cadena buida
-        buides = {no_terminal for no_terminal, produccions in list(self.gramatica.items()) 
-                  for produccio, probabilitat in produccions 
-                  if produccio == '' or produccio == [] or produccio == [''] or produccio == ['ε']}
-        
-        canvi = True
-        while canvi:
-            canvi = False
-            nous_buides = buides.copy()
-
-            for no_terminal, produccions in list(self.gramatica.items()):
-                for produccio, probabilitat in produccions:
-                    if produccio and all(simbol in buides for simbol in produccio):
-                        if no_terminal not in nous_buides:  # Si el no-terminal ja és buit, no cal afegir-lo de nou
-                            nous_buides.add(no_terminal)
-                            canvi = True
-
-            buides = nous_buides
-
-        # Genera noves produccions sense els buits
-        nova_gramatica = {}
-        for no_terminal, produccions in list(self.gramatica.items()):
-            noves_produccions = {}
-            
-            for produccio, probabilitat in produccions:
-                if not (produccio == '' or produccio == [] or produccio == [''] or produccio == ['ε']):  # Si la producció és buida, no cal afegir-la
-                    combinacions = self.__generar_combinacions_pcky(list(produccio), buides)
-                    for combinacio in combinacions:
-                        if combinacio and combinacio != ('ε',) and combinacio != ('',):
-                            if combinacio not in noves_produccions:
-                                noves_produccions[combinacio] = 0.0
-                            noves_produccions[combinacio] += probabilitat  # Suma les probabilitats de combinacions idèntiques
-
-            # Actualitza les produccions del no-terminal, eliminant les que són buides o iguals a "ε"
-            nova_gramatica[no_terminal] = [(list(prod), prob) for prod, prob in noves_produccions.items()]
-        
-        self.gramatica = nova_gramatica
-
-    def __eliminar_regles_unitaries_pcky(self):
-        """
-        Elimina regles unitàries de la gramàtica (A -> B) per gramàtiques probabilístiques.
-        Aquesta funció transforma regles unitàries en regles que contenen les produccions de B, multiplicant les probabilitats.
-        Per exemple, si tenim A -> B (p=0.5) i B -> C D (p=0.8), llavors A es converteix en A -> C D (p=0.4).
-        """
-        canviat = True
-        while canviat:
-            canviat = False
-            nova_gramatica = {}
-            
-            for no_terminal, produccions in list(self.gramatica.items()):
-                noves_produccions = []
-                
-                for produccio, probabilitat in produccions:
-                    if len(produccio) == 1 and produccio[0] in self.gramatica:
-                        # És una regla unitària - propaga les produccions del no-terminal referit
-                        for sub_produccio, sub_probabilitat in self.gramatica[produccio[0]]:
-                            nova_produccio = (sub_produccio, probabilitat * sub_probabilitat)
-                            if nova_produccio not in noves_produccions:  # Evita duplicats
-                                noves_produccions.append(nova_produccio)
-                                canviat = True  # Si s'ha afegit una nova producció, marquem el canvi
-                    else:
-                        noves_produccions.append((produccio, probabilitat))  # Manté les produccions que no són unitàries
-                
-                nova_gramatica[no_terminal] = noves_produccions
-            
-            self.gramatica = nova_gramatica
-
-    def __convertir_regles_terminals_pcky(self):
-        """
-        Converteix regles com (A -> ab) en regles no terminals separades (A -> T1 T2) 
-        on Tn és un nou no-terminal (T1 -> a) (T2 -> b) per gramàtiques probabilístiques.
-
-        Pressuposa que les regles terminals estàn escrites en minúscules.
-        Manté les probabilitats originals en les noves regles creades.
-        """
-        contador = 1
-        mapa_terminals = {}
-        nova_gramatica = {}
-
-        for no_terminal, produccions in list(self.gramatica.items()):
-            noves_produccions = []
-
-            for produccio, probabilitat in produccions:
-                if len(produccio) > 1:
-                    nova_produccio = []
-                    
-                    for simbol in produccio:
-                        if simbol.islower():  # És una terminal en una regla llarga
-                            if simbol not in mapa_terminals:
-                                nou_no_terminal = f"T{contador}"  # Afegim un nou no-terminal per la regla
-                                contador += 1
-                                mapa_terminals[simbol] = nou_no_terminal
-                                nova_gramatica[nou_no_terminal] = [([simbol], 1.0)]  # Afegim la regla terminal (Tn -> a)
-
-                            nova_produccio.append(mapa_terminals[simbol])  # Afegim el no-terminal corresponent a la terminal
-                        else:
-                            nova_produccio.append(simbol)  # Si no és una terminal, l'afegim tal qual
-
-                    noves_produccions.append((nova_produccio, probabilitat))
-                else:
-                    noves_produccions.append((produccio, probabilitat))
-
-            nova_gramatica[no_terminal] = noves_produccions
-
-        # Afegeix les regles terminals noves que no existien
-        for terminal, nou_no_terminal in mapa_terminals.items():
-            if nou_no_terminal not in nova_gramatica:
-                nova_gramatica[nou_no_terminal] = [([terminal], 1.0)]
-
-        self.gramatica = nova_gramatica
-
-    def __convertir_regles_llargues_pcky(self):
+    def _forma_normal_chomsky(self) -> None:
         """
-        Converteix regles llargues a regles binàries per gramàtiques probabilístiques, és a dir, transforma regles amb més de dos símbols en regles que només tenen dues parts.
-        Per exemple, A -> B C D es converteix en A -> X1 D i X1 -> B C, on X1 és un nou no-terminal.
-        Manté les probabilitats originals en les produccions finals.
+        Transforma la gramàtica a Forma Normal de Chomsky (FNC) per a gramàtiques probabilístiques.
+        Les probabilitats es propaguen a les noves regles (veure compilador_fnc).
         """
-        contador = 1
-        nova_gramatica = {}
+        self.gramatica = compilar_fnc(self.gramatica, probabilistica=True)
 
-        for no_terminal, produccions in list(self.gramatica.items()):
-            noves_produccions = []
-
-            for produccio, probabilitat in produccions:
-                produccio_actual = list(produccio)
-                
-                while len(produccio_actual) > 2:
-                    nou_no_terminal = f"X{contador}"  # Afegim un nou no-terminal per la regla
-                    contador += 1
-                    nova_gramatica[nou_no_terminal] = [([produccio_actual[0], produccio_actual[1]], 1.0)]  # Afegim la regla binària (Xn -> A B)
-                    produccio_actual = [nou_no_terminal] + produccio_actual[2:]  # Actualitzem la producció per continuar amb la següent part
-
-                noves_produccions.append((produccio_actual, probabilitat))  # Manté la producció final que ara té com a màxim dos símbols
-
-            if no_terminal in nova_gramatica:
-                nova_gramatica[no_terminal].extend(noves_produccions)
-            else:
-                nova_gramatica[no_terminal] = noves_produccions
-
-        self.gramatica = nova_gramatica
-    
     def __str__(self):
         """ Retorna una representació en cadena de la gramàtica carregada. """
         if self.gramatica is None:
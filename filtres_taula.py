@@ -0,0 +1,70 @@
+from typing import Dict, FrozenSet, Iterable, Set, Tuple
+
+class FiltresTaula():
+    """
+    Propietats de la gramàtica (en FNC) que permeten descartar no-terminals de la taula CKY que no poden formar part
+    de cap derivació de la frase sencera des del símbol arrel:
+    - esquerres: no-terminals que apareixen com a fill esquerre d'alguna regla A -> B C (B).
+    - drets: no-terminals que apareixen com a fill dret d'alguna regla A -> B C (C).
+    - permesos[(toca_inici, toca_final)]: no-terminals que poden cobrir una subcadena segons si toca l'inici i el final
+      de la frase, seguint la gramàtica des del símbol arrel:
+        * la frase sencera només pot ser el símbol arrel;
+        * una subcadena que toca l'inici (i no el final) ha de ser el fill esquerre d'un pare que també toca l'inici;
+        * una subcadena que toca el final ha de ser el fill dret d'un pare que també toca el final;
+        * una subcadena interior ha de ser fill d'algun no-terminal accessible des de l'arrel.
+    - esquerres_permesos[posicio], drets_permesos[posicio]: no-terminals permesos a la posició que poden fer de fill
+      esquerre o dret. Un no-terminal que només pot fer de fill esquerre no cal combinar-lo mai com a part dreta, i a l'inrevés.
+    - util: si algun dels filtres descarta algun no-terminal de la gramàtica. Si no, filtrar la taula només costa temps.
+    """
+    def __init__(self, regles: Iterable[Tuple[str, str, str]], simbol_arrel: str, no_terminals: Iterable[str]) -> None:
+        """
+        :param regles: Regles binàries com a triples (A, B, C) per a A -> B C.
+        :param simbol_arrel: Símbol arrel de la gramàtica.
+        :param no_terminals: Tots els no-terminals de la gramàtica, també els que només tenen regles terminals.
+        """
+        fills_per_pare = {}  # A -> [(B, C)]
+        for pare, esquerre, dret in regles:
+            fills_per_pare.setdefault(pare, []).append((esquerre, dret))
+        self.esquerres = frozenset(esquerre for fills in fills_per_pare.values() for esquerre, _ in fills)
+        self.drets = frozenset(dret for fills in fills_per_pare.values() for _, dret in fills)
+
+        # Pares possibles de les subcadenes que toquen l'inici, el final, o qualsevol posició
+        pares_inici = self._accessibles(fills_per_pare, simbol_arrel, 0)
+        pares_final = self._accessibles(fills_per_pare, simbol_arrel, 1)
+        pares = self._accessibles(fills_per_pare, simbol_arrel, None)
+
+        self.permesos: Dict[Tuple[bool, bool], FrozenSet[str]] = {
+            (True, True): frozenset([simbol_arrel]),
+            (True, False): frozenset(fills[0] for pare in pares_inici for fills in fills_per_pare.get(pare, ())),
+            (False, True): frozenset(fills[1] for pare in pares_final for fills in fills_per_pare.get(pare, ())),
+            (False, False): frozenset(fill for pare in pares for fills in fills_per_pare.get(pare, ()) for fill in fills),
+        }
+        # No-terminals d'una cel·la que es poden combinar com a part esquerra o dreta, segons la posició de la cel·la
+        self.esquerres_permesos = {posicio: permesos & self.esquerres for posicio, permesos in self.permesos.items()}
+        self.drets_permesos = {posicio: permesos & self.drets for posicio, permesos in self.permesos.items()}
+
+        # La cel·la de la frase sencera no es combina amb cap altra: filtrar-la no estalvia feina
+        tots = set(no_terminals)
+        self.util = any(not tots <= conjunt for conjunt in (self.esquerres, self.drets, self.permesos[(True, False)],
+                                                             self.permesos[(False, True)], self.permesos[(False, False)]))
+
+    @staticmethod
+    def _accessibles(fills_per_pare: Dict[str, list], simbol_arrel: str, costat: int) -> Set[str]:
+        """
+        No-terminals accessibles des de l'arrel baixant sempre pel fill d'un costat (0 esquerre, 1 dret) o per tots dos (None).
+        """
+        accessibles = {simbol_arrel}
+        pendents = [simbol_arrel]
+        while pendents:
+            for fills in fills_per_pare.get(pendents.pop(), ()):
+                for fill in (fills if costat is None else (fills[costat],)):
+                    if fill not in accessibles:
+                        accessibles.add(fill)
+                        pendents.append(fill)
+        return accessibles
+
+    def permesos_cella(self, inici: int, longitud: int, n: int) -> FrozenSet[str]:
+        """
+        No-terminals permesos a la cel·la de la subcadena que comença a inici i té aquesta longitud, en una frase de n paraules.
+        """
+        return self.permesos[(inici == 0, inici + longitud == n)]
@@ -0,0 +1,149 @@
+from typing import Any, List, Optional
+from extensio_2 import CellaPCKY, NodeArbre
+
+class AnalitzadorIncremental():
+    """
+    Reconeixedor CKY incremental: les paraules arriben d'una en una amb push i, per a cada paraula nova,
+    només s'omplen les cel·les de les subcadenes que acaben en aquesta posició.
+    Fa servir les màscares de bits de Gramatica (veure Gramatica.algoritme_cky_compilat).
+    """
+    def __init__(self, gramatica: Any) -> None:
+        """
+        :param gramatica: Gramatica (o GramaticaFNC) ja construïda.
+        """
+        self.gramatica = gramatica
+        self.frase = []
+        # columnes[j][i] és la cel·la de la subcadena que comença a i i acaba a j (ambdues incloses)
+        self.columnes = []
+        self.id_arrel = gramatica.ids_no_terminals.get(gramatica.simbol_arrel)
+
+    def push(self, paraula: str) -> bool:
+        """
+        Afegeix una paraula al final del prefix i omple la nova columna de la taula.
+        :return: Retorna si el prefix analitzat fins ara és derivable des del símbol arrel.
+        """
+        mascares_dretes = self.gramatica.mascares_dretes
+        regles_bits = self.gramatica.regles_bits
+        columnes = self.columnes
+        fi = len(self.frase)
+        self.frase.append(paraula)
+
+        columna = [0] * (fi + 1)
+        columna[fi] = self.gramatica.mascares_lexiques.get(paraula, 0)
+
+        # De les subcadenes més curtes a les més llargues, per tenir sempre calculada la part dreta
+        for inici in range(fi - 1, -1, -1):
+            cella = 0
+            for divisio in range(inici, fi):
+                part_esq = columnes[divisio][inici]
+                part_dre = columna[divisio + 1]
+                if not (part_esq and part_dre):
+                    continue
+                while part_esq:
+                    bit_esq = part_esq & -part_esq
+                    part_esq ^= bit_esq
+                    id_esq = bit_esq.bit_length() - 1
+                    candidats = part_dre & mascares_dretes[id_esq]
+                    while candidats:
+                        bit_dre = candidats & -candidats
+                        candidats ^= bit_dre
+                        cella |= regles_bits[id_esq][bit_dre.bit_length() - 1]
+            columna[inici] = cella
+
+        columnes.append(columna)
+        return self.es_analitzable()
+
+    def es_analitzable(self) -> bool:
+        """
+        Indica si el prefix analitzat fins ara és derivable des del símbol arrel.
+        """
+        if not self.frase:
+            return self.gramatica._comprovar_derivacio_buida()
+        if self.id_arrel is None:
+            return False
+        return bool(self.columnes[-1][0] >> self.id_arrel & 1)
+
+    def __len__(self) -> int:
+        return len(self.frase)
+
+class AnalitzadorIncrementalProbabilistic():
+    """
+    Versió incremental de l'algoritme PCKY: manté la taula de cel·les CellaPCKY i, a cada push,
+    només omple les cel·les de les subcadenes que acaben en la nova posició.
+    """
+    def __init__(self, gramatica: Any) -> None:
+        """
+        :param gramatica: GramaticaProbabilistica ja construïda.
+        """
+        self.gramatica = gramatica
+        self.frase = []
+        # columnes[j][i] és la cel·la de la subcadena que comença a i i acaba a j (ambdues incloses)
+        self.columnes = []
+
+    def push(self, paraula: str) -> float:
+        """
+        Afegeix una paraula al final del prefix i omple la nova columna de la taula.
+        :return: Retorna la probabilitat de la millor derivació del prefix des del símbol arrel (0.0 si no n'hi ha).
+        """
+        regles_binaries = self.gramatica.regles_binaries
+        columnes = self.columnes
+        fi = len(self.frase)
+        self.frase.append(paraula)
+
+        columna = [CellaPCKY() for _ in range(fi + 1)]
+        for no_terminal, probabilitat in self.gramatica.consultar_lexic([paraula])[0].items():
+            columna[fi].actualitzar(no_terminal, probabilitat, None, (paraula,))
+
+        for inici in range(fi - 1, -1, -1):
+            cella = columna[inici]
+            for divisio in range(inici, fi):
+                part_esq = columnes[divisio][inici]
+                part_dre = columna[divisio + 1]
+                if not (part_esq and part_dre):
+                    continue
+                for no_terminal_esq, aresta_esq in part_esq.items():
+                    for no_terminal_dre, aresta_dre in part_dre.items():
+                        clau = (no_terminal_esq, no_terminal_dre)
+                        if clau in regles_binaries:
+                            for valor_no_terminal, probabilitat in regles_binaries[clau]:
+                                nova_probabilitat = probabilitat * aresta_esq.probabilitat * aresta_dre.probabilitat
+                                cella.actualitzar(valor_no_terminal, nova_probabilitat, divisio - inici, clau)
+
+        columnes.append(columna)
+        return self.millor_probabilitat()
+
+    def es_analitzable(self) -> bool:
+        """
+        Indica si el prefix analitzat fins ara és derivable des del símbol arrel.
+        """
+        if not self.frase:
+            return self.gramatica._comprovar_derivacio_buida()
+        return self.gramatica.simbol_arrel in self.columnes[-1][0]
+
+    def millor_probabilitat(self) -> float:
+        """
+        Retorna la probabilitat de la millor derivació del prefix des del símbol arrel (0.0 si no n'hi ha).
+        """
+        if not self.frase:
+            return 0.0
+        aresta = self.columnes[-1][0].get(self.gramatica.simbol_arrel)
+        return aresta.probabilitat if aresta is not None else 0.0
+
+    def taula(self) -> List[List[Any]]:
+        """
+        Retorna la taula triangular del prefix amb el mateix format que la d'algoritme_pcky (taula[longitud - 1][inici]).
+        Les cel·les són les mateixes que les de l'analitzador, no còpies.
+        """
+        n = len(self.frase)
+        return [[self.columnes[inici + fila][inici] for inici in range(n - fila)] for fila in range(n)]
+
+    def arbre(self) -> Optional[NodeArbre]:
+        """
+        Construeix l'arbre gramatical de la millor derivació del prefix (None si el prefix no és derivable).
+        """
+        if not self.es_analitzable() or not self.frase:
+            return None
+        return self.gramatica._construir_arbre(self.taula(), len(self.frase) - 1, 0, self.gramatica.simbol_arrel)
+
+    def __len__(self) -> int:
+        return len(self.frase)
@@ -0,0 +1,47 @@
+from typing import Any, Collection, Dict, List, Tuple
+
+class IndexRegles():
+    """
+    Índexs de les regles binàries A -> B C per a l'estratègia adaptativa del bucle intern de CKY i PCKY, que per a cada
+    punt de divisió tria la manera més barata de trobar les regles que combinen les dues parts:
+    0. provar totes les parelles (B, C) de les dues parts contra regles_binaries (|esq| · |dre| consultes);
+    1. recórrer les regles de cada B de la part esquerra i mirar si C és a la dreta (|esq| · mitjana_per_esquerre);
+    2. recórrer les regles de cada C de la part dreta i mirar si B és a l'esquerra (|dre| · mitjana_per_dret);
+    3. recórrer totes les regles i mirar si B i C hi són (len(llista_regles)).
+    Els valors de regles_binaries es guarden tal com són ({A} a CKY, {(A, p)} a PCKY), de manera que les dues gramàtiques
+    comparteixen els índexs i l'elecció de l'estratègia, i cadascuna combina les cel·les al seu _combinar:
+    - per_esquerre[B]: llista de (C, valor) per a les regles A -> B C.
+    - per_dret[C]: llista de (B, valor) per a les regles A -> B C.
+    - llista_regles: llista de (B, C, valor) amb totes les regles.
+    - mitjana_per_esquerre, mitjana_per_dret: nombre mitjà de regles per fill esquerre i per fill dret,
+      que fan d'estimació del cost de recórrer les regles dels no-terminals d'una cel·la.
+    """
+    def __init__(self, regles_binaries: Dict[Tuple[str, str], Any]) -> None:
+        """
+        :param regles_binaries: Diccionari (B, C) -> valor de les regles A -> B C de la gramàtica.
+        """
+        self.per_esquerre: Dict[str, List[Tuple[str, Any]]] = {}
+        self.per_dret: Dict[str, List[Tuple[str, Any]]] = {}
+        self.llista_regles: List[Tuple[str, str, Any]] = []
+        for (esq, dre), valor in regles_binaries.items():
+            self.per_esquerre.setdefault(esq, []).append((dre, valor))
+            self.per_dret.setdefault(dre, []).append((esq, valor))
+            self.llista_regles.append((esq, dre, valor))
+        self.mitjana_per_esquerre = len(self.llista_regles) / max(len(self.per_esquerre), 1)
+        self.mitjana_per_dret = len(self.llista_regles) / max(len(self.per_dret), 1)
+
+    def triar_estrategia(self, part_esq: Collection[str], part_dre: Collection[str], sobrecost: float) -> int:
+        """
+        Tria l'estratègia més barata per combinar dues parts, segons el nombre de consultes de cadascuna.
+        :param sobrecost: Cost fix, en consultes, de les estratègies 1 a 3 (sortir del bucle intern). Amb math.inf
+                          sempre es provaran totes les parelles.
+        :return: Retorna 0 (totes les parelles), 1 (regles per fill esquerre), 2 (regles per fill dret) o 3 (totes les regles).
+        """
+        parelles = len(part_esq) * len(part_dre)
+        if parelles <= sobrecost:
+            return 0
+        costos = (parelles, len(part_esq) * self.mitjana_per_esquerre, len(part_dre) * self.mitjana_per_dret, len(self.llista_regles))
+        millor = min(costos[1:])
+        if millor + sobrecost >= parelles:
+            return 0
+        return costos.index(millor, 1)
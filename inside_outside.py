@@ -0,0 +1,249 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from array import array
+import math
+
+from lots import analitzar_lot
+
+MENYS_INFINIT = float('-inf')
+
+def _log_suma(valors: List[float]) -> float:
+    """
+    Calcula log(sum(exp(v))) desplaçant pel màxim, de manera que no hi ha desbordament per sota.
+    """
+    maxim = max(valors)
+    if maxim == MENYS_INFINIT:
+        return MENYS_INFINIT
+    return maxim + math.log(sum(math.exp(valor - maxim) for valor in valors))
+
+class MotorInsideOutside():
+    """
+    Algoritme inside-outside sobre la gramàtica en FNC d'una GramaticaProbabilistica.
+    Calcula la probabilitat total de les frases (suma de totes les derivacions, no només la millor),
+    les probabilitats a posteriori de cada subcadena i regla, i els comptes esperats de les regles
+    per reestimar-ne les probabilitats (un pas de l'algoritme EM).
+    Totes les puntuacions es guarden en espai logarítmic (sense desbordament per sota en frases llargues),
+    en vectors array('d') indexats per l'identificador del no-terminal.
+    """
+    def __init__(self, gramatica: Any) -> None:
+        """
+        :param gramatica: GramaticaProbabilistica ja construïda.
+        """
+        self.simbol_arrel = gramatica.simbol_arrel
+        self.ids_no_terminals = gramatica.ids_no_terminals
+        self.no_terminals = gramatica.no_terminals
+
+        # Cada regla té un índex: regles[r] = (no_terminal, dreta, probabilitat), amb dreta = (B, C) o (paraula,)
+        self.regles = []
+        # regles_per_esquerre[B]: llista de (C, A, log p, r) de les regles A -> B C
+        self.regles_per_esquerre = [[] for _ in self.no_terminals]
+        # regles_lexiques[paraula]: llista de (A, log p, r) de les regles A -> paraula
+        self.regles_lexiques = {}
+
+        ids = self.ids_no_terminals
+        for (esq, dre), valors in gramatica.regles_binaries.items():
+            for no_terminal, probabilitat in valors:
+                if probabilitat > 0:
+                    self.regles_per_esquerre[ids[esq]].append((ids[dre], ids[no_terminal], math.log(probabilitat), len(self.regles)))
+                    self.regles.append((no_terminal, (esq, dre), probabilitat))
+        for paraula, entrades in gramatica.index_lexic.items():
+            for no_terminal, probabilitat in entrades.items():
+                if probabilitat > 0:
+                    self.regles_lexiques.setdefault(paraula, []).append((ids[no_terminal], math.log(probabilitat), len(self.regles)))
+                    self.regles.append((no_terminal, (paraula,), probabilitat))
+
+    def inside(self, frase: Union[List[str], str]) -> List[List[array]]:
+        """
+        Omple la taula inside: taula[longitud - 1][inici][A] = log P(A =>* frase[inici:inici + longitud]).
+        """
+        n = len(frase)
+        buit = array('d', [MENYS_INFINIT]) * len(self.no_terminals)
+        taula = [[None] * (n - m) for m in range(n)]
+        actius = [[()] * (n - m) for m in range(n)]
+
+        for col, paraula in enumerate(frase):
+            termes = {}
+            for id_no_terminal, log_probabilitat, _ in self.regles_lexiques.get(paraula, ()):
+                termes.setdefault(id_no_terminal, []).append(log_probabilitat)
+            vector = buit[:]
+            for id_no_terminal, valors in termes.items():
+                vector[id_no_terminal] = _log_suma(valors)
+            taula[0][col] = vector
+            actius[0][col] = sorted(termes)
+
+        for longitud in range(1, n):
+            for col_esq in range(n - longitud):
+                termes = {}
+                for fila_esq in range(longitud):
+                    fila_dre = longitud - fila_esq - 1
+                    col_dre = col_esq + fila_esq + 1
+                    if not actius[fila_esq][col_esq] or not actius[fila_dre][col_dre]:
+                        continue
+                    vector_esq = taula[fila_esq][col_esq]
+                    vector_dre = taula[fila_dre][col_dre]
+                    for id_esq in actius[fila_esq][col_esq]:
+                        puntuacio_esq = vector_esq[id_esq]
+                        for id_dre, id_pare, log_probabilitat, _ in self.regles_per_esquerre[id_esq]:
+                            puntuacio_dre = vector_dre[id_dre]
+                            if puntuacio_dre != MENYS_INFINIT:
+                                termes.setdefault(id_pare, []).append(log_probabilitat + puntuacio_esq + puntuacio_dre)
+                vector = buit[:]
+                for id_no_terminal, valors in termes.items():
+                    vector[id_no_terminal] = _log_suma(valors)
+                taula[longitud][col_esq] = vector
+                actius[longitud][col_esq] = sorted(termes)
+
+        return taula
+
+    def log_probabilitat(self, frase: Union[List[str], str]) -> float:
+        """
+        Retorna el logaritme de la probabilitat total de la frase (-inf si no és derivable).
+        """
+        id_arrel = self.ids_no_terminals.get(self.simbol_arrel)
+        if not frase or id_arrel is None:
+            return MENYS_INFINIT
+        return self.inside(frase)[len(frase) - 1][0][id_arrel]
+
+    def probabilitat_total(self, frase: Union[List[str], str]) -> float:
+        """
+        Retorna la probabilitat total de la frase, sumant totes les seves derivacions.
+        En frases llargues pot ser massa petita per representar-se: llavors cal fer servir log_probabilitat.
+        """
+        return math.exp(self.log_probabilitat(frase))
+
+    def _outside(self, frase: Union[List[str], str], taula_inside: List[List[array]], comptes: Optional[Dict[int, float]]) -> Tuple[float, List[List[array]]]:
+        """
+        Omple la taula outside a partir de la inside i, si es demana, hi acumula els comptes esperats de cada regla.
+        :param comptes: Diccionari índex de regla -> compte esperat, que s'actualitza (o None per no comptar).
+        :return: Retorna log Z (la log-probabilitat total) i la taula outside, amb el mateix format que la inside.
+        """
+        n = len(frase)
+        id_arrel = self.ids_no_terminals.get(self.simbol_arrel)
+        buit = array('d', [MENYS_INFINIT]) * len(self.no_terminals)
+        log_z = taula_inside[n - 1][0][id_arrel] if id_arrel is not None else MENYS_INFINIT
+        outside = [[None] * (n - m) for m in range(n)]
+        if log_z == MENYS_INFINIT:
+            return log_z, outside
+
+        # Termes pendents de cada cel·la: es sumen quan s'hi arriba, ja que totes les cel·les pare són més llargues
+        pendents = [[{} for _ in range(n - m)] for m in range(n)]
+        pendents[n - 1][0][id_arrel] = [0.0]
+
+        for longitud in range(n - 1, -1, -1):
+            for col_esq in range(n - longitud):
+                vector = buit[:]
+                for id_no_terminal, valors in pendents[longitud][col_esq].items():
+                    vector[id_no_terminal] = _log_suma(valors)
+                outside[longitud][col_esq] = vector
+                pendents[longitud][col_esq] = None
+
+                if longitud == 0:
+                    if comptes is not None:
+                        for id_no_terminal, log_probabilitat, regla in self.regles_lexiques.get(frase[col_esq], ()):
+                            if vector[id_no_terminal] != MENYS_INFINIT:
+                                comptes[regla] = comptes.get(regla, 0.0) + math.exp(vector[id_no_terminal] + log_probabilitat - log_z)
+                    continue
+
+                for fila_esq in range(longitud):
+                    fila_dre = longitud - fila_esq - 1
+                    col_dre = col_esq + fila_esq + 1
+                    vector_esq = taula_inside[fila_esq][col_esq]
+                    vector_dre = taula_inside[fila_dre][col_dre]
+                    pendents_esq = pendents[fila_esq][col_esq]
+                    pendents_dre = pendents[fila_dre][col_dre]
+                    for id_esq, puntuacio_esq in enumerate(vector_esq):
+                        if puntuacio_esq == MENYS_INFINIT:
+                            continue
+                        for id_dre, id_pare, log_probabilitat, regla in self.regles_per_esquerre[id_esq]:
+                            puntuacio_dre = vector_dre[id_dre]
+                            puntuacio_pare = vector[id_pare]
+                            if puntuacio_dre == MENYS_INFINIT or puntuacio_pare == MENYS_INFINIT:
+                                continue
+                            base = puntuacio_pare + log_probabilitat
+                            pendents_esq.setdefault(id_esq, []).append(base + puntuacio_dre)
+                            pendents_dre.setdefault(id_dre, []).append(base + puntuacio_esq)
+                            if comptes is not None:
+                                comptes[regla] = comptes.get(regla, 0.0) + math.exp(base + puntuacio_esq + puntuacio_dre - log_z)
+
+        return log_z, outside
+
+    def marginals(self, frase: Union[List[str], str]) -> Tuple[float, Dict[Tuple[str, int, int], float], Dict[Tuple[str, Tuple[str, ...]], float]]:
+        """
+        Calcula les probabilitats a posteriori de la frase.
+        :return: Retorna (log Z, marginals de subcadena, marginals de regla), on
+                 - marginals de subcadena: (A, inici, fi) -> P(A cobreix frase[inici:fi] | frase), amb fi exclòs;
+                 - marginals de regla: (A, dreta) -> nombre esperat d'usos de la regla A -> dreta en la frase.
+                 Si la frase no és derivable, log Z és -inf i els diccionaris són buits.
+        """
+        if not frase:
+            return MENYS_INFINIT, {}, {}
+        taula_inside = self.inside(frase)
+        comptes = {}
+        log_z, outside = self._outside(frase, taula_inside, comptes)
+        if log_z == MENYS_INFINIT:
+            return log_z, {}, {}
+
+        subcadenes = {}
+        for longitud, fila in enumerate(outside):
+            for inici, vector in enumerate(fila):
+                for id_no_terminal, puntuacio in enumerate(vector):
+                    if puntuacio != MENYS_INFINIT and taula_inside[longitud][inici][id_no_terminal] != MENYS_INFINIT:
+                        clau = (self.no_terminals[id_no_terminal], inici, inici + longitud + 1)
+                        subcadenes[clau] = math.exp(puntuacio + taula_inside[longitud][inici][id_no_terminal] - log_z)
+
+        regles = {}
+        for regla, compte in comptes.items():
+            no_terminal, dreta, _ = self.regles[regla]
+            regles[(no_terminal, dreta)] = regles.get((no_terminal, dreta), 0.0) + compte
+        return log_z, subcadenes, regles
+
+    def _comptes_frase(self, frase: Union[List[str], str]) -> Tuple[float, Dict[int, float]]:
+        """
+        Comptes esperats d'una sola frase: (log Z, índex de regla -> compte esperat).
+        """
+        if not frase:
+            return MENYS_INFINIT, {}
+        comptes = {}
+        log_z, _ = self._outside(frase, self.inside(frase), comptes)
+        return log_z, comptes
+
+    def comptes_esperats(self, corpus: Iterable[Union[List[str], str]], workers: Optional[int] = 1,
+                         chunksize: Optional[int] = None) -> Tuple[array, float, int]:
+        """
+        Acumula en una sola passada els comptes esperats de totes les regles sobre un corpus.
+        :param corpus: Frases del corpus.
+        :param workers: Nombre de processos (veure lots.analitzar_lot). Per defecte s'analitza en el procés actual.
+        :param chunksize: Nombre màxim de frases per fragment enviat a un procés.
+        :return: Retorna (comptes per índex de regla, log-versemblança del corpus, frases derivables).
+                 Les frases no derivables no aporten comptes ni versemblança.
+        """
+        comptes = array('d', [0.0]) * len(self.regles)
+        log_versemblanca = 0.0
+        derivables = 0
+        for _, (log_z, comptes_frase) in analitzar_lot(self, '_comptes_frase', corpus, workers=workers, chunksize=chunksize, ordenat=False):
+            if log_z == MENYS_INFINIT:
+                continue
+            derivables += 1
+            log_versemblanca += log_z
+            for regla, compte in comptes_frase.items():
+                comptes[regla] += compte
+        return comptes, log_versemblanca, derivables
+
+    def reestimar(self, corpus: Iterable[Union[List[str], str]], workers: Optional[int] = 1, chunksize: Optional[int] = None) -> Tuple[Dict, float]:
+        """
+        Fa un pas de l'algoritme EM: reestima les probabilitats de les regles a partir dels comptes esperats del corpus.
+        Els no-terminals sense cap compte conserven les probabilitats actuals.
+        :return: Retorna la nova gramàtica (en FNC, amb el format de GramaticaProbabilistica) i la log-versemblança
+                 del corpus amb les probabilitats actuals.
+        """
+        comptes, log_versemblanca, _ = self.comptes_esperats(corpus, workers=workers, chunksize=chunksize)
+
+        totals = {}
+        for regla, (no_terminal, _, _) in enumerate(self.regles):
+            totals[no_terminal] = totals.get(no_terminal, 0.0) + comptes[regla]
+
+        gramatica = {}
+        for regla, (no_terminal, dreta, probabilitat) in enumerate(self.regles):
+            if totals[no_terminal] > 0:
+                probabilitat = comptes[regla] / totals[no_terminal]
+            gramatica.setdefault(no_terminal, []).append((list(dreta), probabilitat))
+        return gramatica, log_versemblanca
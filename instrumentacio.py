@@ -0,0 +1,96 @@
+from typing import Any, Dict, Optional
+import heapq
+import json
+import threading
+
+class EstadistiquesAnalisi():
+    """
+    Comptadors i temps d'una sola anàlisi amb algoritme_cky o algoritme_pcky.
+    Només s'omplen si es passen a l'algoritme: sense estadístiques, els bucles de la taula no fan cap feina addicional.
+    - longitud: nombre de paraules de la frase.
+    - celles: cel·les de longitud ≥ 2 calculades (les preses de la memòria cau de subcadenes es compten a celles_cau).
+    - divisions: punts de divisió amb les dues parts no buides.
+    - parelles: comprovacions del bucle intern: parelles (esquerre, dret) provades contra regles_binaries, o regles
+      de l'índex per fill esquerre o dret, o de totes les regles, segons l'estratègia de cada punt de divisió.
+    - encerts_regles: parelles que són la part dreta d'alguna regla binària.
+    - arestes_noves: no-terminals afegits a les cel·les de longitud ≥ 2.
+    - arestes_substituides: derivacions millorades d'un no-terminal que ja era a la cel·la (només PCKY).
+    - mida_maxima_cella: nombre màxim de no-terminals d'una cel·la.
+    - temps_lexic, temps_binari, temps_arbre: segons de cada fase (l'arbre només a PCKY).
+    """
+    __slots__ = ('longitud', 'celles', 'celles_cau', 'divisions', 'parelles', 'encerts_regles', 'arestes_noves',
+                 'arestes_substituides', 'mida_maxima_cella', 'temps_lexic', 'temps_binari', 'temps_arbre')
+
+    def __init__(self) -> None:
+        for camp in self.__slots__:
+            setattr(self, camp, 0)
+        self.temps_lexic = self.temps_binari = self.temps_arbre = 0.0
+
+    @property
+    def temps_total(self) -> float:
+        return self.temps_lexic + self.temps_binari + self.temps_arbre
+
+    def com_diccionari(self) -> Dict[str, float]:
+        """
+        Retorna les estadístiques com a diccionari, per exemple per desar-les en JSON.
+        """
+        return {camp: getattr(self, camp) for camp in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"EstadistiquesAnalisi({', '.join(f'{camp}={getattr(self, camp)!r}' for camp in self.__slots__)})"
+
+class RecollidorEstadistiques():
+    """
+    Acumula les estadístiques de moltes anàlisis (per exemple, d'un lot de frases) i en guarda les frases més lentes,
+    per poder veure després d'una execució per què unes frases costen molt més que d'altres.
+    Es pot fer servir des de diversos fils alhora.
+    """
+    def __init__(self, mes_lentes: int = 10) -> None:
+        """
+        :param mes_lentes: Nombre de frases més lentes que es guarden amb les seves estadístiques.
+        """
+        self.mes_lentes = mes_lentes
+        self.analisis = 0
+        self.totals = {camp: 0 for camp in EstadistiquesAnalisi.__slots__ if camp != 'mida_maxima_cella'}
+        self.mida_maxima_cella = 0
+        self._lentes = []  # munt de (temps, ordre, frase, estadístiques) amb la frase més ràpida al capdamunt
+        self._bloqueig = threading.Lock()
+
+    def afegir(self, estadistiques: EstadistiquesAnalisi, frase: Optional[Any] = None) -> None:
+        """
+        Afegeix les estadístiques d'una anàlisi.
+        :param frase: Frase analitzada, que es guarda si és de les més lentes.
+        """
+        with self._bloqueig:
+            self.analisis += 1
+            for camp in self.totals:
+                self.totals[camp] += getattr(estadistiques, camp)
+            self.mida_maxima_cella = max(self.mida_maxima_cella, estadistiques.mida_maxima_cella)
+            if self.mes_lentes:
+                entrada = (estadistiques.temps_total, self.analisis, frase, estadistiques.com_diccionari())
+                if len(self._lentes) < self.mes_lentes:
+                    heapq.heappush(self._lentes, entrada)
+                elif entrada[0] > self._lentes[0][0]:
+                    heapq.heapreplace(self._lentes, entrada)
+
+    def resum(self) -> Dict[str, Any]:
+        """
+        Retorna els totals, les mitjanes per anàlisi i les frases més lentes (de més a menys lenta).
+        """
+        with self._bloqueig:
+            mitjanes = {camp: total / self.analisis for camp, total in self.totals.items()} if self.analisis else {}
+            return {
+                'analisis': self.analisis,
+                'totals': dict(self.totals),
+                'mitjanes': mitjanes,
+                'mida_maxima_cella': self.mida_maxima_cella,
+                'mes_lentes': [{'frase': frase, 'estadistiques': estadistiques}
+                               for _, _, frase, estadistiques in sorted(self._lentes, reverse=True)],
+            }
+
+    def bolcar(self, ruta: str) -> None:
+        """
+        Desa el resum en un fitxer JSON.
+        """
+        with open(ruta, 'w', encoding='utf-8') as fitxer:
+            json.dump(self.resum(), fitxer, ensure_ascii=False, indent=2)
@@ -0,0 +1,180 @@
+from typing import Any, List, Optional, Tuple
+import heapq
+
+# Una derivació d'un node (fila, col, no-terminal) de la taula és (probabilitat, aresta, rangs), on
+# aresta = (fila_esq, B, C, probabilitat de la regla) i rangs = (j_esq, j_dre) són les posicions, dins de les llistes
+# de derivacions dels fills, de les subderivacions que fa servir. Les derivacions terminals tenen aresta i rangs a None.
+Derivacio = Tuple[float, Optional[Tuple[int, str, str, float]], Optional[Tuple[int, int]]]
+
+class ExtractorKMillors():
+    """
+    Extracció mandrosa de les k derivacions més probables a partir d'una taula PCKY ja omplerta
+    (algorisme 3 de Huang i Chiang, "Better k-best parsing", 2005).
+    Cada node de la taula guarda les seves derivacions ja trobades, en ordre, i una cua de candidates.
+    Les candidates d'un node només es generen quan se li demana una derivació, i la derivació j-èsima d'una aresta
+    només proposa les seves successores immediates (un rang més a l'esquerra o a la dreta). Així, demanar k derivacions
+    només visita els nodes que hi apareixen, sense enumerar tots els arbres de la taula.
+    """
+    def __init__(self, gramatica: Any, frase: List[str], taula: List[List[Any]]) -> None:
+        """
+        :param gramatica: GramaticaProbabilistica amb què s'ha omplert la taula.
+        :param frase: Frase analitzada.
+        :param taula: Taula de l'algoritme PCKY (taula[longitud - 1][inici], cel·les CellaPCKY).
+        """
+        self.gramatica = gramatica
+        self.frase = frase
+        self.taula = taula
+        self.derivacions = {}  # node -> llista de derivacions, de més a menys probable
+        self.candidates = {}  # node -> cua de prioritat de derivacions candidates
+        self.vistes = {}  # node -> conjunt de (aresta, rangs) ja afegits a la cua
+        self.ampliades = {}  # node -> nombre de derivacions de les quals ja s'han afegit les successores a la cua
+        self.esgotats = set()  # nodes que ja no tenen més derivacions
+        self.comptador = 0  # desempat de la cua, per no haver de comparar arestes
+
+    def _iniciar_node(self, node: Tuple[int, int, str]) -> None:
+        """
+        Prepara la llista de derivacions d'un node i la cua amb la millor derivació de cada aresta entrant.
+        """
+        fila, col, no_terminal = node
+        self.derivacions[node] = []
+        self.vistes[node] = set()
+        self.ampliades[node] = 0
+        cua = []
+        if fila == 0:
+            aresta = self.taula[0][col][no_terminal]
+            self.derivacions[node].append((aresta.probabilitat, None, None))
+        else:
+            for fila_esq in range(fila):
+                part_esq = self.taula[fila_esq][col]
+                part_dre = self.taula[fila - fila_esq - 1][col + fila_esq + 1]
+                if not (part_esq and part_dre):
+                    continue
+                for esq, dre, probabilitat in self.gramatica.regles_per_pare.get(no_terminal, ()):
+                    aresta_esq = part_esq.get(esq)
+                    aresta_dre = part_dre.get(dre)
+                    if aresta_esq is not None and aresta_dre is not None:
+                        aresta = (fila_esq, esq, dre, probabilitat)
+                        # La millor derivació d'una aresta combina les millors dels fills, que són les de la taula
+                        puntuacio = probabilitat * aresta_esq.probabilitat * aresta_dre.probabilitat
+                        cua.append((-puntuacio, self.comptador, aresta, (0, 0)))
+                        self.vistes[node].add((aresta, (0, 0)))
+                        self.comptador += 1
+            heapq.heapify(cua)
+        self.candidates[node] = cua
+
+    def _fills(self, node: Tuple[int, int, str], aresta: Tuple[int, str, str, float]) -> Tuple[Tuple[int, int, str], Tuple[int, int, str]]:
+        """
+        Retorna els nodes fills d'una aresta binària.
+        """
+        fila, col, _ = node
+        fila_esq, esq, dre, _ = aresta
+        return (fila_esq, col, esq), (fila - fila_esq - 1, col + fila_esq + 1, dre)
+
+    def _resolta(self, node: Tuple[int, int, str], j: int) -> bool:
+        """
+        Indica si ja se sap quina és la j-èsima derivació d'un node (o que no en té tantes).
+        """
+        derivacions = self.derivacions.get(node)
+        return derivacions is not None and (j < len(derivacions) or node in self.esgotats)
+
+    def _successores(self, node: Tuple[int, int, str], derivacio: Derivacio) -> List[Tuple[Tuple[int, str, str, float], Tuple[int, int]]]:
+        """
+        Retorna les arestes i rangs de les derivacions veïnes d'una derivació que encara no s'han afegit a la cua del node.
+        """
+        _, aresta, rangs = derivacio
+        if aresta is None:
+            return []
+        return [(aresta, nous_rangs) for nous_rangs in ((rangs[0] + 1, rangs[1]), (rangs[0], rangs[1] + 1))
+                if (aresta, nous_rangs) not in self.vistes[node]]
+
+    def _afegir_successores(self, node: Tuple[int, int, str], derivacio: Derivacio) -> None:
+        """
+        Afegeix a la cua del node les derivacions veïnes d'una derivació que s'acaba de treure'n.
+        Les derivacions dels fills que fan servir ja han d'estar resoltes (veure derivacio).
+        """
+        for aresta, nous_rangs in self._successores(node, derivacio):
+            node_esq, node_dre = self._fills(node, aresta)
+            derivacions_esq, derivacions_dre = self.derivacions[node_esq], self.derivacions[node_dre]
+            if nous_rangs[0] >= len(derivacions_esq) or nous_rangs[1] >= len(derivacions_dre):
+                continue
+            puntuacio = aresta[3] * derivacions_esq[nous_rangs[0]][0] * derivacions_dre[nous_rangs[1]][0]
+            heapq.heappush(self.candidates[node], (-puntuacio, self.comptador, aresta, nous_rangs))
+            self.vistes[node].add((aresta, nous_rangs))
+            self.comptador += 1
+
+    def derivacio(self, node: Tuple[int, int, str], j: int) -> Optional[Derivacio]:
+        """
+        Retorna la j-èsima derivació més probable d'un node (començant per 0), o None si el node en té menys de j + 1.
+        Les derivacions dels fills que calen per proposar les successores es resolen abans que les del pare,
+        amb una pila en lloc de recursió.
+        """
+        pila = [(node, j)]
+        while pila:
+            actual, rang = pila[-1]
+            if actual not in self.derivacions:
+                self._iniciar_node(actual)
+            derivacions = self.derivacions[actual]
+            if rang < len(derivacions) or actual in self.esgotats:
+                pila.pop()
+                continue
+            # Abans de treure la següent derivació de la cua, hi afegim les successores de l'última
+            if derivacions and self.ampliades[actual] < len(derivacions):
+                pendents = []
+                for aresta, nous_rangs in self._successores(actual, derivacions[-1]):
+                    for fill, rang_fill in zip(self._fills(actual, aresta), nous_rangs):
+                        if not self._resolta(fill, rang_fill):
+                            pendents.append((fill, rang_fill))
+                if pendents:
+                    pila.extend(pendents)
+                    continue
+                self._afegir_successores(actual, derivacions[-1])
+                self.ampliades[actual] = len(derivacions)
+            cua = self.candidates[actual]
+            if not cua:
+                self.esgotats.add(actual)
+                continue
+            negatiu, _, aresta, rangs = heapq.heappop(cua)
+            derivacions.append((-negatiu, aresta, rangs))
+        derivacions = self.derivacions[node]
+        return derivacions[j] if j < len(derivacions) else None
+
+    def arbre(self, node: Tuple[int, int, str], j: int) -> 'NodeArbre':
+        """
+        Construeix l'arbre de la j-èsima derivació d'un node, amb nodes NodeArbre com GramaticaProbabilistica._construir_arbre
+        i amb una pila en lloc de recursió.
+        """
+        from extensio_2 import NodeArbre
+
+        arrel = NodeArbre(node[2])
+        pila = [(arrel, node, j)]
+        while pila:
+            arbre, node, j = pila.pop()
+            probabilitat, aresta, rangs = self.derivacio(node, j)
+            arbre.probabilitat = probabilitat
+            if aresta is None:
+                arbre.simbol = self.frase[node[1]]
+                continue
+            arbre.simbol = (aresta[1], aresta[2])
+            fills = []
+            for fill, rang in zip(self._fills(node, aresta), rangs):
+                fill_arbre = NodeArbre(fill[2])
+                fills.append(fill_arbre)
+                pila.append((fill_arbre, fill, rang))
+            arbre.fill = tuple(fills)
+        return arrel
+
+    def k_millors(self, no_terminal: str, k: int) -> List[Tuple[float, 'NodeArbre']]:
+        """
+        Retorna fins a k derivacions de tota la frase des del no-terminal indicat, de més a menys probable.
+        :return: Llista de parells (probabilitat, arbre gramatical).
+        """
+        node = (len(self.taula) - 1, 0, no_terminal)
+        if no_terminal not in self.taula[node[0]][0]:
+            return []
+        resultat = []
+        for j in range(k):
+            derivacio = self.derivacio(node, j)
+            if derivacio is None:
+                break
+            resultat.append((derivacio[0], self.arbre(node, j)))
+        return resultat
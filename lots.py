@@ -0,0 +1,216 @@
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import os
+import time
+
+# Gramàtica i mètode d'anàlisi de cada procés treballador. S'assignen un sol cop, en crear el procés,
+# i així la gramàtica compilada no s'ha de tornar a enviar amb cada fragment de frases.
+_gramatica = None
+_metode = None
+
+def _inicialitzar_treballador(gramatica: Any, metode: str) -> None:
+    """
+    Inicialitza un procés treballador amb la gramàtica i el mètode que farà servir per analitzar.
+    """
+    global _gramatica, _metode
+    _gramatica = gramatica
+    _metode = metode
+
+def _analitzar_fragment(fragment: List[Tuple[int, Union[List[str], str]]]) -> List[Tuple[int, Any]]:
+    """
+    Analitza un fragment de frases dins d'un procés treballador.
+    :param fragment: Llista de parells (índex original, frase).
+    :return: Llista de parells (índex original, resultat de l'anàlisi).
+    """
+    analitzar = getattr(_gramatica, _metode)
+    return [(index, analitzar(frase)) for index, frase in fragment]
+
+def _analitzar_fragment_cronometrat(fragment: List[Tuple[int, Union[List[str], str]]]) -> List[Tuple[int, Any, float]]:
+    """
+    Com _analitzar_fragment, però també retorna el temps d'anàlisi de cada frase.
+    :return: Llista de triples (índex original, resultat de l'anàlisi, temps en segons).
+    """
+    analitzar = getattr(_gramatica, _metode)
+    resultats = []
+    for index, frase in fragment:
+        inici = time.perf_counter()
+        resultat = analitzar(frase)
+        resultats.append((index, resultat, time.perf_counter() - inici))
+    return resultats
+
+def planificar_fragments(frases: List[Union[List[str], str]], chunksize: int) -> List[List[Tuple[int, Union[List[str], str]]]]:
+    """
+    Reparteix les frases en fragments per enviar als processos treballadors.
+    Les frases s'ordenen de més llarga a més curta, de manera que les més costoses comencen primer,
+    i un fragment es tanca quan arriba a chunksize frases o quan el seu cost estimat (n³ per frase)
+    supera el cost d'un fragment de chunksize frases de la longitud mitjana. Així una frase llarga no
+    queda darrere de moltes altres dins del mateix fragment.
+    :param frases: Frases a analitzar.
+    :param chunksize: Nombre màxim de frases per fragment.
+    :return: Llista de fragments, cadascun amb parells (índex original, frase).
+    """
+    ordre = sorted(range(len(frases)), key=lambda index: len(frases[index]), reverse=True)
+    longitud_mitjana = sum(len(frase) for frase in frases) / max(len(frases), 1)
+    cost_maxim = chunksize * max(longitud_mitjana, 1) ** 3
+
+    fragments = []
+    fragment = []
+    cost = 0
+    for index in ordre:
+        cost_frase = max(len(frases[index]), 1) ** 3
+        if fragment and (len(fragment) >= chunksize or cost + cost_frase > cost_maxim):
+            fragments.append(fragment)
+            fragment = []
+            cost = 0
+        fragment.append((index, frases[index]))
+        cost += cost_frase
+    if fragment:
+        fragments.append(fragment)
+    return fragments
+
+def analitzar_lot(gramatica: Any, metode: str, frases: Iterable[Union[List[str], str]], workers: Optional[int] = None,
+                  chunksize: Optional[int] = None, ordenat: bool = True) -> Iterator[Any]:
+    """
+    Analitza moltes frases amb un mètode de la gramàtica repartint la feina en un grup de processos.
+    :param gramatica: Gramàtica amb què s'analitza (s'envia un sol cop a cada procés).
+    :param metode: Nom del mètode d'anàlisi de la gramàtica (per exemple 'algoritme_cky').
+    :param frases: Frases a analitzar.
+    :param workers: Nombre de processos. Amb 1 s'analitza en el procés actual; per defecte, un per CPU.
+    :param chunksize: Nombre màxim de frases per fragment. Per defecte es calcula a partir del nombre de frases i processos.
+    :param ordenat: Si és True, retorna els resultats en el mateix ordre que les frases.
+                    Si és False, retorna parells (índex, resultat) a mesura que s'acaben.
+    :return: Iterador sobre els resultats.
+    """
+    # Els arguments es validen aquí i no dins del generador, perquè els errors surtin en la crida i no en el primer next()
+    frases = list(frases)
+    workers = _validar_workers(workers)
+    if chunksize is None:
+        chunksize = max(1, min(64, len(frases) // (workers * 4)))
+    _validar_chunksize(chunksize)
+    return _analitzar_lot(gramatica, metode, frases, workers, chunksize, ordenat)
+
+def _validar_workers(workers: Optional[int]) -> int:
+    """
+    Retorna el nombre de processos (un per CPU si és None), o llança ValueError si no és vàlid.
+    """
+    if workers is None:
+        return os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("El nombre de processos ha de ser com a mínim 1.")
+    return workers
+
+def _validar_chunksize(chunksize: int) -> None:
+    """
+    Llança ValueError si la mida dels fragments no és vàlida.
+    """
+    if chunksize < 1:
+        raise ValueError("La mida dels fragments ha de ser com a mínim 1.")
+
+def _analitzar_lot(gramatica: Any, metode: str, frases: List[Union[List[str], str]], workers: int, chunksize: int,
+                   ordenat: bool) -> Iterator[Any]:
+    """
+    Generador d'analitzar_lot, amb els arguments ja validats.
+    """
+    if workers == 1:
+        analitzar = getattr(gramatica, metode)
+        for index, frase in enumerate(frases):
+            yield analitzar(frase) if ordenat else (index, analitzar(frase))
+        return
+
+    fragments = planificar_fragments(frases, chunksize)
+    resultats = {}
+    seguent = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_inicialitzar_treballador, initargs=(gramatica, metode)) as executor:
+        pendents = {executor.submit(_analitzar_fragment, fragment) for fragment in fragments}
+        while pendents:
+            acabats, pendents = wait(pendents, return_when=FIRST_COMPLETED)
+            for futur in acabats:
+                for index, resultat in futur.result():
+                    if ordenat:
+                        resultats[index] = resultat
+                    else:
+                        yield (index, resultat)
+
+            # Retornem tots els resultats consecutius que ja tenim
+            while seguent in resultats:
+                yield resultats.pop(seguent)
+                seguent += 1
+
+def analitzar_flux(gramatica: Any, metode: str, frases: Iterable[Union[List[str], str]], workers: Optional[int] = None,
+                   chunksize: int = 64, ordenat: bool = True, longitud_maxima: Optional[int] = None,
+                   max_pendents: Optional[int] = None) -> Iterator[Tuple[int, Any, float]]:
+    """
+    Versió en flux de analitzar_lot per a corpus que no caben a memòria: les frases es llegeixen a mesura que
+    queden processos lliures i només hi ha max_pendents fragments en curs alhora. A diferència d'analitzar_lot,
+    els fragments s'envien en l'ordre de les frases, sense ordenar-les per longitud.
+    :param longitud_maxima: Les frases més llargues no s'analitzen i el seu resultat és None.
+    :param max_pendents: Nombre màxim de fragments en curs. Per defecte, el doble que de processos.
+    :param ordenat: Si és True, els resultats surten en l'ordre de les frases; si no, a mesura que s'acaben.
+                    En mode ordenat, una frase lenta pot retenir a memòria els resultats dels fragments posteriors.
+    :return: Iterador de triples (índex, resultat, temps d'anàlisi en segons).
+    """
+    workers = _validar_workers(workers)
+    _validar_chunksize(chunksize)
+    if max_pendents is None:
+        max_pendents = 2 * workers
+    elif max_pendents < 1:
+        raise ValueError("El nombre màxim de fragments en curs ha de ser com a mínim 1.")
+    return _analitzar_flux(gramatica, metode, frases, workers, chunksize, ordenat, longitud_maxima, max_pendents)
+
+def _analitzar_flux(gramatica: Any, metode: str, frases: Iterable[Union[List[str], str]], workers: int, chunksize: int,
+                    ordenat: bool, longitud_maxima: Optional[int], max_pendents: int) -> Iterator[Tuple[int, Any, float]]:
+    """
+    Generador d'analitzar_flux, amb els arguments ja validats.
+    """
+    def omesa(frase: Union[List[str], str]) -> bool:
+        return longitud_maxima is not None and len(frase) > longitud_maxima
+
+    if workers == 1:
+        analitzar = getattr(gramatica, metode)
+        for index, frase in enumerate(frases):
+            if omesa(frase):
+                yield (index, None, 0.0)
+                continue
+            inici = time.perf_counter()
+            resultat = analitzar(frase)
+            yield (index, resultat, time.perf_counter() - inici)
+        return
+
+    entrada = enumerate(frases)
+    resultats = {}
+    seguent = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_inicialitzar_treballador, initargs=(gramatica, metode)) as executor:
+        pendents = set()
+        exhaurit = False
+        while pendents or not exhaurit:
+            # Omplim els fragments en curs fins al límit, llegint només les frases que calen
+            while not exhaurit and len(pendents) < max_pendents:
+                fragment = list(islice(entrada, chunksize))
+                if not fragment:
+                    exhaurit = True
+                    break
+                analitzables = []
+                for index, frase in fragment:
+                    if omesa(frase):
+                        if ordenat:
+                            resultats[index] = (index, None, 0.0)
+                        else:
+                            yield (index, None, 0.0)
+                    else:
+                        analitzables.append((index, frase))
+                if analitzables:
+                    pendents.add(executor.submit(_analitzar_fragment_cronometrat, analitzables))
+
+            if pendents:
+                acabats, pendents = wait(pendents, return_when=FIRST_COMPLETED)
+                for futur in acabats:
+                    for triple in futur.result():
+                        if ordenat:
+                            resultats[triple[0]] = triple
+                        else:
+                            yield triple
+
+            while seguent in resultats:
+                yield resultats.pop(seguent)
+                seguent += 1
@@ -1,17 +1,57 @@
-from typing import Dict, List, Set, Tuple, Union
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from copy import deepcopy
+from lots import analitzar_lot
+from bosc import BoscCompartit, construir_bosc
+from cache_subcadenes import CacheSubcadenes
+from instrumentacio import EstadistiquesAnalisi
+from filtres_taula import FiltresTaula
+from index_regles import IndexRegles
+import math
+import sys
+import time
 
 class Gramatica():
-    def __init__(self, normes_gramatica: Dict, simbol_arrel: str = 'S') -> None:
+    def __init__(self, normes_gramatica: Dict, simbol_arrel: str = 'S', cache_subcadenes: Optional[CacheSubcadenes] = None,
+                 filtrar_taula: bool = True) -> None:
+        """
+        :param cache_subcadenes: Memòria cau de cel·les per subcadena que fa servir l'algoritme compilat (None per no fer-ne servir).
+        :param filtrar_taula: Si és True, es descarten de la taula els no-terminals que no poden arribar a l'arrel des de la seva
+                              posició i només es combinen els que poden fer de fill esquerre o dret (veure filtres_taula.py).
+                              Si la gramàtica no permet descartar cap no-terminal, el filtre no s'aplica.
+        """
         self.gramatica = deepcopy(normes_gramatica) # Evita aliasing
+        self._inicialitzar_taules(simbol_arrel, cache_subcadenes, filtrar_taula)
+
+    def _inicialitzar_taules(self, simbol_arrel: str, cache_subcadenes: Optional[CacheSubcadenes] = None,
+                             filtrar_taula: bool = True) -> None:
+        """
+        Prepara les taules d'accés ràpid a partir de la gramàtica.
+        """
         self.regles_binaries = self._preprocessar_regles_binaries()
+        self.index_lexic = self._preprocessar_index_lexic()
         self.simbol_arrel = simbol_arrel
-        
-    def algoritme_cky(self, frase: Union[List[str], str]) -> bool:
+        self.cache_subcadenes = cache_subcadenes
+        self.filtres = FiltresTaula(((no_terminal, esq, dre) for (esq, dre), no_terminals in self.regles_binaries.items()
+                                     for no_terminal in no_terminals), simbol_arrel,
+                                    set(self.gramatica).union(*self.regles_binaries, *self.index_lexic.values()))
+        self.filtrar_taula = filtrar_taula and self.filtres.util
+        # Índexs de regles de l'estratègia adaptativa d'algoritme_cky (veure _combinar). Amb estrategia_adaptativa a False,
+        # algoritme_cky sempre prova totes les parelles.
+        self.index_regles = IndexRegles(self.regles_binaries)
+        # Cost fix, en consultes de parelles, de sortir del bucle intern cap a _combinar: canviar d'estratègia només val
+        # la pena si n'estalvia més que això
+        self.sobrecost_estrategia = 16
+        self.estrategia_adaptativa = True
+        self._compilar_regles_bits()
+        # Longitud a partir de la qual reconeixer fa servir algoritme_cky_matricial en lloc d'algoritme_cky_compilat
+        self.llindar_matricial = 64
+
+    def algoritme_cky(self, frase: Union[List[str], str], estadistiques: Optional[EstadistiquesAnalisi] = None) -> bool:
         """
         Analitza una frase gramaticalment utilitzant l'algoritme CKY.
         Omple la taula dinàmica de CKY amb la frase donada.
         :param frase: Es tracta de la cadena que volem analitzar.
+        :param estadistiques: Si s'indica, s'hi anoten els comptadors i els temps de l'anàlisi (veure instrumentacio.py).
         :return: Retorna un boolean que inidica si la cadena es pot derivar o no.
         """
         
@@ -20,41 +60,418 @@ class Gramatica():
             return self._comprovar_derivacio_buida()
         
         n = len(frase)
+        if estadistiques is not None:
+            estadistiques.longitud = n
+            inici = time.perf_counter()
         # Crea taula triangular buida (aprofitem la propietat triangular de la taula CKY i ens estalviem memòria innecessària)
-        taula = [[set() for _ in range(n - m)] for m in range(n)]
-
-        # Omplim la primera fila (cas base): terminals
-        for col in range(n):
-            paraula = frase[col]
-            for no_terminal, produccions in list(self.gramatica.items()): # Evitem aliasing durant l'execució del bucle
-                for produccio in produccions:
-                    # Comprovem les produccions terminals (A -> a)
-                    if len(produccio) == 1 and produccio[0] == paraula:
-                        taula[0][col].add(no_terminal)
+        # La primera fila (cas base) són els terminals, que obtenim de l'índex lèxic (A -> a)
+        taula = [self.consultar_lexic(frase)] + [[set() for _ in range(n - m)] for m in range(1, n)]
+        # Les parts que es combinen: sense filtre, les mateixes cel·les; amb filtre, només els possibles fills esquerres i drets
+        taula_esq = taula_dre = taula
+        if self.filtrar_taula:
+            # Els no-terminals que no es poden combinar des de la seva posició es queden a la cel·la, però no es proven
+            esquerres, drets = self.filtres.esquerres_permesos, self.filtres.drets_permesos
+            buit = frozenset()
+            taula_esq = [[cella & esquerres[(col == 0, col == n - 1)] for col, cella in enumerate(taula[0])]] + [[buit] * (n - m) for m in range(1, n)]
+            taula_dre = [[cella & drets[(col == 0, col == n - 1)] for col, cella in enumerate(taula[0])]] + [[buit] * (n - m) for m in range(1, n)]
+        if estadistiques is not None:
+            estadistiques.mida_maxima_cella = max(len(cella) for cella in taula[0])
+            estadistiques.temps_lexic = time.perf_counter() - inici
+            inici = time.perf_counter()
+        # Amb poques parelles, provar-les totes sempre és més barat que sortir del bucle per triar una altra estratègia
+        llindar = self.sobrecost_estrategia if self.estrategia_adaptativa else math.inf
         
         # Omplim la resta de la taula (longitud 2 a n)
         for longitud in range(1, n):  # longitud de la subcadena
             for col_esq in range(n - longitud): # inici de la subcadena
+                cella = taula[longitud][col_esq]
                 # Provem totes les possibles divisions de la subcadena
                 for fila_esq in range(longitud): # longitud de la part esquerra
                     
                     fila_dre = longitud - fila_esq - 1 # longitud de la part dreta
                     col_dre = col_esq + fila_esq + 1 # inici de la part dreta
 
-                    part_esq = taula[fila_esq][col_esq]
-                    part_dre = taula[fila_dre][col_dre]
+                    part_esq = taula_esq[fila_esq][col_esq]
+                    part_dre = taula_dre[fila_dre][col_dre]
                     # Si alguna de les dues parts és buida, no podem continuar
                     if part_esq and part_dre:
+                        # L'estratègia es tria un sol cop per divisió, i amb estadístiques es fa servir la mateixa
+                        parelles = len(part_esq) * len(part_dre)
+                        if parelles > llindar:
+                            estrategia = self.index_regles.triar_estrategia(part_esq, part_dre, llindar)
+                            if estrategia:
+                                self._combinar(cella, part_esq, part_dre, estrategia, estadistiques)
+                                continue
+                        if estadistiques is not None:
+                            estadistiques.divisions += 1
+                            estadistiques.parelles += parelles
+                            abans = len(cella)
                         # Comprovem totes les regles de la gramàtica per produccions binàries
                         for no_terminal_esq in part_esq:
                             for no_termina_dre in part_dre:
                                 # Comprovem les produccions binàries (A -> BC)
                                 clau = (no_terminal_esq, no_termina_dre)
                                 if clau in self.regles_binaries:
-                                    taula[longitud][col_esq].update(self.regles_binaries[clau])
+                                    cella.update(self.regles_binaries[clau])
+                                    if estadistiques is not None:
+                                        estadistiques.encerts_regles += 1
+                        if estadistiques is not None:
+                            estadistiques.arestes_noves += len(cella) - abans
+
+                if cella and taula_esq is not taula:
+                    posicio = (col_esq == 0, col_esq + longitud + 1 == n)
+                    taula_esq[longitud][col_esq] = cella & esquerres[posicio]
+                    taula_dre[longitud][col_esq] = cella & drets[posicio]
+                if estadistiques is not None:
+                    estadistiques.celles += 1
+                    estadistiques.mida_maxima_cella = max(estadistiques.mida_maxima_cella, len(taula[longitud][col_esq]))
 
+        if estadistiques is not None:
+            estadistiques.temps_binari = time.perf_counter() - inici
         return self.simbol_arrel in taula[n-1][0]
-                
+
+    def _combinar(self, cella: Set[str], part_esq: FrozenSet[str], part_dre: FrozenSet[str], estrategia: int,
+                  estadistiques: Optional[EstadistiquesAnalisi] = None) -> None:
+        """
+        Bucle intern d'algoritme_cky per a un punt de divisió, amb l'estratègia triada per IndexRegles.triar_estrategia:
+        - 0: provar totes les parelles (B, C) de les dues parts contra regles_binaries;
+        - 1: recórrer les regles de cada B de la part esquerra i mirar si C és a la dreta;
+        - 2: recórrer les regles de cada C de la part dreta i mirar si B és a l'esquerra;
+        - 3: recórrer totes les regles i mirar si B i C hi són.
+        :param estadistiques: Si s'indica, s'hi anoten els comptadors (les parelles són les consultes fetes).
+        """
+        abans = len(cella)
+        consultes = 0
+        encerts = 0
+
+        if estrategia == 0:
+            consultes = len(part_esq) * len(part_dre)
+            for no_terminal_esq in part_esq:
+                for no_terminal_dre in part_dre:
+                    no_terminals = self.regles_binaries.get((no_terminal_esq, no_terminal_dre))
+                    if no_terminals is not None:
+                        encerts += 1
+                        cella.update(no_terminals)
+        elif estrategia == 1:
+            for no_terminal_esq in part_esq:
+                regles = self.index_regles.per_esquerre.get(no_terminal_esq, ())
+                consultes += len(regles)
+                for no_terminal_dre, no_terminals in regles:
+                    if no_terminal_dre in part_dre:
+                        encerts += 1
+                        cella.update(no_terminals)
+        elif estrategia == 2:
+            for no_terminal_dre in part_dre:
+                regles = self.index_regles.per_dret.get(no_terminal_dre, ())
+                consultes += len(regles)
+                for no_terminal_esq, no_terminals in regles:
+                    if no_terminal_esq in part_esq:
+                        encerts += 1
+                        cella.update(no_terminals)
+        else:
+            consultes = len(self.index_regles.llista_regles)
+            for no_terminal_esq, no_terminal_dre, no_terminals in self.index_regles.llista_regles:
+                if no_terminal_esq in part_esq and no_terminal_dre in part_dre:
+                    encerts += 1
+                    cella.update(no_terminals)
+
+        if estadistiques is not None:
+            estadistiques.divisions += 1
+            estadistiques.parelles += consultes
+            estadistiques.encerts_regles += encerts
+            estadistiques.arestes_noves += len(cella) - abans
+
+    def parse_many(self, frases: Iterable[Union[List[str], str]], workers: Optional[int] = None, chunksize: Optional[int] = None,
+                   ordenat: bool = True, metode: str = 'algoritme_cky') -> Iterator:
+        """
+        Analitza moltes frases repartint-les entre un grup de processos (veure lots.analitzar_lot).
+        La gramàtica s'envia un sol cop a cada procés i les frases més llargues es planifiquen primer.
+        :param frases: Frases a analitzar.
+        :param workers: Nombre de processos (1 analitza en el procés actual; per defecte, un per CPU).
+        :param chunksize: Nombre màxim de frases per fragment enviat a un procés.
+        :param ordenat: Si és True, els resultats surten en l'ordre de les frases; si no, com a parells (índex, resultat) a mesura que acaben.
+        :param metode: Mètode d'anàlisi que s'aplica a cada frase.
+        :return: Iterador amb el resultat de algoritme_cky per a cada frase.
+        """
+        return analitzar_lot(self, metode, frases, workers=workers, chunksize=chunksize, ordenat=ordenat)
+
+    def algoritme_cky_compilat(self, frase: Union[List[str], str]) -> bool:
+        """
+        Variant compilada de l'algoritme CKY.
+        Cada cel·la de la taula és un enter on el bit i indica si el no-terminal amb identificador i hi és present,
+        i les regles binàries s'apliquen amb les màscares precalculades a _compilar_regles_bits.
+        :param frase: Es tracta de la cadena que volem analitzar.
+        :return: Retorna un boolean que inidica si la cadena es pot derivar o no.
+        """
+
+        if not frase:
+            return self._comprovar_derivacio_buida()
+
+        id_arrel = self.ids_no_terminals.get(self.simbol_arrel)
+        if id_arrel is None:
+            return False
+
+        taula = self._omplir_taula_bits(frase)
+        return bool(taula[len(frase)-1][0] >> id_arrel & 1)
+
+    def algoritme_cky_matricial(self, frase: Union[List[str], str]) -> bool:
+        """
+        Variant de l'algoritme CKY per a frases molt llargues (milers de símbols), que prova tots els punts de divisió
+        d'una cel·la alhora. Cada no-terminal B té dues matrius booleanes de la frase guardades com a enters, una fila per bit:
+        - fins[B][i]: bit k actiu si B deriva la subcadena frase[i:k];
+        - inicis[B][j]: bit k actiu si B deriva la subcadena frase[k:j].
+        Una regla A -> B C deriva frase[i:j] si fins[B][i] & inicis[C][j] no és zero: és el producte booleà de la fila i
+        de B per la columna j de C, fet amb una sola operació sobre enters de n bits en lloc d'un bucle per divisió.
+        Així, el cost en Python és O(n² · |G|) en lloc d'O(n³ · |G|).
+        :param frase: Es tracta de la cadena que volem analitzar.
+        :return: Retorna un boolean que inidica si la cadena es pot derivar o no.
+        """
+
+        if not frase:
+            return self._comprovar_derivacio_buida()
+
+        n = len(frase)
+        fins = {}
+        inicis = {}
+        # actius[i]: no-terminals B amb fins[B][i] no buit, els únics que poden fer de fill esquerre d'una subcadena que comença a i
+        actius = [[] for _ in range(n + 1)]
+        index_per_esquerre = self.index_regles.per_esquerre
+
+        def afegir(no_terminal: str, inici: int, final: int) -> None:
+            files = fins.get(no_terminal)
+            if files is None:
+                files = fins[no_terminal] = [0] * (n + 1)
+                inicis[no_terminal] = [0] * (n + 1)
+            if not files[inici]:
+                actius[inici].append(no_terminal)
+            files[inici] |= 1 << final
+            inicis[no_terminal][final] |= 1 << inici
+
+        # Cas base: terminals, consultant l'índex lèxic (A -> a)
+        for col, no_terminals in enumerate(self.consultar_lexic(frase)):
+            for no_terminal in no_terminals:
+                afegir(no_terminal, col, col + 1)
+
+        buit = [0] * (n + 1)
+        for longitud in range(2, n + 1):
+            for inici in range(n - longitud + 1):
+                final = inici + longitud
+                nous = set()
+                for esquerre in actius[inici]:
+                    fila = fins[esquerre][inici]
+                    for dret, pares in index_per_esquerre.get(esquerre, ()):
+                        if fila & inicis.get(dret, buit)[final]:
+                            nous.update(pares)
+                for no_terminal in nous:
+                    afegir(no_terminal, inici, final)
+
+        return bool(fins.get(self.simbol_arrel, buit)[0] >> n & 1)
+
+    def reconeixer(self, frase: Union[List[str], str]) -> bool:
+        """
+        Reconeix una frase amb la variant més ràpida segons la seva longitud: algoritme_cky_compilat per a les frases curtes,
+        on les màscares de bits per cel·la combinen molts no-terminals alhora, i algoritme_cky_matricial a partir de
+        llindar_matricial paraules, on el que pesa és el nombre de punts de divisió.
+        :param frase: Es tracta de la cadena que volem analitzar.
+        :return: Retorna un boolean que inidica si la cadena es pot derivar o no.
+        """
+        if len(frase) >= self.llindar_matricial:
+            return self.algoritme_cky_matricial(frase)
+        return self.algoritme_cky_compilat(frase)
+
+    def reconeixer_lot(self, frases: Iterable[Union[List[str], str]], mida_grup: int = 256) -> List[bool]:
+        """
+        Reconeix moltes frases alhora, agrupant-les per longitud i omplint una sola taula per a cada grup.
+        A la taula d'un grup, cada cel·la és un diccionari no_terminal -> enter on el bit b indica si el no-terminal
+        hi és per a la frase b del grup, de manera que cada regla s'aplica a totes les frases amb una sola operació
+        (veure _reconeixer_grup). Com que les frases d'un grup tenen la mateixa longitud, no cal cap farciment.
+        :param frases: Frases a analitzar.
+        :param mida_grup: Nombre màxim de frases de cada grup.
+        :return: Llista amb el resultat d'algoritme_cky per a cada frase, en el mateix ordre.
+        """
+        frases = list(frases)
+        resultats = [False] * len(frases)
+        grups = {}  # longitud -> índexs de les frases
+        for index, frase in enumerate(frases):
+            if not frase:
+                resultats[index] = self._comprovar_derivacio_buida()
+            else:
+                grups.setdefault(len(frase), []).append(index)
+        for indexs in grups.values():
+            for inici in range(0, len(indexs), mida_grup):
+                grup = indexs[inici:inici + mida_grup]
+                for index, resultat in zip(grup, self._reconeixer_grup([frases[index] for index in grup])):
+                    resultats[index] = resultat
+        return resultats
+
+    def _reconeixer_grup(self, frases: List[Union[List[str], str]]) -> List[bool]:
+        """
+        Omple una sola taula CKY per a un grup de frases no buides de la mateixa longitud.
+        :return: Retorna si cada frase del grup és derivable.
+        """
+        n = len(frases[0])
+        index_per_esquerre = self.index_regles.per_esquerre
+        taula = [[{} for _ in range(n - m)] for m in range(n)]
+
+        # Cas base: terminals, consultant l'índex lèxic (A -> a) de cada frase
+        for posicio, frase in enumerate(frases):
+            bit = 1 << posicio
+            for col, no_terminals in enumerate(self.consultar_lexic(frase)):
+                cella = taula[0][col]
+                for no_terminal in no_terminals:
+                    cella[no_terminal] = cella.get(no_terminal, 0) | bit
+
+        for longitud in range(1, n):
+            for col_esq in range(n - longitud):
+                cella = taula[longitud][col_esq]
+                for fila_esq in range(longitud):
+                    part_esq = taula[fila_esq][col_esq]
+                    part_dre = taula[longitud - fila_esq - 1][col_esq + fila_esq + 1]
+                    if not (part_esq and part_dre):
+                        continue
+                    for no_terminal_esq, frases_esq in part_esq.items():
+                        for no_terminal_dre, no_terminals in index_per_esquerre.get(no_terminal_esq, ()):
+                            # Frases del grup on hi ha alhora el fill esquerre i el dret
+                            frases_regla = frases_esq & part_dre.get(no_terminal_dre, 0)
+                            if frases_regla:
+                                for no_terminal in no_terminals:
+                                    cella[no_terminal] = cella.get(no_terminal, 0) | frases_regla
+
+        arrel = taula[n-1][0].get(self.simbol_arrel, 0)
+        return [bool(arrel >> posicio & 1) for posicio in range(len(frases))]
+
+    def bosc_derivacions(self, frase: Union[List[str], str]) -> Optional[BoscCompartit]:
+        """
+        Analitza una frase i en retorna totes les derivacions en forma de bosc compartit (veure bosc.BoscCompartit),
+        que permet comptar, recórrer i mostrejar els arbres sense enumerar-los tots.
+        :param frase: Es tracta de la cadena que volem analitzar.
+        :return: Retorna el bosc de derivacions, o None si la frase no és derivable (o és la cadena buida).
+        """
+        if not frase:
+            return None
+        return construir_bosc(self, frase, self._omplir_taula_bits(frase))
+
+    def _omplir_taula_bits(self, frase: Union[List[str], str]) -> List[List[int]]:
+        """
+        Omple la taula de màscares de bits de l'algoritme compilat per a una frase no buida.
+        Si la gramàtica té memòria cau de subcadenes, les cel·les de subcadenes ja vistes s'hi prenen en lloc de calcular-les.
+        Amb filtrar_taula, cada cel·la només conserva els no-terminals permesos a la seva posició i només es combinen
+        els no-terminals de la part esquerra que poden fer de fill esquerre.
+        :return: Retorna la taula triangular (taula[longitud - 1][inici]).
+        """
+        n = len(frase)
+        mascares_dretes = self.mascares_dretes
+        regles_bits = self.regles_bits
+        cache = self.cache_subcadenes
+        # Sense filtre, les màscares de tots els bits a 1 (-1) deixen les cel·les com estan
+        filtrar = self.filtrar_taula
+        mascara_esquerres = self.mascara_esquerres if filtrar else -1
+        mascares_permeses = self.mascares_permeses if filtrar else dict.fromkeys(self.mascares_permeses, -1)
+        # Cas base: la màscara lèxica de cada paraula
+        mascares_lexiques = self.mascares_lexiques
+        taula = ([[mascares_lexiques.get(paraula, 0) & mascares_permeses[(col == 0, col == n - 1)] for col, paraula in enumerate(frase)]]
+                 + [[0] * (n - m) for m in range(1, n)])
+
+        # trobades[inici]: si la subcadena de la fila anterior que comença a inici era a la memòria cau
+        trobades = [True] * n
+        for longitud in range(1, n):
+            usar_cache = cache is not None and cache.admet(longitud + 1)
+            trobades_fila = [False] * (n - longitud)
+            for col_esq in range(n - longitud):
+                # Només fem servir la memòria cau si les dues subcadenes d'una paraula menys hi eren: si no, aquesta tampoc
+                # no hi pot ser, i així una subcadena només s'hi guarda quan les seves parts ja s'han repetit
+                candidata = usar_cache and trobades[col_esq] and trobades[col_esq + 1]
+                posicio = (col_esq == 0, col_esq + longitud + 1 == n)
+                if candidata:
+                    # Amb el filtre, la cel·la depèn de si la subcadena toca l'inici o el final de la frase
+                    subcadena = tuple(frase[col_esq:col_esq + longitud + 1])
+                    if filtrar:
+                        subcadena = (subcadena, posicio)
+                    cella = cache.obtenir(subcadena)
+                    if cella is not None:
+                        taula[longitud][col_esq] = cella
+                        trobades_fila[col_esq] = True
+                        continue
+
+                cella = 0
+                for fila_esq in range(longitud):
+                    part_esq = taula[fila_esq][col_esq] & mascara_esquerres
+                    part_dre = taula[longitud - fila_esq - 1][col_esq + fila_esq + 1]
+                    if not (part_esq and part_dre):
+                        continue
+
+                    # Recorrem els bits actius de la part esquerra
+                    while part_esq:
+                        bit_esq = part_esq & -part_esq
+                        part_esq ^= bit_esq
+                        id_esq = bit_esq.bit_length() - 1
+
+                        # Només els fills drets que formen regla amb aquest fill esquerre
+                        candidats = part_dre & mascares_dretes[id_esq]
+                        while candidats:
+                            bit_dre = candidats & -candidats
+                            candidats ^= bit_dre
+                            cella |= regles_bits[id_esq][bit_dre.bit_length() - 1]
+
+                cella &= mascares_permeses[posicio]
+                taula[longitud][col_esq] = cella
+                if candidata:
+                    cache.desar(subcadena, cella, sys.getsizeof(cella))
+            trobades = trobades_fila
+
+        return taula
+
+    def _compilar_regles_bits(self) -> None:
+        """
+        Assigna un identificador enter a cada no-terminal i precalcula les màscares de bits de l'algoritme compilat:
+        - mascares_dretes[B]: màscara dels C tals que existeix alguna regla A -> B C.
+        - regles_bits[B][C]: màscara dels A tals que A -> B C.
+        - mascares_lexiques[a]: màscara dels A tals que A -> a.
+        - mascara_esquerres i mascares_permeses[(toca_inici, toca_final)]: els conjunts de filtres_taula.FiltresTaula com a màscares.
+        """
+        self.ids_no_terminals = {}
+        for no_terminal in self.gramatica:
+            self.ids_no_terminals.setdefault(no_terminal, len(self.ids_no_terminals))
+        for esq, dre in self.regles_binaries:
+            self.ids_no_terminals.setdefault(esq, len(self.ids_no_terminals))
+            self.ids_no_terminals.setdefault(dre, len(self.ids_no_terminals))
+
+        ids = self.ids_no_terminals
+        self.mascares_dretes = [0] * len(ids)
+        self.regles_bits = [{} for _ in range(len(ids))]
+        for (esq, dre), no_terminals in self.regles_binaries.items():
+            mascara = 0
+            for no_terminal in no_terminals:
+                mascara |= 1 << ids[no_terminal]
+            self.mascares_dretes[ids[esq]] |= 1 << ids[dre]
+            self.regles_bits[ids[esq]][ids[dre]] = mascara
+
+        self.mascares_lexiques = {}
+        for paraula, no_terminals in self.index_lexic.items():
+            mascara = 0
+            for no_terminal in no_terminals:
+                mascara |= 1 << ids[no_terminal]
+            self.mascares_lexiques[paraula] = mascara
+
+        def mascara_conjunt(no_terminals: FrozenSet[str]) -> int:
+            mascara = 0
+            for no_terminal in no_terminals:
+                if no_terminal in ids:
+                    mascara |= 1 << ids[no_terminal]
+            return mascara
+        self.mascara_esquerres = mascara_conjunt(self.filtres.esquerres)
+        self.mascares_permeses = {posicio: mascara_conjunt(permesos) for posicio, permesos in self.filtres.permesos.items()}
+
+    def consultar_lexic(self, frase: Union[List[str], str]) -> List[FrozenSet[str]]:
+        """
+        Consulta l'índex lèxic per a totes les paraules d'una frase alhora.
+        :param frase: Llista de paraules (o cadena de caràcters) a consultar.
+        :return: Llista amb el conjunt de no-terminals A tals que A -> paraula, per a cada posició de la frase.
+        """
+        index_lexic = self.index_lexic
+        buit = frozenset()
+        return [index_lexic.get(paraula, buit) for paraula in frase]
+
     def _preprocessar_regles_binaries(self) -> Dict[Tuple[str, str], Set[str]]:
         """ 
         Preprocessa la gramàtica per accés ràpid a les regles binàries.
@@ -72,6 +489,20 @@ class Gramatica():
 
         return regles_binaries
     
+    def _preprocessar_index_lexic(self) -> Dict[str, FrozenSet[str]]:
+        """
+        Preprocessa la gramàtica per accés ràpid a les regles terminals.
+        Aquesta funció crea un diccionari on les claus són paraules i els valors són els no-terminals que les produeixen (A -> a).
+        """
+        index_lexic = {}  # Diccionari on paraula -> {no_terminal}
+
+        for no_terminal, produccions in list(self.gramatica.items()):
+            for produccio in produccions:
+                if len(produccio) == 1:  # Només regles terminals
+                    index_lexic.setdefault(produccio[0], set()).add(no_terminal)
+
+        return {paraula: frozenset(no_terminals) for paraula, no_terminals in index_lexic.items()}
+
     def _comprovar_derivacio_buida(self) -> bool:
         """ 
         Comprova si la cadena buida és derivable a partir del símbol d'inici. 
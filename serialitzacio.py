@@ -0,0 +1,265 @@
+from typing import Any, BinaryIO, Dict, IO, Iterable, Iterator, List, Optional
+from array import array
+import struct
+import sys
+
+from extensio_2 import NodeArbre, _arbre_des_de_preordre
+
+# Els parèntesis dins de les paraules es codifiquen com al Penn Treebank perquè no es confonguin amb l'estructura
+_ESCAPAMENTS = {'(': '-LRB-', ')': '-RRB-'}
+
+def _escapar(simbol: str) -> str:
+    if '(' in simbol or ')' in simbol:
+        return ''.join(_ESCAPAMENTS.get(caracter, caracter) for caracter in simbol)
+    return simbol
+
+def arbre_parentitzat(arbre: Optional[dict]) -> Optional[str]:
+    """
+    Converteix un arbre gramatical (veure GramaticaProbabilistica._construir_arbre) en una cadena amb parèntesis
+    a l'estil del Penn Treebank, per exemple "(S (NP john) (VP (V saw) (NP (Det his) (N glasses))))".
+    Recorre l'arbre amb una pila, de manera que no depèn del límit de recursió en frases llargues.
+    :param arbre: Arbre gramatical, o None.
+    :return: Retorna la cadena, o None si no hi ha arbre.
+    """
+    if arbre is None:
+        return None
+    parts = []
+    pila = [arbre]
+    while pila:
+        node = pila.pop()
+        if isinstance(node, str):  # tancament d'un node intern
+            parts.append(node)
+        elif node['fill'] is None:
+            parts.append(f"({_escapar(node['no_terminal'])} {_escapar(node['simbol'])})")
+        else:
+            parts.append(f"({_escapar(node['no_terminal'])}")
+            pila.append(')')
+            # Els fills s'afegeixen a la pila en ordre invers perquè surtin d'esquerra a dreta
+            for fill in reversed(node['fill']):
+                pila.append(fill)
+                pila.append(' ')
+    return ''.join(parts)
+
+
+class _EscriptorArbres():
+    """
+    Base dels escriptors d'arbres en bloc: els arbres serialitzats s'acumulen en memòria i s'escriuen al fitxer
+    d'una sola vegada quan el bloc arriba a mida_buffer, de manera que escriure no sigui el coll d'ampolla d'un lot.
+    Els escriptors es fan servir amb with, o cridant buidar en acabar.
+    """
+    def __init__(self, fitxer: IO, mida_buffer: int = 1 << 20) -> None:
+        """
+        :param fitxer: Fitxer obert on s'escriuen els arbres (no es tanca en acabar).
+        :param mida_buffer: Mida aproximada, en bytes o caràcters, dels blocs que s'escriuen al fitxer.
+        """
+        self.fitxer = fitxer
+        self.mida_buffer = mida_buffer
+        self.arbres = 0
+
+    def escriure(self, arbre: Optional[Any]) -> None:
+        raise NotImplementedError
+
+    def escriure_tots(self, arbres: Iterable[Optional[Any]]) -> int:
+        """
+        Escriu tots els arbres d'un iterable (None per a les frases sense arbre).
+        :return: Retorna el nombre d'arbres escrits.
+        """
+        abans = self.arbres
+        for arbre in arbres:
+            self.escriure(arbre)
+        return self.arbres - abans
+
+    def buidar(self) -> None:
+        """
+        Escriu al fitxer els arbres pendents del bloc en curs.
+        """
+        raise NotImplementedError
+
+    def __enter__(self) -> '_EscriptorArbres':
+        return self
+
+    def __exit__(self, *excepcio: Any) -> None:
+        self.buidar()
+
+class EscriptorParentitzat(_EscriptorArbres):
+    """
+    Escriu arbres en un fitxer de text a l'estil del Penn Treebank (veure arbre_parentitzat), un arbre per línia.
+    Les frases sense arbre s'escriuen com a "()", perquè la línia i del fitxer sigui sempre la frase i.
+    """
+    def __init__(self, fitxer: IO[str], mida_buffer: int = 1 << 20) -> None:
+        super().__init__(fitxer, mida_buffer)
+        self._linies = []
+        self._caracters = 0
+
+    def escriure(self, arbre: Optional[Any]) -> None:
+        linia = arbre_parentitzat(arbre) if arbre is not None else '()'
+        self._linies.append(linia)
+        self._caracters += len(linia) + 1
+        self.arbres += 1
+        if self._caracters >= self.mida_buffer:
+            self.buidar()
+
+    def buidar(self) -> None:
+        if self._linies:
+            self._linies.append('')
+            self.fitxer.write('\n'.join(self._linies))
+            self._linies = []
+            self._caracters = 0
+
+# Format binari: la capçalera és _MAGIC, i després ve un registre per arbre.
+# Cada registre comença amb (nodes, paraules, símbols nous) en tres enters de 32 bits i un byte d'amplades, i els
+# símbols nous, cadascun com a longitud de 32 bits i UTF-8. Els símbols (no-terminals i paraules) reben identificadors consecutius per ordre
+# d'aparició al fitxer. Segueixen els vectors, en little-endian:
+# - simbols: identificador del no-terminal de cada node, en preordre.
+# - inicis, longituds: subcadena (posició inicial i nombre de paraules) de cada node.
+# - probabilitats: probabilitat de cada node, en float64.
+# - paraules: identificador de cada paraula de la frase.
+# Els identificadors i les subcadenes són enters de 16 bits si hi caben (bits _SIMBOLS_16 i _SUBCADENES_16 del byte
+# d'amplades), o de 32 bits si no.
+# Els nodes de longitud 1 són fulles; la resta tenen dos fills. Un registre sense nodes és una frase sense arbre.
+_MAGIC = b'CKYA\x01'
+_CAPCALERA_REGISTRE = struct.Struct('<IIIB')
+_SIMBOLS_16, _SUBCADENES_16 = 1, 2
+_LONGITUD = struct.Struct('<I')
+_CANVIAR_ORDRE = sys.byteorder != 'little'
+
+def _bytes_vector(vector: array) -> bytes:
+    if _CANVIAR_ORDRE:
+        vector.byteswap()
+    return vector.tobytes()
+
+class EscriptorArbresBinari(_EscriptorArbres):
+    """
+    Escriu arbres en el format binari compacte (veure _MAGIC), que es pot llegir amb llegir_arbres_binari sense analitzar
+    text. Els arbres han de ser binaris, com els de l'algoritme PCKY (NodeArbre o diccionaris amb els mateixos camps).
+    """
+    def __init__(self, fitxer: BinaryIO, mida_buffer: int = 1 << 20) -> None:
+        super().__init__(fitxer, mida_buffer)
+        self.ids_simbols: Dict[str, int] = {}
+        self._buffer = bytearray(_MAGIC)
+
+    def _id(self, simbol: str, nous: List[str]) -> int:
+        identificador = self.ids_simbols.get(simbol)
+        if identificador is None:
+            identificador = self.ids_simbols[simbol] = len(self.ids_simbols)
+            nous.append(simbol)
+        return identificador
+
+    def escriure(self, arbre: Optional[Any]) -> None:
+        self.arbres += 1
+        if arbre is None:
+            self._buffer += _CAPCALERA_REGISTRE.pack(0, 0, 0, 0)
+            self._buidar_si_cal()
+            return
+
+        nous = []
+        simbols, inicis, probabilitats, fulles = array('I'), array('I'), array('d'), []
+        paraules = array('I')
+        pila = [arbre]
+        while pila:
+            node = pila.pop()
+            if node is None:
+                raise ValueError("L'arbre té nodes buits i no es pot escriure en format binari.")
+            simbols.append(self._id(node['no_terminal'], nous))
+            inicis.append(len(paraules))
+            probabilitats.append(node['probabilitat'])
+            fills = node['fill']
+            if fills is None:
+                fulles.append(True)
+                paraules.append(self._id(node['simbol'], nous))
+            elif len(fills) == 2:
+                fulles.append(False)
+                pila.append(fills[1])
+                pila.append(fills[0])
+            else:
+                raise ValueError("Els arbres en format binari han de ser binaris.")
+
+        # Les longituds surten recorrent el preordre al revés: els fills d'un node hi apareixen abans que ell,
+        # i l'esquerre queda a dalt de la pila
+        longituds = array('I', bytes(4 * len(simbols)))
+        pila = []
+        for posicio in range(len(simbols) - 1, -1, -1):
+            longitud = 1 if fulles[posicio] else pila.pop() + pila.pop()
+            longituds[posicio] = longitud
+            pila.append(longitud)
+
+        amplades = 0
+        if len(self.ids_simbols) <= 0x10000:
+            amplades |= _SIMBOLS_16
+            simbols, paraules = array('H', simbols), array('H', paraules)
+        if len(paraules) <= 0xFFFF:
+            amplades |= _SUBCADENES_16
+            inicis, longituds = array('H', inicis), array('H', longituds)
+
+        buffer = self._buffer
+        buffer += _CAPCALERA_REGISTRE.pack(len(simbols), len(paraules), len(nous), amplades)
+        for simbol in nous:
+            codificat = simbol.encode('utf-8')
+            buffer += _LONGITUD.pack(len(codificat))
+            buffer += codificat
+        for vector in (simbols, inicis, longituds, probabilitats, paraules):
+            buffer += _bytes_vector(vector)
+        self._buidar_si_cal()
+
+    def _buidar_si_cal(self) -> None:
+        if len(self._buffer) >= self.mida_buffer:
+            self.buidar()
+
+    def buidar(self) -> None:
+        if self._buffer:
+            self.fitxer.write(self._buffer)
+            self._buffer = bytearray()
+
+def _llegir(fitxer: BinaryIO, mida: int) -> bytes:
+    dades = fitxer.read(mida)
+    if len(dades) != mida:
+        raise ValueError("El fitxer d'arbres està truncat.")
+    return dades
+
+def _llegir_vector(fitxer: BinaryIO, tipus: str, mida: int) -> array:
+    vector = array(tipus)
+    vector.frombytes(_llegir(fitxer, mida * vector.itemsize))
+    if _CANVIAR_ORDRE:
+        vector.byteswap()
+    return vector
+
+def llegir_arbres_binari(fitxer: BinaryIO) -> Iterator[Optional[NodeArbre]]:
+    """
+    Llegeix els arbres d'un fitxer escrit amb EscriptorArbresBinari, en el mateix ordre.
+    Cada registre es llegeix amb unes poques lectures de vectors sencers, sense analitzar text.
+    :return: Retorna un iterador d'arbres (NodeArbre), amb None per a les frases sense arbre.
+    """
+    if fitxer.read(len(_MAGIC)) != _MAGIC:
+        raise ValueError("El fitxer no és un fitxer d'arbres en format binari.")
+    taula_simbols = []
+    while True:
+        capcalera = fitxer.read(_CAPCALERA_REGISTRE.size)
+        if not capcalera:
+            return
+        if len(capcalera) != _CAPCALERA_REGISTRE.size:
+            raise ValueError("El fitxer d'arbres està truncat.")
+        n_nodes, n_paraules, n_nous, amplades = _CAPCALERA_REGISTRE.unpack(capcalera)
+        for _ in range(n_nous):
+            (longitud,) = _LONGITUD.unpack(_llegir(fitxer, _LONGITUD.size))
+            taula_simbols.append(_llegir(fitxer, longitud).decode('utf-8'))
+        if n_nodes == 0:
+            yield None
+            continue
+
+        tipus_simbol = 'H' if amplades & _SIMBOLS_16 else 'I'
+        tipus_subcadena = 'H' if amplades & _SUBCADENES_16 else 'I'
+        simbols = [taula_simbols[identificador] for identificador in _llegir_vector(fitxer, tipus_simbol, n_nodes)]
+        inicis = _llegir_vector(fitxer, tipus_subcadena, n_nodes)
+        longituds = _llegir_vector(fitxer, tipus_subcadena, n_nodes)
+        probabilitats = _llegir_vector(fitxer, 'd', n_nodes)
+        paraules = [taula_simbols[identificador] for identificador in _llegir_vector(fitxer, tipus_simbol, n_paraules)]
+
+        # Un subarbre de longitud l té 2l - 1 nodes, així que el fill dret d'un node intern és a posicio + 2 * l_esquerre
+        preordre = []
+        for posicio, longitud in enumerate(longituds):
+            if longitud == 1:
+                preordre.append((simbols[posicio], paraules[inicis[posicio]], probabilitats[posicio], False))
+            else:
+                dret = posicio + 2 * longituds[posicio + 1]
+                preordre.append((simbols[posicio], (simbols[posicio + 1], simbols[dret]), probabilitats[posicio], True))
+        yield _arbre_des_de_preordre(preordre)
@@ -0,0 +1,293 @@
+from typing import Any, Dict, List, Optional, Tuple, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import functools
+import json
+import math
+
+from lots import _analitzar_fragment, _inicialitzar_treballador, _validar_workers
+
+# Protocol: una petició JSON per línia i una resposta JSON per línia, per TCP.
+#   petició   {"id": 1, "frase": "john saw his glasses"}      (la frase també pot ser una llista de paraules)
+#   resposta  {"id": 1, "derivable": true, "probabilitat": 0.0048, "latencia_ms": 1.3}
+#   error     {"id": 1, "error": "..."}
+#   {"ordre": "estadistiques"} retorna l'estat del servidor: cua, lots i percentils de latència.
+# Les respostes d'una mateixa connexió poden arribar en un ordre diferent del de les peticions: cal fer servir l'id.
+
+def _percentil(valors: List[float], percentil: float) -> float:
+    """
+    Percentil d'una llista ordenada de valors (mètode del rang més proper).
+    """
+    if not valors:
+        return 0.0
+    index = max(0, min(len(valors) - 1, math.ceil(percentil / 100 * len(valors)) - 1))
+    return valors[index]
+
+class ServidorAnalisi():
+    """
+    Servidor asyncio que analitza frases amb una gramàtica carregada un sol cop.
+    Les peticions que arriben alhora s'agrupen en lots petits (fins a mida_lot peticions o espera_lot segons)
+    que s'envien a un grup de processos, cadascun amb una còpia de la gramàtica (veure lots.py).
+    """
+    def __init__(self, gramatica: Any, metode: Optional[str] = None, workers: Optional[int] = None, mida_lot: int = 32,
+                 espera_lot: float = 0.002, longitud_maxima: int = 100, temps_maxim: float = 10.0, caracters: bool = False) -> None:
+        """
+        :param gramatica: Gramàtica amb què s'analitza (Gramatica, GramaticaFNC o GramaticaProbabilistica).
+        :param metode: Mètode d'anàlisi. Per defecte, algoritme_pcky si la gramàtica és probabilística i algoritme_cky_compilat si no.
+        :param workers: Nombre de processos (per defecte, un per CPU).
+        :param mida_lot: Nombre màxim de peticions per lot.
+        :param espera_lot: Temps màxim (en segons) que s'espera a omplir un lot després de la primera petició.
+        :param longitud_maxima: Les frases amb més paraules es rebutgen sense analitzar-les.
+        :param temps_maxim: Temps màxim (en segons) d'una petició, des que arriba fins que té resultat.
+        :param caracters: Si és True, les frases que arriben com a text es parteixen en caràcters en lloc de paraules.
+        """
+        if mida_lot < 1:
+            raise ValueError("La mida dels lots ha de ser com a mínim 1.")
+        if metode is None:
+            metode = 'algoritme_pcky' if hasattr(gramatica, 'algoritme_pcky') else 'algoritme_cky_compilat'
+        self.gramatica = gramatica
+        self.metode = metode
+        self.workers = _validar_workers(workers)
+        self.mida_lot = mida_lot
+        self.espera_lot = espera_lot
+        self.longitud_maxima = longitud_maxima
+        self.temps_maxim = temps_maxim
+        self.caracters = caracters
+
+        self.latencies = deque(maxlen=10000)  # latències de les últimes peticions, en segons
+        self.peticions = 0
+        self.rebutjades = 0
+        self.temps_esgotat = 0
+        self.lots = 0
+        self.peticions_en_lots = 0
+        self.en_curs = 0  # peticions enviades als processos que encara no tenen resultat
+        self.servidor = None
+        self.connexions = {}  # escriptor -> tasca que atén la connexió
+
+    async def iniciar(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        """
+        Crea el grup de processos i comença a escoltar connexions. Amb port=0 el sistema tria un port lliure (veure port).
+        """
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_inicialitzar_treballador,
+                                            initargs=(self.gramatica, self.metode))
+        self.cua = asyncio.Queue()
+        # Permetem el doble de lots en curs que de processos, perquè cap procés es quedi esperant feina
+        self.lots_disponibles = asyncio.Semaphore(2 * self.workers)
+        self.agrupador = asyncio.create_task(self._agrupar())
+        self.servidor = await asyncio.start_server(self._atendre, host, port)
+        return self.servidor
+
+    @property
+    def port(self) -> int:
+        return self.servidor.sockets[0].getsockname()[1]
+
+    async def aturar(self) -> None:
+        """
+        Deixa d'acceptar connexions, tanca les connexions obertes, atura l'agrupador de lots i tanca el grup de processos
+        sense bloquejar el bucle d'esdeveniments.
+        """
+        self.servidor.close()
+        tasques = list(self.connexions.values())
+        for escriptor in list(self.connexions):
+            escriptor.close()
+        await asyncio.gather(*tasques, return_exceptions=True)
+        await self.servidor.wait_closed()
+        self.agrupador.cancel()
+        await asyncio.gather(self.agrupador, return_exceptions=True)
+        # Els lots que ja s'estan analitzant s'esperen en un fil, perquè el bucle d'esdeveniments no quedi bloquejat
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(self.executor.shutdown, cancel_futures=True))
+
+    async def analitzar(self, frase: Union[List[str], str]) -> Dict[str, Any]:
+        """
+        Analitza una frase passant per la cua de lots.
+        :return: Retorna la resposta de la petició, sense l'id.
+        """
+        bucle = asyncio.get_running_loop()
+        inici = bucle.time()
+        if isinstance(frase, str):
+            frase = list(frase) if self.caracters else frase.split()
+        if not isinstance(frase, list) or not all(isinstance(paraula, str) for paraula in frase):
+            self.rebutjades += 1
+            return {'error': "La frase ha de ser un text o una llista de paraules."}
+        if len(frase) > self.longitud_maxima:
+            self.rebutjades += 1
+            return {'error': f"La frase té {len(frase)} paraules i el màxim és {self.longitud_maxima}."}
+
+        futur = bucle.create_future()
+        self.cua.put_nowait((frase, futur))
+        try:
+            resultat = await asyncio.wait_for(futur, self.temps_maxim)
+        except asyncio.TimeoutError:
+            self.temps_esgotat += 1
+            return {'error': f"L'anàlisi ha superat el temps màxim de {self.temps_maxim} s."}
+
+        latencia = bucle.time() - inici
+        self.latencies.append(latencia)
+        self.peticions += 1
+        if isinstance(resultat, bool):
+            resposta = {'derivable': resultat}
+        else:
+            derivable, probabilitat = resultat
+            resposta = {'derivable': derivable, 'probabilitat': probabilitat}
+        resposta['latencia_ms'] = latencia * 1000
+        return resposta
+
+    def estadistiques(self) -> Dict[str, Any]:
+        """
+        Retorna l'estat del servidor: peticions servides, rebutjades i fora de temps, peticions a la cua o en curs,
+        lots enviats amb la seva mida mitjana i percentils de latència (en ms) de les últimes peticions.
+        """
+        latencies = sorted(self.latencies)
+        return {
+            'peticions': self.peticions,
+            'rebutjades': self.rebutjades,
+            'temps_esgotat': self.temps_esgotat,
+            'cua': self.cua.qsize() + self.en_curs,
+            'lots': self.lots,
+            'mida_mitjana_lot': self.peticions_en_lots / self.lots if self.lots else 0.0,
+            'latencia_ms': {f'p{percentil}': _percentil(latencies, percentil) * 1000 for percentil in (50, 90, 99)}
+        }
+
+    async def _agrupar(self) -> None:
+        """
+        Forma els lots: espera la primera petició i hi afegeix les que arriben fins a omplir el lot o esgotar espera_lot.
+        """
+        bucle = asyncio.get_running_loop()
+        while True:
+            lot = [await self.cua.get()]
+            limit = bucle.time() + self.espera_lot
+            while len(lot) < self.mida_lot:
+                if not self.cua.empty():
+                    lot.append(self.cua.get_nowait())
+                    continue
+                restant = limit - bucle.time()
+                if restant <= 0:
+                    break
+                try:
+                    lot.append(await asyncio.wait_for(self.cua.get(), restant))
+                except asyncio.TimeoutError:
+                    break
+
+            # Les peticions que ja han superat el temps màxim no s'analitzen
+            lot = [(frase, futur) for frase, futur in lot if not futur.done()]
+            if lot:
+                await self.lots_disponibles.acquire()
+                self.lots += 1
+                self.peticions_en_lots += len(lot)
+                self.en_curs += len(lot)
+                asyncio.create_task(self._executar(lot))
+
+    async def _executar(self, lot: List[Tuple[List[str], asyncio.Future]]) -> None:
+        """
+        Envia un lot al grup de processos i hi reparteix els resultats.
+        """
+        try:
+            fragment = [(index, frase) for index, (frase, _) in enumerate(lot)]
+            resultats = await asyncio.get_running_loop().run_in_executor(self.executor, _analitzar_fragment, fragment)
+            for index, resultat in resultats:
+                if not lot[index][1].done():
+                    lot[index][1].set_result(resultat)
+        except Exception as error:
+            for _, futur in lot:
+                if not futur.done():
+                    futur.set_exception(error)
+        finally:
+            self.en_curs -= len(lot)
+            self.lots_disponibles.release()
+
+    async def _atendre(self, lector: asyncio.StreamReader, escriptor: asyncio.StreamWriter) -> None:
+        """
+        Atén una connexió: cada línia és una petició, que es respon tan aviat com té resultat.
+        """
+        pendents = set()
+        self.connexions[escriptor] = asyncio.current_task()
+        try:
+            while True:
+                linia = await lector.readline()
+                if not linia:
+                    break
+                if linia.strip():
+                    tasca = asyncio.create_task(self._respondre(linia, escriptor))
+                    pendents.add(tasca)
+                    tasca.add_done_callback(pendents.discard)
+            if pendents:
+                await asyncio.wait(pendents)
+        finally:
+            self.connexions.pop(escriptor, None)
+            escriptor.close()
+
+    async def _respondre(self, linia: bytes, escriptor: asyncio.StreamWriter) -> None:
+        try:
+            peticio = json.loads(linia)
+            if not isinstance(peticio, dict):
+                raise ValueError
+        except ValueError:
+            resposta = {'id': None, 'error': "La petició ha de ser un objecte JSON."}
+        else:
+            if peticio.get('ordre') == 'estadistiques':
+                resposta = self.estadistiques()
+            else:
+                try:
+                    resposta = await self.analitzar(peticio.get('frase'))
+                except Exception as error:
+                    resposta = {'error': f"Error en l'anàlisi: {error}"}
+            resposta['id'] = peticio.get('id')
+        escriptor.write(json.dumps(resposta, ensure_ascii=False).encode('utf-8') + b'\n')
+        await escriptor.drain()
+
+def carregar_gramatica(ruta: Optional[str], tipus: str, simbol_arrel: str = 'S', exemple: Optional[str] = None) -> Any:
+    """
+    Carrega la gramàtica del servidor.
+    :param ruta: Gramàtica compilada (.ckyg, veure desar_compilada) o gramàtica en JSON amb el format de gramatiques.py.
+    :param tipus: 'cky' (Gramatica, ja en FNC), 'fnc' (GramaticaFNC) o 'probabilistica' (GramaticaProbabilistica).
+    :param exemple: Nom d'una gramàtica de gramatiques.py (per exemple 'G11'), en lloc d'un fitxer.
+    """
+    from main_cky import Gramatica
+    from extensio_1 import GramaticaFNC
+    from extensio_2 import GramaticaProbabilistica
+    classe = {'cky': Gramatica, 'fnc': GramaticaFNC, 'probabilistica': GramaticaProbabilistica}[tipus]
+
+    if exemple is not None:
+        import gramatiques
+        return classe(getattr(gramatiques, exemple), simbol_arrel)
+    if ruta.endswith('.ckyg'):
+        if classe is Gramatica:
+            raise ValueError("Les gramàtiques compilades (.ckyg) només es poden carregar com a 'fnc' o 'probabilistica'.")
+        return classe.from_compiled(ruta)
+    with open(ruta, encoding='utf-8') as fitxer:
+        return classe(json.load(fitxer), simbol_arrel)
+
+async def _servir(opcions: argparse.Namespace) -> None:
+    gramatica = carregar_gramatica(opcions.gramatica, opcions.tipus, opcions.simbol_arrel, opcions.exemple)
+    servidor = ServidorAnalisi(gramatica, workers=opcions.workers, mida_lot=opcions.mida_lot, espera_lot=opcions.espera_lot_ms / 1000,
+                               longitud_maxima=opcions.longitud_maxima, temps_maxim=opcions.temps_maxim, caracters=opcions.caracters)
+    await servidor.iniciar(opcions.host, opcions.port)
+    print(f"Servidor escoltant a {opcions.host}:{servidor.port} ({servidor.metode}, {servidor.workers} processos)", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.aturar()
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Servidor local d'anàlisi CKY/PCKY amb protocol JSON per línies.")
+    font = arguments.add_mutually_exclusive_group(required=True)
+    font.add_argument('--gramatica', help="Gramàtica compilada (.ckyg) o gramàtica en JSON.")
+    font.add_argument('--exemple', help="Nom d'una gramàtica de gramatiques.py (per exemple G11).")
+    arguments.add_argument('--tipus', choices=['cky', 'fnc', 'probabilistica'], default='probabilistica', help="Tipus de gramàtica.")
+    arguments.add_argument('--simbol-arrel', default='S', help="Símbol arrel de la gramàtica.")
+    arguments.add_argument('--host', default='127.0.0.1', help="Adreça on escolta el servidor.")
+    arguments.add_argument('--port', type=int, default=8765, help="Port on escolta el servidor (0 per triar-ne un de lliure).")
+    arguments.add_argument('--workers', type=int, help="Nombre de processos (per defecte, un per CPU).")
+    arguments.add_argument('--mida-lot', type=int, default=32, help="Nombre màxim de peticions per lot.")
+    arguments.add_argument('--espera-lot-ms', type=float, default=2.0, help="Temps màxim d'espera per omplir un lot, en ms.")
+    arguments.add_argument('--longitud-maxima', type=int, default=100, help="Nombre màxim de paraules per frase.")
+    arguments.add_argument('--temps-maxim', type=float, default=10.0, help="Temps màxim per petició, en segons.")
+    arguments.add_argument('--caracters', action='store_true', help="Parteix les frases en caràcters en lloc de paraules.")
+    opcions = arguments.parse_args()
+
+    try:
+        asyncio.run(_servir(opcions))
+    except KeyboardInterrupt:
+        pass
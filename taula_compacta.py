@@ -0,0 +1,91 @@
+from typing import Dict, Tuple
+from array import array
+from bisect import bisect_left
+
+class TaulaCompacta():
+    """
+    Taula triangular de l'algoritme PCKY guardada en vectors tipats plans, sense cap objecte de Python per aresta.
+    Les n(n+1)/2 cel·les s'ordenen per longitud i, dins de cada longitud, per inici (l'ordre en què CKY les completa),
+    i les arestes de totes les cel·les es guarden seguides, com en una matriu dispersa per files:
+    - inicis[k]: posició de la primera aresta de la cel·la k (inicis[k + 1] és la primera de la següent).
+    - simbols: identificador del no-terminal de cada aresta, en ordre creixent dins de cada cel·la.
+    - puntuacions: log-probabilitat de la millor derivació de cada aresta.
+    - divisions: longitud de la part esquerra (0 a les cel·les d'una paraula).
+    - fills_esq, fills_dre: identificadors dels fills de la millor derivació (0 a les cel·les d'una paraula).
+    Amb gramàtiques i frases de menys de 65536 no-terminals i paraules, cada aresta ocupa 16 bytes.
+    Les cel·les s'omplen afegint-hi arestes (afegir) i tancant-les (tancar_cella) en ordre.
+    """
+    __slots__ = ('n', 'inicis', 'simbols', 'puntuacions', 'divisions', 'fills_esq', 'fills_dre')
+
+    def __init__(self, n: int, n_simbols: int) -> None:
+        """
+        :param n: Nombre de paraules de la frase.
+        :param n_simbols: Nombre de no-terminals de la gramàtica (els identificadors van de 0 a n_simbols - 1).
+        """
+        tipus_simbol = 'H' if n_simbols <= 0xFFFF else 'I'
+        self.n = n
+        self.inicis = array('q', [0])
+        self.simbols = array(tipus_simbol)
+        self.puntuacions = array('d')
+        self.divisions = array('H' if n <= 0xFFFF else 'I')
+        self.fills_esq = array(tipus_simbol)
+        self.fills_dre = array(tipus_simbol)
+
+    def index(self, inici: int, longitud: int) -> int:
+        """
+        Posició de la cel·la de la subcadena que comença a inici i té aquesta longitud (≥ 1) en l'ordre de la taula.
+        """
+        anteriors = longitud - 1
+        return anteriors * self.n - anteriors * (anteriors - 1) // 2 + inici
+
+    def rang(self, inici: int, longitud: int) -> Tuple[int, int]:
+        """
+        Posicions (primera, última + 1) de les arestes d'una cel·la ja tancada.
+        """
+        k = self.index(inici, longitud)
+        return self.inicis[k], self.inicis[k + 1]
+
+    def afegir(self, simbol: int, puntuacio: float, divisio: int = 0, fill_esq: int = 0, fill_dre: int = 0) -> None:
+        """
+        Afegeix una aresta a la cel·la oberta. Les arestes d'una cel·la s'han d'afegir en ordre creixent de símbol.
+        """
+        self.simbols.append(simbol)
+        self.puntuacions.append(puntuacio)
+        self.divisions.append(divisio)
+        self.fills_esq.append(fill_esq)
+        self.fills_dre.append(fill_dre)
+
+    def tancar_cella(self) -> None:
+        """
+        Tanca la cel·la oberta: les arestes que s'afegeixin a partir d'ara són de la cel·la següent.
+        """
+        self.inicis.append(len(self.simbols))
+
+    def cercar(self, inici: int, longitud: int, simbol: int) -> int:
+        """
+        Cerca binària d'un no-terminal en una cel·la.
+        :return: Retorna la posició de l'aresta, o -1 si el no-terminal no és a la cel·la.
+        """
+        primera, final = self.rang(inici, longitud)
+        posicio = bisect_left(self.simbols, simbol, primera, final)
+        if posicio < final and self.simbols[posicio] == simbol:
+            return posicio
+        return -1
+
+    def cella(self, inici: int, longitud: int) -> Dict[int, float]:
+        """
+        Retorna el contingut d'una cel·la com a diccionari identificador -> log-probabilitat.
+        """
+        primera, final = self.rang(inici, longitud)
+        return dict(zip(self.simbols[primera:final], self.puntuacions[primera:final]))
+
+    @property
+    def arestes(self) -> int:
+        return len(self.simbols)
+
+    def mida_bytes(self) -> int:
+        """
+        Bytes que ocupen les dades dels vectors de la taula.
+        """
+        return sum(len(vector) * vector.itemsize for vector in (self.inicis, self.simbols, self.puntuacions,
+                                                                self.divisions, self.fills_esq, self.fills_dre))
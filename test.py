@@ -1,7 +1,30 @@
 from gramatiques import gramatiques_simples, gramatiques_no_FNC, gramatiques_probabilistes
 from main_cky import Gramatica
 from extensio_1 import GramaticaFNC
-from extensio_2 import GramaticaProbabilistica
+from extensio_2 import GramaticaProbabilistica, ConfiguracioPoda, NodeArbre
+from incremental import AnalitzadorIncremental, AnalitzadorIncrementalProbabilistic
+from inside_outside import MotorInsideOutside
+from cache_subcadenes import CacheSubcadenes
+from servidor import ServidorAnalisi, _percentil, carregar_gramatica
+from client_carrega import generar_carrega
+from corpus import processar_corpus
+from lots import analitzar_flux, planificar_fragments
+import cache_gramatiques
+from compilador_fnc import calcular_buides, compilar_fnc
+from serialitzacio import EscriptorArbresBinari, EscriptorParentitzat, arbre_parentitzat, llegir_arbres_binari
+from instrumentacio import EstadistiquesAnalisi, RecollidorEstadistiques
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import struct
+import tempfile
+import math
+import pickle
+import sys
 
 def display_frases(gramatica, frases):
     """
@@ -63,16 +86,927 @@ def test_pcky():
             if isinstance(frase, list):
                 frase_junt = " ".join(frase)
             print(f"Frase: '{frase_junt}'", end=" -> ")
-            resultat, probabilitat = GramProb.algoritme_pcky(frase)
+            analisi = GramProb.algoritme_pcky(frase)
+            resultat, probabilitat = analisi
             if resultat:
                 probabilitat = f"{probabilitat:5f}"
             print(f"{resultat}, prob: {probabilitat}")
 
             if resultat:
                 print()
-                GramProb.display_arbre()
+                GramProb.display_arbre(analisi)
                 print()
 
+def test_cky_compilat():
+    """
+    Funció per comprovar que la variant compilada (màscares de bits) de l'algoritme CKY coincideix amb l'original.
+    """
+
+    for gramatica, paraules in gramatiques_simples + gramatiques_no_FNC:
+        GramFNC = GramaticaFNC(gramatica)
+        for frase in paraules + [""]:
+            esperat = GramFNC.algoritme_cky(frase)
+            obtingut = GramFNC.algoritme_cky_compilat(frase)
+            assert esperat == obtingut, f"Discrepància amb la frase '{frase}'"
+
+def test_index_lexic():
+    """
+    Funció per comprovar l'índex lèxic paraula -> preterminals: paraules desconegudes, paraules compartides per diversos
+    preterminals i, a la gramàtica probabilística, les probabilitats de cada regla terminal.
+    """
+
+    GramG4 = Gramatica(gramatiques_simples[3][0])
+    assert GramG4.index_lexic['shot'] == frozenset({'NP', 'VP', 'NN'})
+    assert GramG4.index_lexic['pajamas'] == frozenset({'NNS'})
+    assert 'NP' not in GramG4.index_lexic
+    assert GramG4.consultar_lexic(['his', 'elephant', 'xyz']) == [frozenset({'DT'}), frozenset({'NP', 'NN'}), frozenset()]
+    assert GramG4.consultar_lexic([]) == []
+    assert GramG4.algoritme_cky(['groucho', 'xyz']) is False
+
+    GramG1 = Gramatica(gramatiques_simples[0][0])
+    assert GramG1.consultar_lexic('abc') == [frozenset({'S', 'B', 'X'}), frozenset({'S', 'B'}), frozenset()]
+
+    # A produeix 'a' dues vegades: l'índex es queda amb la probabilitat més alta
+    gramatica = {'S': [(['A', 'B'], 0.6), (['a'], 0.4)], 'A': [(['a'], 0.3), ('a', 0.5), (['b'], 0.2)], 'B': [(['b'], 1.0)]}
+    GramProb = GramaticaProbabilistica(gramatica)
+    assert GramProb.index_lexic == {'a': {'S': 0.4, 'A': 0.5}, 'b': {'A': 0.2, 'B': 1.0}}
+    assert GramProb.consultar_lexic('abc') == [{'S': 0.4, 'A': 0.5}, {'A': 0.2, 'B': 1.0}, {}]
+    derivable, probabilitat = GramProb.algoritme_pcky('ab')
+    assert derivable and math.isclose(probabilitat, 0.6 * 0.5 * 1.0)
+    assert tuple(GramProb.algoritme_pcky('ac')) == (False, 0.0)
+
+def arbres_equivalents(arbre_a, arbre_b) -> bool:
+    """
+    Compara dos arbres gramaticals admetent petites diferències d'arrodoniment en les probabilitats.
+    """
+    if arbre_a is None or arbre_b is None:
+        return arbre_a is arbre_b
+    if arbre_a['no_terminal'] != arbre_b['no_terminal'] or arbre_a['simbol'] != arbre_b['simbol']:
+        return False
+    if not math.isclose(arbre_a['probabilitat'], arbre_b['probabilitat'], rel_tol=1e-9):
+        return False
+    if arbre_a['fill'] is None or arbre_b['fill'] is None:
+        return arbre_a['fill'] is arbre_b['fill']
+    return all(arbres_equivalents(a, b) for a, b in zip(arbre_a['fill'], arbre_b['fill']))
+
+def test_pcky_vectorial():
+    """
+    Funció per comprovar que la variant vectorial de l'algoritme PCKY dona el mateix resultat i el mateix arbre que l'original
+    a totes les gramàtiques de prova, tant provant les divisions una a una com tractant-les de cop (llindar 0),
+    i també amb regles de probabilitat 0. Les probabilitats es calculen en logaritmes i poden diferir en l'arrodoniment.
+    Les gramàtiques de prova no tenen derivacions empatades; amb empats, cada algoritme pot triar un arbre diferent.
+    """
+
+    amb_zeros = ({'S': [(['A', 'B'], 0.0), (['A', 'A'], 1.0)], 'A': [(['A', 'B'], 0.0), (['a'], 1.0)], 'B': [(['b'], 1.0)]},
+                 ['ab', 'aab', 'abb', 'aa', 'aaa', 'ba'])
+    for gramatica, paraules in gramatiques_probabilistes + [amb_zeros]:
+        GramProb = GramaticaProbabilistica(gramatica)
+        for llindar in (0, GramProb.llindar_divisions_vectorial):
+            GramProb.llindar_divisions_vectorial = llindar
+            for frase in paraules:
+                analisi = GramProb.algoritme_pcky(frase)
+                analisi_vec = GramProb.algoritme_pcky_vectorial(frase)
+                assert analisi.derivable == analisi_vec.derivable, f"Discrepància amb la frase '{frase}'"
+                assert math.isclose(analisi.probabilitat, analisi_vec.probabilitat, rel_tol=1e-9), f"Discrepància amb la frase '{frase}'"
+                assert arbre_parentitzat(analisi.arbre) == arbre_parentitzat(analisi_vec.arbre), f"Arbres diferents per la frase '{frase}'"
+                assert arbres_equivalents(analisi.arbre, analisi_vec.arbre), f"Arbres diferents per la frase '{frase}'"
+    assert GramaticaProbabilistica(amb_zeros[0]).algoritme_pcky_vectorial('aab') == (True, 0.0)
+
+    # S -> A A i S -> A B empaten: algoritme_pcky prova les parelles en l'ordre de les cel·les i es queda (A, A), i la variant
+    # vectorial les prova en l'ordre de les regles i es queda (A, B). Tots dos arbres són derivacions amb la millor probabilitat.
+    empat = {'S': [(['A', 'B'], 0.5), (['A', 'A'], 0.5)], 'A': [(['a'], 0.5)], 'B': [(['a'], 0.5)]}
+    GramEmpat = GramaticaProbabilistica(empat)
+    analisi = GramEmpat.algoritme_pcky('aa')
+    assert arbre_parentitzat(analisi.arbre) == '(S (A a) (A a))'
+    for llindar in (0, GramEmpat.llindar_divisions_vectorial):
+        GramEmpat.llindar_divisions_vectorial = llindar
+        analisi_vec = GramEmpat.algoritme_pcky_vectorial('aa')
+        assert analisi_vec.derivable and math.isclose(analisi.probabilitat, analisi_vec.probabilitat, rel_tol=1e-9)
+        assert arbre_parentitzat(analisi_vec.arbre) == '(S (A a) (B a))'
+
+def test_pcky_poda():
+    """
+    Funció per comprovar l'efecte de la poda de la taula PCKY sobre la frase ambigua de la gramàtica G11: una poda suau
+    conserva la millor derivació, una poda estricta pot perdre-la però mai no en troba una de més probable, i l'informe
+    només compta descarts dels criteris actius.
+    """
+
+    gramatica, paraules = gramatiques_probabilistes[2]
+    frase = paraules[-1]
+    referencia = GramaticaProbabilistica(gramatica).algoritme_pcky(frase)
+    assert referencia.derivable and referencia.informe_poda is None
+    for poda, conserva in [(ConfiguracioPoda(llindar_relatiu=0.01), True), (ConfiguracioPoda(amplada_feix=2), True),
+                           (ConfiguracioPoda(max_arestes=20), True), (ConfiguracioPoda(amplada_feix=1), False),
+                           (ConfiguracioPoda(max_arestes=5), False)]:
+        analisi = GramaticaProbabilistica(gramatica, poda=poda).algoritme_pcky(frase)
+        assert analisi.probabilitat <= referencia.probabilitat
+        if conserva:
+            assert analisi == referencia and arbres_equivalents(analisi.arbre, referencia.arbre)
+        informe = analisi.informe_poda
+        actius = {'feix': poda.amplada_feix, 'llindar': poda.llindar_relatiu, 'max_arestes': poda.max_arestes}
+        assert all(informe[criteri] == 0 for criteri, valor in actius.items() if valor is None)
+        assert conserva or sum(informe[criteri] for criteri in actius) > 0
+        assert poda.max_arestes is None or informe['conservades'] <= poda.max_arestes
+
+def test_parse_many():
+    """
+    Funció per comprovar l'anàlisi per lots en diversos processos (parse_many): en mode ordenat els resultats surten en
+    l'ordre de les frases, i en mode desordenat com a parells (índex, resultat) que cobreixen totes les frases,
+    amb els mateixos resultats (i arbres) que analitzar les frases una a una.
+    """
+
+    for gramatica, paraules in gramatiques_simples + gramatiques_no_FNC:
+        GramFNC = GramaticaFNC(gramatica)
+        frases = paraules * 3
+        esperats = [GramFNC.algoritme_cky(frase) for frase in frases]
+        assert list(GramFNC.parse_many(frases, workers=2, chunksize=1)) == esperats
+        parelles = list(GramFNC.parse_many(frases, workers=2, chunksize=2, ordenat=False))
+        assert sorted(index for index, _ in parelles) == list(range(len(frases)))
+        assert all(resultat == esperats[index] for index, resultat in parelles)
+        assert list(GramFNC.parse_many(frases, workers=1, metode='algoritme_cky_compilat')) == esperats
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        frases = paraules * 3
+        esperats = [GramProb.algoritme_pcky(frase) for frase in frases]
+        resultats = list(GramProb.parse_many(frases, workers=2, chunksize=1))
+        assert resultats == esperats
+        assert [resultat.arbre for resultat in resultats] == [esperat.arbre for esperat in esperats]
+        parelles = list(GramProb.parse_many(frases, workers=2, chunksize=2, ordenat=False))
+        assert sorted(index for index, _ in parelles) == list(range(len(frases)))
+        for index, resultat in parelles:
+            assert resultat == esperats[index] and resultat.arbre == esperats[index].arbre, f"Discrepància amb la frase '{frases[index]}'"
+
+    # Els fragments cobreixen totes les frases un sol cop, amb les més llargues al davant
+    frases = ["a" * longitud for longitud in (3, 9, 1, 5, 7, 2)]
+    fragments = planificar_fragments(frases, 2)
+    indexos = [index for fragment in fragments for index, _ in fragment]
+    assert sorted(indexos) == list(range(len(frases)))
+    assert [len(frases[index]) for index in indexos] == sorted((len(frase) for frase in frases), reverse=True)
+    assert all(len(fragment) <= 2 for fragment in fragments)
+
+    # Els arguments no vàlids es rebutgen en la crida, abans de començar a iterar, i workers=0 no vol dir "totes les CPU"
+    GramFNC = GramaticaFNC(gramatiques_simples[0][0])
+    for arguments in ({'workers': 0}, {'workers': -1}, {'chunksize': 0}, {'workers': 2, 'chunksize': -3}):
+        try:
+            GramFNC.parse_many(["ab"], **arguments)
+            assert False, f"S'havien de rebutjar els arguments {arguments}"
+        except ValueError:
+            pass
+    for arguments in ({'workers': 0}, {'chunksize': 0}, {'max_pendents': 0}):
+        try:
+            analitzar_flux(GramFNC, 'algoritme_cky', ["ab"], **arguments)
+            assert False, f"S'havien de rebutjar els arguments {arguments}"
+        except ValueError:
+            pass
+    try:
+        ServidorAnalisi(GramFNC, workers=0)
+        assert False, "S'havia de rebutjar workers=0"
+    except ValueError:
+        pass
+    assert list(GramFNC.parse_many(["ab", "ba"], workers=None, chunksize=1)) == [GramFNC.algoritme_cky("ab"), GramFNC.algoritme_cky("ba")]
+
+def test_cache_gramatiques():
+    """
+    Funció per comprovar les gramàtiques compilades: desar-les i tornar-les a carregar (desar_compilada i from_compiled,
+    o la memòria cau de directori_cache) dona la mateixa gramàtica en FNC i els mateixos resultats, la segona construcció
+    amb la mateixa gramàtica la carrega sense convertir-la, qualsevol canvi de la gramàtica o de la versió canvia la clau,
+    i els fitxers d'una versió anterior o malmesos es tornen a convertir.
+    """
+
+    def sense_conversio(self):
+        raise AssertionError("La gramàtica s'havia de carregar de la memòria cau")
+
+    with tempfile.TemporaryDirectory() as directori:
+        casos = [(GramaticaFNC, cache_gramatiques.TIPUS_FNC, gramatica, paraules)
+                 for gramatica, paraules in gramatiques_simples + gramatiques_no_FNC]
+        casos += [(GramaticaProbabilistica, cache_gramatiques.TIPUS_PROBABILISTICA, gramatica, paraules)
+                  for gramatica, paraules in gramatiques_probabilistes]
+        for i, (classe, tipus, gramatica, paraules) in enumerate(casos):
+            Gram = classe(gramatica, directori_cache=directori)
+            ruta = cache_gramatiques.ruta_cache(directori, gramatica, 'S', tipus)
+            assert os.path.exists(ruta)
+            assert cache_gramatiques.carregar_gramatica(ruta, tipus) == (Gram.gramatica, 'S')
+
+            conversio = classe._forma_normal_chomsky
+            classe._forma_normal_chomsky = sense_conversio
+            try:
+                GramCache = classe(gramatica, directori_cache=directori)
+            finally:
+                classe._forma_normal_chomsky = conversio
+            ruta_compilada = os.path.join(directori, f"gramatica{i}{cache_gramatiques.EXTENSIO}")
+            Gram.desar_compilada(ruta_compilada)
+            GramCompilada = classe.from_compiled(ruta_compilada)
+
+            for Carregada in (GramCache, GramCompilada):
+                assert Carregada.gramatica == Gram.gramatica and Carregada.simbol_arrel == Gram.simbol_arrel
+                for frase in paraules:
+                    if classe is GramaticaFNC:
+                        assert Carregada.algoritme_cky(frase) == Gram.algoritme_cky(frase), f"Discrepància amb la frase '{frase}'"
+                    else:
+                        analisi, esperat = Carregada.algoritme_pcky(frase), Gram.algoritme_pcky(frase)
+                        assert analisi == esperat and analisi.arbre == esperat.arbre, f"Discrepància amb la frase '{frase}'"
+
+            # Un fitxer d'un altre tipus de gramàtica es rebutja
+            altre_tipus = cache_gramatiques.TIPUS_FNC + cache_gramatiques.TIPUS_PROBABILISTICA - tipus
+            try:
+                cache_gramatiques.carregar_gramatica(ruta, altre_tipus)
+                assert False, "S'havia de rebutjar el fitxer"
+            except ValueError:
+                pass
+
+        # Un fitxer d'una versió anterior (o malmès) a la ruta de la clau es torna a convertir i a escriure
+        gramatica, paraules = gramatiques_no_FNC[0]
+        ruta = cache_gramatiques.ruta_cache(directori, gramatica, 'S', cache_gramatiques.TIPUS_FNC)
+        esperada = GramaticaFNC(gramatica).gramatica
+        cache_gramatiques.desar_gramatica(ruta, {'S': [['x']]}, 'S', cache_gramatiques.TIPUS_FNC)
+        with open(ruta, 'r+b') as fitxer:
+            fitxer.seek(4)
+            fitxer.write(struct.pack('<I', cache_gramatiques.VERSIO - 1))
+        for contingut in (None, b'CKYG'):
+            if contingut is not None:
+                with open(ruta, 'wb') as fitxer:
+                    fitxer.write(contingut)
+            GramCache = GramaticaFNC(gramatica, directori_cache=directori)
+            assert GramCache.gramatica == esperada
+            assert cache_gramatiques.carregar_gramatica(ruta, cache_gramatiques.TIPUS_FNC) == (esperada, 'S')
+
+        # Un fitxer truncat per qualsevol punt, amb noms que no són UTF-8 o amb ids fora de rang també es torna a convertir
+        for classe, tipus, (gramatica, _) in ((GramaticaFNC, cache_gramatiques.TIPUS_FNC, gramatiques_no_FNC[0]),
+                                             (GramaticaProbabilistica, cache_gramatiques.TIPUS_PROBABILISTICA, gramatiques_probabilistes[0])):
+            ruta = cache_gramatiques.ruta_cache(directori, gramatica, 'S', tipus)
+            esperada = classe(gramatica, directori_cache=directori).gramatica
+            with open(ruta, 'rb') as fitxer:
+                valid = fitxer.read()
+            _, _, _, n_simbols, _, _, _ = cache_gramatiques._CAPCALERA.unpack_from(valid)
+            posicio_noms = cache_gramatiques._CAPCALERA.size + (-cache_gramatiques._CAPCALERA.size % 8) + 4 * (n_simbols + 1)
+            malmesos = [valid[:mida] for mida in range(len(valid))]
+            malmesos.append(valid[:posicio_noms] + b'\xff' + valid[posicio_noms + 1:])
+            malmesos.append(valid[:24] + struct.pack('<i', n_simbols) + valid[28:])
+            malmesos.append(valid + b'\0' * 8)
+            for contingut in malmesos:
+                with open(ruta, 'wb') as fitxer:
+                    fitxer.write(contingut)
+                assert cache_gramatiques.carregar_de_cache(ruta, tipus) is None, f"S'havia de rebutjar el fitxer de {len(contingut)} bytes"
+                assert classe(gramatica, directori_cache=directori).gramatica == esperada
+                with open(ruta, 'rb') as fitxer:
+                    assert fitxer.read() == valid
+
+    # La clau depèn del contingut de la gramàtica, del símbol arrel, del tipus i de la versió
+    gramatica = gramatiques_simples[0][0]
+    modificada = dict(gramatica, S=gramatica['S'] + [['a']])
+    claus = {cache_gramatiques.hash_gramatica(gramatica, 'S', cache_gramatiques.TIPUS_FNC),
+             cache_gramatiques.hash_gramatica(modificada, 'S', cache_gramatiques.TIPUS_FNC),
+             cache_gramatiques.hash_gramatica(gramatica, 'A', cache_gramatiques.TIPUS_FNC),
+             cache_gramatiques.hash_gramatica(gramatica, 'S', cache_gramatiques.TIPUS_PROBABILISTICA)}
+    versio = cache_gramatiques.VERSIO
+    cache_gramatiques.VERSIO = versio - 1
+    try:
+        claus.add(cache_gramatiques.hash_gramatica(gramatica, 'S', cache_gramatiques.TIPUS_FNC))
+    finally:
+        cache_gramatiques.VERSIO = versio
+    assert len(claus) == 5
+
+def test_compilador_fnc():
+    """
+    Funció per comprovar els passos del compilador a FNC: els buits encadenats de la llista de treball, els cicles de
+    regles unitàries, els noms nous que coincideixen amb no-terminals de l'usuari i els prefixos compartits de les regles llargues.
+    """
+
+    def es_fnc(gramatica) -> bool:
+        return all((len(produccio) == 1 and produccio[0].islower()) or (len(produccio) == 2 and all(simbol in gramatica for simbol in produccio))
+                   for produccions in gramatica.values() for produccio in produccions)
+
+    # Buits encadenats: C -> ε fa buit B -> C, que fa buit A -> B C, declarats en l'ordre invers
+    buits = {'S': [['A', 'D', 'A']], 'A': [['B', 'C']], 'B': [['C']], 'C': [[''], ['c']], 'D': [['d']]}
+    assert calcular_buides({'E': {('D', 'A'): 1.0}, 'A': {('B', 'C'): 1.0}, 'B': {('C',): 1.0}, 'C': {('',): 1.0}, 'D': {('d',): 1.0}}) == {'A', 'B', 'C'}
+    fnc = compilar_fnc(buits)
+    assert es_fnc(fnc)
+    assert fnc['A'] == [['B', 'C'], ['c']] and fnc['B'] == [['c']] and fnc['C'] == [['c']]
+    GramBuits = GramaticaFNC(buits)
+    for frase, esperat in (('d', True), ('cd', True), ('dcc', True), ('ccdcc', True), ('cccd', False), ('', False), ('dd', False)):
+        assert GramBuits.algoritme_cky(frase) is esperat, f"Discrepància amb la frase '{frase}'"
+
+    # Cicle de regles unitàries A -> B, B -> A: cada no-terminal rep les produccions no unitàries de tot el cicle
+    cicle = {'S': [['A']], 'A': [['B'], ['a']], 'B': [['A'], ['b'], ['B', 'B']]}
+    fnc = compilar_fnc(cicle)
+    assert es_fnc(fnc)
+    assert {no_terminal: sorted(map(tuple, produccions)) for no_terminal, produccions in fnc.items()} == \
+           {no_terminal: [('B', 'B'), ('a',), ('b',)] for no_terminal in ('S', 'A', 'B')}
+    GramCicle = GramaticaFNC(cicle)
+    assert all(GramCicle.algoritme_cky(frase) for frase in ('a', 'b', 'ab', 'bba'))
+    assert not GramCicle.algoritme_cky('')
+    probabilistica = {'S': [(['A'], 1.0)], 'A': [(['B'], 0.4), (['a'], 0.6)], 'B': [(['A'], 0.5), (['b'], 0.5)]}
+    fnc = compilar_fnc(probabilistica, probabilistica=True)
+    esperat = {'S': {('a',): 0.6, ('b',): 0.2}, 'A': {('a',): 0.6, ('b',): 0.2}, 'B': {('b',): 0.5, ('a',): 0.3}}
+    for no_terminal, produccions in esperat.items():
+        obtingut = {tuple(produccio): probabilitat for produccio, probabilitat in fnc[no_terminal]}
+        assert obtingut.keys() == produccions.keys()
+        assert all(math.isclose(obtingut[produccio], probabilitat) for produccio, probabilitat in produccions.items())
+
+    # Els no-terminals nous no poden trepitjar els de l'usuari que ja es diuen T1 i X1
+    noms = {'S': [['a', 'X1', 'T1']], 'X1': [['x']], 'T1': [['t']]}
+    assert compilar_fnc(noms) == {'S': [['X2', 'T1']], 'X1': [['x']], 'T1': [['t']], 'T2': [['a']], 'X2': [['T2', 'X1']]}
+    GramNoms = GramaticaFNC(noms)
+    assert GramNoms.algoritme_cky('axt')
+    assert not any(GramNoms.algoritme_cky(frase) for frase in ('at', 'ax', 'xt', 'x', 'a'))
+
+    # Les regles llargues amb el mateix prefix comparteixen els no-terminals nous
+    prefixos = {'S': [['A', 'B', 'C'], ['A', 'B', 'D'], ['A', 'B', 'C', 'D']], 'A': [['a']], 'B': [['b']], 'C': [['c']], 'D': [['d']]}
+    fnc = compilar_fnc(prefixos)
+    assert es_fnc(fnc)
+    assert fnc['S'] == [['X1', 'C'], ['X1', 'D'], ['X2', 'D']]
+    assert fnc['X1'] == [['A', 'B']] and fnc['X2'] == [['X1', 'C']]
+    assert len(fnc) == len(prefixos) + 2
+    GramPrefixos = GramaticaFNC(prefixos)
+    for frase, esperat in (('abc', True), ('abd', True), ('abcd', True), ('abdc', False), ('ab', False), ('abcc', False)):
+        assert GramPrefixos.algoritme_cky(frase) is esperat, f"Discrepància amb la frase '{frase}'"
+
+def test_incremental():
+    """
+    Funció per comprovar que els analitzadors incrementals donen, després de cada paraula,
+    el mateix resultat que analitzar el prefix sencer amb CKY i PCKY.
+    """
+
+    for gramatica, paraules in gramatiques_simples + gramatiques_no_FNC:
+        GramFNC = GramaticaFNC(gramatica)
+        for frase in paraules:
+            analitzador = AnalitzadorIncremental(GramFNC)
+            for i, paraula in enumerate(frase):
+                assert analitzador.push(paraula) == GramFNC.algoritme_cky(frase[:i + 1]), f"Discrepància amb el prefix '{frase[:i + 1]}'"
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        for frase in paraules:
+            analitzador = AnalitzadorIncrementalProbabilistic(GramProb)
+            for i, paraula in enumerate(frase):
+                probabilitat = analitzador.push(paraula)
+                assert (analitzador.es_analitzable(), probabilitat) == GramProb.algoritme_pcky(frase[:i + 1]), f"Discrepància amb el prefix '{frase[:i + 1]}'"
+
+def test_inside_outside():
+    """
+    Funció per comprovar l'algoritme inside-outside: la probabilitat total no pot ser menor que la de la millor derivació,
+    la subcadena sencera té probabilitat a posteriori 1 i un pas de reestimació no fa baixar la versemblança del corpus.
+    """
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        motor = MotorInsideOutside(GramProb)
+        for frase in paraules:
+            resultat, probabilitat = GramProb.algoritme_pcky(frase)
+            log_z, subcadenes, regles = motor.marginals(frase)
+            assert resultat == (log_z > float('-inf')), f"Discrepància amb la frase '{frase}'"
+            if resultat:
+                assert math.exp(log_z) >= probabilitat * (1 - 1e-9), f"Probabilitat total massa petita per la frase '{frase}'"
+                assert math.isclose(subcadenes[(GramProb.simbol_arrel, 0, len(frase))], 1.0), f"Marginal incorrecta per la frase '{frase}'"
+                lexiques = sum(compte for (_, dreta), compte in regles.items() if len(dreta) == 1)
+                assert math.isclose(lexiques, len(frase)), f"Comptes lèxics incorrectes per la frase '{frase}'"
+
+        nova_gramatica, log_versemblanca = motor.reestimar(paraules)
+        _, nova_log_versemblanca, _ = MotorInsideOutside(GramaticaProbabilistica(nova_gramatica, GramProb.simbol_arrel)).comptes_esperats(paraules)
+        assert nova_log_versemblanca >= log_versemblanca - 1e-9, "La reestimació ha fet baixar la versemblança"
+
+def test_k_millors():
+    """
+    Funció per comprovar l'extracció de les k millors derivacions: la primera ha de ser la d'algoritme_pcky
+    i la resta han d'anar de més a menys probable. La frase ambigua de la gramàtica G11 té exactament dues lectures.
+    """
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        for frase in paraules:
+            analisi = GramProb.algoritme_pcky(frase)
+            derivacions = GramProb.k_millors(frase, 50)
+            assert analisi.derivable == bool(derivacions), f"Discrepància amb la frase '{frase}'"
+            if analisi.derivable:
+                assert derivacions[0][0] == analisi.probabilitat, f"Discrepància amb la frase '{frase}'"
+                assert arbres_equivalents(derivacions[0][1], analisi.arbre), f"Arbres diferents per la frase '{frase}'"
+                assert all(a[0] >= b[0] for a, b in zip(derivacions, derivacions[1:])), f"Derivacions desordenades per la frase '{frase}'"
+
+    gramatica, paraules = gramatiques_probabilistes[2]
+    frase = paraules[-1]
+    derivacions = GramaticaProbabilistica(gramatica).k_millors(frase, 5)
+    assert len(derivacions) == 2 and derivacions[0][0] > derivacions[1][0]
+    assert arbre_parentitzat(derivacions[0][1]) != arbre_parentitzat(derivacions[1][1])
+
+    # Amb S -> A S | B S | a les derivacions de 'a' * 200 tenen 200 nivells, més que el límit de recursió que fixem,
+    # i la segona i la tercera canvien una sola A per B en posicions diferents
+    GramProb = GramaticaProbabilistica({'S': [(['A', 'S'], 0.6), (['B', 'S'], 0.3), (['a'], 0.1)], 'A': [(['a'], 1.0)], 'B': [(['a'], 1.0)]})
+    frase = 'a' * 200
+    analisi = GramProb.algoritme_pcky(frase)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(120)
+    try:
+        derivacions = GramProb.k_millors(frase, 3)
+        parentitzats = [arbre_parentitzat(arbre) for _, arbre in derivacions]
+    finally:
+        sys.setrecursionlimit(limit)
+    assert len(derivacions) == 3 and all(isinstance(arbre, NodeArbre) for _, arbre in derivacions)
+    assert derivacions[0] == (analisi.probabilitat, analisi.arbre)
+    assert math.isclose(derivacions[1][0], analisi.probabilitat / 2) and math.isclose(derivacions[2][0], analisi.probabilitat / 2)
+    assert [parentitzat.count('(B a)') for parentitzat in parentitzats] == [0, 1, 1] and parentitzats[1] != parentitzats[2]
+
+def test_bosc():
+    """
+    Funció per comprovar el bosc compartit de derivacions: ha d'existir quan la frase és derivable,
+    el recompte d'arbres ha de coincidir amb els arbres que s'hi poden recórrer i els arbres mostrejats hi han de ser.
+    """
+
+    for gramatica, paraules in gramatiques_simples + gramatiques_no_FNC:
+        GramFNC = GramaticaFNC(gramatica)
+        for frase in paraules:
+            bosc = GramFNC.bosc_derivacions(frase)
+            assert (bosc is not None) == (bool(frase) and GramFNC.algoritme_cky(frase)), f"Discrepància amb la frase '{frase}'"
+            if bosc is not None:
+                arbres = list(bosc)
+                assert len(arbres) == bosc.nombre_arbres(), f"Recompte incorrecte per la frase '{frase}'"
+                assert bosc.mostrejar() in arbres, f"Arbre mostrejat incorrecte per la frase '{frase}'"
+
+    # Amb S -> S S | a, cada subcadena és un node, cada divisió una hiperaresta i els arbres es compten sense enumerar-los
+    # (nombre de Catalan)
+    bosc = GramaticaFNC({'S': [['S', 'S'], ['a']]}).bosc_derivacions('a' * 20)
+    assert len(bosc) == 20 * 21 // 2 and bosc.nombre_arestes() == math.comb(21, 3)
+    assert bosc.nombre_arbres() == math.comb(38, 19) // 20
+
+def test_concurrencia():
+    """
+    Funció per comprovar que una mateixa gramàtica probabilística es pot fer servir des de diversos fils alhora:
+    cada anàlisi retorna el seu propi resultat, igual que si s'hagués fet sola.
+    """
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        esperats = [GramProb.algoritme_pcky(frase) for frase in paraules]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            resultats = list(executor.map(GramProb.algoritme_pcky, paraules * 20))
+        for i, analisi in enumerate(resultats):
+            esperat = esperats[i % len(paraules)]
+            assert analisi == esperat, f"Discrepància amb la frase '{paraules[i % len(paraules)]}'"
+            assert arbres_equivalents(analisi.arbre, esperat.arbre), f"Arbres diferents per la frase '{paraules[i % len(paraules)]}'"
+
+def test_resultat_pcky():
+    """
+    Funció per comprovar que el resultat d'algoritme_pcky es comporta com el parell (derivable, probabilitat) d'abans:
+    es desempaqueta, s'indexa, es compara amb tuples i es serialitza en JSON, també per la cadena buida.
+    """
+
+    GramProb = GramaticaProbabilistica({'S': [(['A', 'B'], 1.0)], 'A': [(['a'], 0.5), (['b'], 0.5)], 'B': [(['b'], 1.0)]})
+    resultat = GramProb.algoritme_pcky('ab')
+    derivable, probabilitat = resultat
+    assert (derivable, probabilitat) == (True, 0.5) and resultat == (True, 0.5)
+    assert resultat[0] is resultat.derivable and resultat[1] == resultat.probabilitat and len(resultat) == 2
+    assert json.loads(json.dumps(resultat)) == [True, 0.5]
+    diccionari = json.loads(json.dumps(resultat.com_diccionari()))
+    assert diccionari == {'derivable': True, 'probabilitat': 0.5, 'arbre': json.loads(json.dumps(resultat.arbre.com_diccionari()))}
+    assert 'arbre' not in resultat.com_diccionari(amb_arbre=False)
+
+    # La cadena buida també retorna el parell, com la resta de frases
+    for frase in ('', 'ba'):
+        resultat = GramProb.algoritme_pcky(frase)
+        assert resultat == (False, 0.0) and resultat.arbre is None
+        assert json.loads(json.dumps(resultat.com_diccionari())) == {'derivable': False, 'probabilitat': 0.0, 'arbre': None}
+
+def test_cache_subcadenes():
+    """
+    Funció per comprovar que la memòria cau de subcadenes no canvia els resultats de CKY i PCKY,
+    fins i tot amb una memòria cau petita que ha d'expulsar cel·les o amb subcadenes repetides en posicions diferents.
+    """
+
+    for gramatica, paraules in gramatiques_simples + gramatiques_no_FNC:
+        GramFNC = GramaticaFNC(gramatica)
+        GramCache = GramaticaFNC(gramatica, cache_subcadenes=CacheSubcadenes(max_entrades=8))
+        for frase in paraules * 3:
+            assert GramFNC.algoritme_cky_compilat(frase) == GramCache.algoritme_cky_compilat(frase), f"Discrepància amb la frase '{frase}'"
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        cache = CacheSubcadenes(max_bytes=4096)
+        GramCache = GramaticaProbabilistica(gramatica, cache_subcadenes=cache)
+        for frase in paraules * 3:
+            analisi = GramProb.algoritme_pcky(frase)
+            analisi_cache = GramCache.algoritme_pcky(frase)
+            assert analisi == analisi_cache, f"Discrepància amb la frase '{frase}'"
+            assert arbres_equivalents(analisi.arbre, analisi_cache.arbre), f"Arbres diferents per la frase '{frase}'"
+        estadistiques = cache.estadistiques()
+        assert estadistiques['encerts'] > 0 and estadistiques['bytes'] <= 4096 and estadistiques['entrades'] == len(cache)
+        assert estadistiques['taxa_encerts'] == estadistiques['encerts'] / (estadistiques['encerts'] + estadistiques['errors'])
+
+    # Cada frase de prova i totes les seves subcadenes, barrejades: una mateixa subcadena apareix com a frase sencera,
+    # a l'inici, al mig i al final, i la cel·la desada en una posició no es pot reaprofitar en una altra si hi canvia
+    aleatori = random.Random(0)
+    # D -> b només es pot combinar lluny del final de la frase
+    posicional = {'S': [(['A', 'B'], 0.5), (['A', 'R'], 0.5)], 'R': [(['M', 'C'], 1.0)], 'M': [(['A', 'D'], 1.0)],
+                  'A': [(['a'], 1.0)], 'B': [(['b'], 0.5)], 'D': [(['b'], 0.5)], 'C': [(['c'], 1.0)]}
+    casos = [(GramaticaFNC, gramatica, paraules) for gramatica, paraules in gramatiques_simples + gramatiques_no_FNC]
+    casos += [(GramaticaProbabilistica, gramatica, paraules) for gramatica, paraules in gramatiques_probabilistes]
+    casos.append((GramaticaFNC, {no_terminal: [produccio for produccio, _ in produccions] for no_terminal, produccions in posicional.items()}, ['aabc']))
+    casos.append((GramaticaProbabilistica, posicional, ['aabc']))
+    for classe, gramatica, paraules in casos:
+        frases = [frase[inici:fi] for frase in paraules for inici in range(len(frase)) for fi in range(inici + 1, len(frase) + 1)]
+        aleatori.shuffle(frases)
+        Gram = classe(gramatica)
+        GramCache = classe(gramatica, cache_subcadenes=CacheSubcadenes())
+        for frase in frases:
+            if classe is GramaticaFNC:
+                assert Gram.algoritme_cky_compilat(frase) == GramCache.algoritme_cky_compilat(frase), f"Discrepància amb la frase '{frase}'"
+            else:
+                analisi, analisi_cache = Gram.algoritme_pcky(frase), GramCache.algoritme_pcky(frase)
+                assert analisi == analisi_cache, f"Discrepància amb la frase '{frase}'"
+                assert arbres_equivalents(analisi.arbre, analisi_cache.arbre), f"Arbres diferents per la frase '{frase}'"
+
+def test_servidor():
+    """
+    Funció per comprovar que el servidor d'anàlisi respon el mateix que algoritme_pcky quan rep
+    moltes peticions simultànies, i que rebutja les frases massa llargues.
+    """
+
+    async def comprovar(gramatica, paraules):
+        # Les frases de caràcters (frases_ab) arriben com a text i s'han de partir en caràcters
+        servidor = ServidorAnalisi(GramaticaProbabilistica(gramatica), workers=1, longitud_maxima=20,
+                                   caracters=isinstance(paraules[0], str))
+        await servidor.iniciar()
+        try:
+            respostes, estadistiques = await generar_carrega('127.0.0.1', servidor.port, paraules, 4 * len(paraules), concurrencia=8)
+            rebutjada = await servidor.analitzar(['a'] * 21)
+        finally:
+            await servidor.aturar()
+        # En acabar aturar, l'agrupador de lots ja no és pendent
+        assert servidor.agrupador.cancelled()
+        return respostes, estadistiques, rebutjada
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        respostes, estadistiques, rebutjada = asyncio.run(comprovar(gramatica, paraules))
+        for index, resposta in enumerate(respostes):
+            frase = paraules[index % len(paraules)]
+            analisi = GramProb.algoritme_pcky(frase)
+            assert resposta['derivable'] == analisi.derivable, f"Discrepància amb la frase '{frase}'"
+            if analisi.derivable:
+                assert math.isclose(resposta['probabilitat'], analisi.probabilitat), f"Probabilitat diferent per la frase '{frase}'"
+        assert 'error' in rebutjada
+        assert estadistiques['peticions'] == len(respostes)
+        assert estadistiques['lots'] > 0 and math.isclose(estadistiques['mida_mitjana_lot'] * estadistiques['lots'], estadistiques['peticions'])
+
+    # Percentils pel mètode del rang més proper: el valor de la posició ceil(p/100 * n)
+    valors = [1.0, 2.0, 3.0, 4.0]
+    assert [_percentil(valors, percentil) for percentil in (0, 25, 50, 75, 90, 100)] == [1.0, 1.0, 2.0, 3.0, 4.0, 4.0]
+    assert _percentil([5.0], 99) == 5.0 and _percentil([], 50) == 0.0
+    # Les gramàtiques que ja són en FNC es poden servir sense convertir-les
+    gramatica = carregar_gramatica(None, 'cky', exemple='G1')
+    assert isinstance(gramatica, Gramatica) and ServidorAnalisi(gramatica).metode == 'algoritme_cky_compilat'
+
+def test_corpus():
+    """
+    Funció per comprovar que l'anàlisi de corpus en flux escriu els mateixos resultats que algoritme_pcky,
+    tant en un sol procés com en diversos processos amb la sortida desordenada.
+    """
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        caracters = isinstance(paraules[0], str)
+        text = '\n'.join((frase if caracters else ' '.join(frase)) for frase in paraules * 5) + '\n'
+        GramProb = GramaticaProbabilistica(gramatica)
+        longitud_maxima = max(len(frase) for frase in paraules) - 1
+
+        sortides = []
+        for workers, ordenat in ((1, True), (2, False)):
+            sortida = io.StringIO()
+            resum = processar_corpus(GramProb, 'algoritme_pcky', io.StringIO(text), sortida, workers=workers, chunksize=3,
+                                     ordenat=ordenat, longitud_maxima=longitud_maxima, caracters=caracters)
+            linies = sorted((json.loads(linia) for linia in sortida.getvalue().splitlines()), key=lambda linia: linia['index'])
+            assert resum['frases'] == len(linies) == 5 * len(paraules)
+            sortides.append([{clau: valor for clau, valor in linia.items() if clau != 'temps_ms'} for linia in linies])
+
+        assert sortides[0] == sortides[1], "Els resultats depenen del nombre de processos"
+        for linia in sortides[0]:
+            frase = paraules[linia['index'] % len(paraules)]
+            if len(frase) > longitud_maxima:
+                assert linia.get('omesa'), f"La frase '{frase}' s'havia d'ometre"
+                continue
+            analisi = GramProb.algoritme_pcky(frase)
+            assert linia['derivable'] == analisi.derivable and linia['probabilitat'] == analisi.probabilitat, f"Discrepància amb la frase '{frase}'"
+            assert linia['arbre'] == arbre_parentitzat(analisi.arbre), f"Arbre diferent per la frase '{frase}'"
+
+def test_instrumentacio():
+    """
+    Funció per comprovar que la instrumentació no canvia els resultats de CKY i PCKY, que els comptadors són coherents
+    i que el recollidor acumula i desa les estadístiques d'un lot.
+    """
+
+    for gramatica, paraules in gramatiques_simples:
+        Gram = Gramatica(gramatica)
+        for frase in paraules:
+            estadistiques = EstadistiquesAnalisi()
+            assert Gram.algoritme_cky(frase, estadistiques) == Gram.algoritme_cky(frase), f"Discrepància amb la frase '{frase}'"
+            n = len(frase)
+            assert estadistiques.longitud == n and estadistiques.celles == n * (n - 1) // 2
+            assert estadistiques.encerts_regles <= estadistiques.parelles and estadistiques.arestes_substituides == 0
+
+    recollidor = RecollidorEstadistiques(mes_lentes=3)
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        for frase in paraules:
+            estadistiques = EstadistiquesAnalisi()
+            analisi = GramProb.algoritme_pcky(frase, estadistiques)
+            referencia = GramProb.algoritme_pcky(frase)
+            assert analisi == referencia, f"Discrepància amb la frase '{frase}'"
+            assert arbres_equivalents(analisi.arbre, referencia.arbre), f"Arbres diferents per la frase '{frase}'"
+            assert estadistiques.encerts_regles <= estadistiques.parelles
+            assert (estadistiques.temps_arbre > 0) == analisi.derivable
+            recollidor.afegir(estadistiques, frase)
+
+    resum = recollidor.resum()
+    assert resum['analisis'] == sum(len(paraules) for _, paraules in gramatiques_probabilistes)
+    assert len(resum['mes_lentes']) == 3
+    with tempfile.TemporaryDirectory() as directori:
+        ruta = os.path.join(directori, 'estadistiques.json')
+        recollidor.bolcar(ruta)
+        with open(ruta, encoding='utf-8') as fitxer:
+            assert json.load(fitxer)['totals'] == resum['totals']
+    assert all(math.isclose(resum['mitjanes'][camp], total / resum['analisis']) for camp, total in resum['totals'].items())
+
+def test_filtre_taula():
+    """
+    Funció per comprovar que el filtre de la taula (fills esquerres i drets, i accessibilitat des de l'arrel)
+    no canvia els resultats de CKY, CKY compilat i PCKY, i que no prova més parelles que sense filtre.
+    """
+
+    for gramatica, paraules in gramatiques_simples + gramatiques_no_FNC:
+        GramFNC = GramaticaFNC(gramatica)
+        GramSense = GramaticaFNC(gramatica, filtrar_taula=False)
+        # Per comparar el nombre de parelles, les dues han de provar sempre totes les parelles
+        GramFNC.estrategia_adaptativa = GramSense.estrategia_adaptativa = False
+        for frase in paraules:
+            resultat = GramSense.algoritme_cky(frase)
+            assert GramFNC.algoritme_cky(frase) == GramFNC.algoritme_cky_compilat(frase) == resultat, f"Discrepància amb la frase '{frase}'"
+            amb, sense = EstadistiquesAnalisi(), EstadistiquesAnalisi()
+            GramFNC.algoritme_cky(frase, amb)
+            GramSense.algoritme_cky(frase, sense)
+            assert amb.parelles <= sense.parelles
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        GramSense = GramaticaProbabilistica(gramatica, filtrar_taula=False)
+        for frase in paraules:
+            analisi = GramProb.algoritme_pcky(frase)
+            referencia = GramSense.algoritme_pcky(frase)
+            assert analisi == referencia, f"Discrepància amb la frase '{frase}'"
+            assert arbres_equivalents(analisi.arbre, referencia.arbre), f"Arbres diferents per la frase '{frase}'"
+            assert [p for p, _ in GramProb.k_millors(frase, 3)] == [p for p, _ in GramSense.k_millors(frase, 3)]
+
+    # Amb memòria cau de subcadenes, 'ab' és una frase sencera en una anàlisi i una subcadena interior en l'altra:
+    # D -> b només es pot combinar lluny del final de la frase, i la cel·la no es pot reaprofitar entre posicions
+    gramatica = {'S': [(['A', 'B'], 0.5), (['A', 'R'], 0.5)], 'R': [(['M', 'C'], 1.0)], 'M': [(['A', 'D'], 1.0)],
+                 'A': [(['a'], 1.0)], 'B': [(['b'], 0.5)], 'D': [(['b'], 0.5)], 'C': [(['c'], 1.0)]}
+    no_probabilistica = {no_terminal: [produccio for produccio, _ in produccions] for no_terminal, produccions in gramatica.items()}
+    for frases in (['ab', 'aabc', 'ab'], ['aabc', 'ab', 'aabc']):
+        GramProb = GramaticaProbabilistica(gramatica, cache_subcadenes=CacheSubcadenes())
+        assert [GramProb.algoritme_pcky(frase) for frase in frases] == [{'ab': (True, 0.25), 'aabc': (True, 0.25)}[frase] for frase in frases]
+        GramFNC = GramaticaFNC(no_probabilistica, cache_subcadenes=CacheSubcadenes())
+        assert [GramFNC.algoritme_cky_compilat(frase) for frase in frases] == [True] * len(frases)
+
+def test_estrategia_adaptativa():
+    """
+    Funció per comprovar que l'estratègia adaptativa del bucle intern (regles per fill esquerre o dret, o totes les regles)
+    dona els mateixos resultats que provar sempre totes les parelles, amb CKY, FNC i PCKY.
+    Inclou gramàtiques amb cel·les grans i poques regles per no-terminal, on es fan servir totes les estratègies.
+    """
+    aleatori = random.Random(0)
+    no_terminals = ['S'] + [f"N{i}" for i in range(1, 40)]
+    denses = []
+    for n_regles in (150, 12):
+        densa = {no_terminal: [] for no_terminal in no_terminals}
+        for _ in range(n_regles):
+            densa[aleatori.choice(no_terminals)].append([aleatori.choice(no_terminals), aleatori.choice(no_terminals)])
+        densa['S'].append([no_terminals[1], no_terminals[2]])
+        for paraula in "abc":
+            for no_terminal in aleatori.sample(no_terminals, 15):
+                densa[no_terminal].append([paraula])
+        denses.append((densa, ["".join(aleatori.choice("abc") for _ in range(longitud)) for longitud in range(1, 12)]))
+    denses_probabilistiques = [({no_terminal: [(produccio, 1.0 / len(produccions)) for produccio in produccions]
+                                 for no_terminal, produccions in densa.items() if produccions}, frases)
+                               for densa, frases in denses]
+
+    casos = [(Gramatica, gramatica, paraules) for gramatica, paraules in gramatiques_simples + denses]
+    casos += [(GramaticaFNC, gramatica, paraules) for gramatica, paraules in gramatiques_no_FNC]
+    casos += [(GramaticaProbabilistica, gramatica, paraules) for gramatica, paraules in gramatiques_probabilistes + denses_probabilistiques]
+    # Sense filtre, les cel·les també tenen no-terminals que no fan de fill, i pot sortir a compte recórrer totes les regles
+    for classe, gramatica, paraules in casos:
+        for filtrar in (True, False):
+            adaptativa, parelles = classe(gramatica, filtrar_taula=filtrar), classe(gramatica, filtrar_taula=filtrar)
+            parelles.estrategia_adaptativa = False
+            for frase in paraules:
+                if classe is not GramaticaProbabilistica:
+                    assert adaptativa.algoritme_cky(frase) == parelles.algoritme_cky(frase), f"Discrepància amb la frase '{frase}'"
+                    continue
+                analisi, referencia = adaptativa.algoritme_pcky(frase), parelles.algoritme_pcky(frase)
+                assert analisi.derivable == referencia.derivable, f"Discrepància amb la frase '{frase}'"
+                assert math.isclose(analisi.probabilitat, referencia.probabilitat, rel_tol=1e-9), f"Discrepància amb la frase '{frase}'"
+                estadistiques = EstadistiquesAnalisi()
+                adaptativa.algoritme_pcky(frase, estadistiques)
+                assert estadistiques.encerts_regles <= estadistiques.parelles
+
+            # Amb estadístiques, cada divisió fa servir la mateixa estratègia que sense, i totes les divisions es compten
+            estrategies = []
+            combinar = adaptativa._combinar
+            def combinar_anotant(*arguments):
+                estrategies.append(arguments[-2])
+                combinar(*arguments)
+            adaptativa._combinar = combinar_anotant
+            metode = adaptativa.algoritme_pcky if classe is GramaticaProbabilistica else adaptativa.algoritme_cky
+            for frase in paraules:
+                del estrategies[:]
+                metode(frase)
+                sense = list(estrategies)
+                del estrategies[:]
+                estadistiques, referencia = EstadistiquesAnalisi(), EstadistiquesAnalisi()
+                metode(frase, estadistiques)
+                assert estrategies == sense, f"Estratègies diferents amb estadístiques per la frase '{frase}'"
+                assert 0 not in estrategies
+                (parelles.algoritme_pcky if classe is GramaticaProbabilistica else parelles.algoritme_cky)(frase, referencia)
+                assert estadistiques.divisions == referencia.divisions and estadistiques.encerts_regles == referencia.encerts_regles
+                assert estadistiques.encerts_regles <= estadistiques.parelles
+            del adaptativa._combinar
+
+def test_taula_compacta():
+    """
+    Funció per comprovar que la variant de l'algoritme PCKY amb la taula compacta dona la mateixa probabilitat i el mateix
+    arbre que l'original, i que la taula compacta té les mateixes arestes que la taula de diccionaris.
+    """
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        for frase in paraules:
+            analisi = GramProb.algoritme_pcky(frase)
+            analisi_compacta = GramProb.algoritme_pcky_compacte(frase)
+            assert analisi.derivable == analisi_compacta.derivable, f"Discrepància amb la frase '{frase}'"
+            assert math.isclose(analisi.probabilitat, analisi_compacta.probabilitat, rel_tol=1e-9), f"Discrepància amb la frase '{frase}'"
+            assert arbres_equivalents(analisi.arbre, analisi_compacta.arbre), f"Arbres diferents per la frase '{frase}'"
+            if not frase:
+                continue
+            taula, _ = GramProb._omplir_taula(frase)
+            compacta = GramProb._omplir_taula_compacta(frase)
+            assert compacta.arestes == sum(len(cella) for fila in taula for cella in fila)
+            for longitud in range(1, len(frase) + 1):
+                for inici in range(len(frase) - longitud + 1):
+                    cella = {GramProb.ids_no_terminals[no_terminal]: math.log(aresta.probabilitat)
+                             for no_terminal, aresta in taula[longitud - 1][inici].items()}
+                    assert compacta.cella(inici, longitud).keys() == cella.keys()
+
+def test_cky_matricial():
+    """
+    Funció per comprovar que la variant matricial de l'algoritme CKY coincideix amb l'original a totes les gramàtiques de prova,
+    també amb cadenes llargues, i que reconeixer dona el mateix resultat amb qualsevol llindar.
+    """
+
+    for gramatica, paraules in gramatiques_simples + gramatiques_no_FNC:
+        GramFNC = GramaticaFNC(gramatica)
+        for frase in paraules + [""]:
+            assert GramFNC.algoritme_cky(frase) == GramFNC.algoritme_cky_matricial(frase), f"Discrepància amb la frase '{frase}'"
+
+    # Concatenacions de frases derivables de G2 (S -> S S) i cadenes aleatòries, més llargues que el llindar
+    GramG2 = Gramatica(gramatiques_simples[1][0])
+    derivables = [frase for frase in gramatiques_simples[1][1] if frase and GramG2.algoritme_cky(frase)]
+    aleatori = random.Random(0)
+    cadenes = ["".join(aleatori.choice(derivables) for _ in range(12)) for _ in range(3)]
+    cadenes += ["".join(aleatori.choice("ab") for _ in range(70)) for _ in range(3)]
+    for frase in cadenes:
+        esperat = GramG2.algoritme_cky_compilat(frase)
+        assert GramG2.algoritme_cky_matricial(frase) == esperat, f"Discrepància amb la frase '{frase}'"
+        for llindar in (0, len(frase) + 1):
+            GramG2.llindar_matricial = llindar
+            assert GramG2.reconeixer(frase) == esperat, f"Discrepància amb la frase '{frase}'"
+
+def test_lots_mateixa_longitud():
+    """
+    Funció per comprovar que el reconeixement i la puntuació per lots (frases agrupades per longitud en una sola taula)
+    donen el mateix resultat que analitzar cada frase per separat, també amb grups petits i cadenes aleatòries.
+    """
+
+    aleatori = random.Random(0)
+    cadenes = ["".join(aleatori.choice("ab") for _ in range(aleatori.randint(1, 10))) for _ in range(100)]
+    casos = [(Gramatica, gramatica, paraules) for gramatica, paraules in gramatiques_simples]
+    casos += [(GramaticaFNC, gramatica, paraules) for gramatica, paraules in gramatiques_no_FNC]
+    for classe, gramatica, paraules in casos:
+        Gram = classe(gramatica)
+        for frases in (paraules + [""], cadenes):
+            esperat = [Gram.algoritme_cky(frase) for frase in frases]
+            assert Gram.reconeixer_lot(frases) == esperat
+            assert Gram.reconeixer_lot(frases, mida_grup=3) == esperat
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        for frases in (paraules + [""], cadenes):
+            esperat = [tuple(GramProb.algoritme_pcky(frase)) for frase in frases]
+            assert [tuple(resultat) for resultat in GramProb.puntuar_lot(frases)] == esperat
+            assert [tuple(resultat) for resultat in GramProb.puntuar_lot(frases, mida_grup=3)] == esperat
+
+def test_arbre_iteratiu():
+    """
+    Funció per comprovar els arbres de NodeArbre: es construeixen només quan es demanen, s'hi accedeix i es comparen
+    com als diccionaris, i es poden construir, comparar i enviar a un altre procés (pickle) encara que l'arbre
+    sigui més profund que el límit de recursió.
+    """
+
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        for frase in paraules:
+            analisi = GramProb.algoritme_pcky(frase)
+            if not analisi.derivable:
+                assert analisi.arbre is None
+                continue
+            assert analisi._constructor_arbre is not None, "L'arbre s'ha construït abans de demanar-lo"
+            arbre = analisi.arbre
+            assert isinstance(arbre, NodeArbre) and analisi._constructor_arbre is None
+            assert arbre['no_terminal'] == GramProb.simbol_arrel and arbre.get('inexistent') is None
+            assert arbre == arbre.com_diccionari() and arbre.com_diccionari() == arbre
+            assert arbre_parentitzat(arbre) == arbre_parentitzat(arbre.com_diccionari())
+            assert pickle.loads(pickle.dumps(arbre)) == arbre
+            assert pickle.loads(pickle.dumps(analisi)).arbre == arbre
+            # Les variants calculen les probabilitats en logaritmes, i poden diferir en l'arrodoniment
+            assert arbres_equivalents(arbre, GramProb.algoritme_pcky_vectorial(frase).arbre)
+            assert arbres_equivalents(arbre, GramProb.algoritme_pcky_compacte(frase).arbre)
+
+    # Amb S -> S A | a l'arbre de 'a' * 200 té 200 nivells, més que el límit de recursió que fixem
+    GramProb = GramaticaProbabilistica({'S': [(['S', 'A'], 0.5), (['a'], 0.5)], 'A': [(['a'], 1.0)]})
+    frase = 'a' * 200
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(120)
+    try:
+        arbres = [GramProb.algoritme_pcky(frase).arbre, GramProb.algoritme_pcky_vectorial(frase).arbre,
+                  GramProb.algoritme_pcky_compacte(frase).arbre]
+        assert arbre_parentitzat(arbres[0]) == arbre_parentitzat(arbres[1]) == arbre_parentitzat(arbres[2])
+        assert pickle.loads(pickle.dumps(arbres[0])) == arbres[0]
+        assert arbres[0] == arbres[0].com_diccionari()
+        profunditat, node = 0, arbres[0]
+        while node['fill'] is not None:
+            profunditat, node = profunditat + 1, node['fill'][0]
+        assert profunditat == len(frase) - 1
+        assert arbre_parentitzat(arbres[0]).count('(A a)') == len(frase) - 1
+        with contextlib.redirect_stdout(io.StringIO()) as sortida:
+            GramProb.display_arbre(arbres[0])
+        assert len(sortida.getvalue().splitlines()) == 2 * len(frase) - 1
+    finally:
+        sys.setrecursionlimit(limit)
+
+def test_serialitzacio():
+    """
+    Funció per comprovar els escriptors d'arbres en bloc: el format binari es llegeix amb els mateixos arbres
+    (també amb frases sense arbre, paraules repetides entre arbres i blocs petits), el format del Penn Treebank
+    escriu una línia per arbre, i l'anàlisi de corpus escriu els arbres en el mateix ordre que les línies JSON.
+    """
+
+    arbres = []
+    for gramatica, paraules in gramatiques_probabilistes:
+        GramProb = GramaticaProbabilistica(gramatica)
+        arbres += [GramProb.algoritme_pcky(frase).arbre for frase in paraules]
+    assert None in arbres
+    arbres += [GramaticaProbabilistica({'S': [(['S', 'A'], 0.5), (['a'], 0.5)], 'A': [(['a'], 1.0)]}).algoritme_pcky('a' * 50).arbre]
+
+    for mida_buffer in (1, 1 << 20):
+        binari = io.BytesIO()
+        with EscriptorArbresBinari(binari, mida_buffer=mida_buffer) as escriptor:
+            assert escriptor.escriure_tots(arbres) == len(arbres)
+            escriptor.escriure(arbres[-1].com_diccionari())
+        binari.seek(0)
+        llegits = list(llegir_arbres_binari(binari))
+        assert llegits == arbres + [arbres[-1]]
+
+        text = io.StringIO()
+        with EscriptorParentitzat(text, mida_buffer=mida_buffer) as escriptor:
+            escriptor.escriure_tots(arbres)
+        assert text.getvalue().splitlines() == [arbre_parentitzat(arbre) if arbre is not None else '()' for arbre in arbres]
+
+    # Un arbre de més de 65536 paraules diferents necessita identificadors i subcadenes de 32 bits
+    paraules = [f"p{i}" for i in range(70000)]
+    arbre = NodeArbre('N', paraules[-1], None, 0.5)
+    for paraula in reversed(paraules[:-1]):
+        arbre = NodeArbre('N', ('N', 'N'), (NodeArbre('N', paraula, None, 0.5), arbre), 0.25)
+    binari = io.BytesIO()
+    with EscriptorArbresBinari(binari) as escriptor:
+        escriptor.escriure_tots([arbre, arbres[-1]])
+    binari.seek(0)
+    assert list(llegir_arbres_binari(binari)) == [arbre, arbres[-1]]
+
+    for dades in (b'', b'CKYA\x00', binari.getvalue()[:-3]):
+        try:
+            list(llegir_arbres_binari(io.BytesIO(dades)))
+            assert False, "S'havia de rebutjar el fitxer"
+        except ValueError:
+            pass
+
+    gramatica, paraules = gramatiques_probabilistes[2]
+    GramProb = GramaticaProbabilistica(gramatica)
+    text = '\n'.join(' '.join(frase) for frase in paraules) + '\n'
+    sortida, binari = io.StringIO(), io.BytesIO()
+    processar_corpus(GramProb, 'algoritme_pcky', io.StringIO(text), sortida, arbres=EscriptorArbresBinari(binari))
+    linies = [json.loads(linia) for linia in sortida.getvalue().splitlines()]
+    binari.seek(0)
+    llegits = list(llegir_arbres_binari(binari))
+    assert len(llegits) == len(linies) == len(paraules)
+    for linia, arbre in zip(linies, llegits):
+        assert 'arbre' not in linia
+        assert arbre == GramProb.algoritme_pcky(paraules[linia['index']]).arbre
+
 if __name__ == "__main__":
     bucle = True
     while bucle: